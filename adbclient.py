@@ -0,0 +1,362 @@
+"""
+Persistent ADB transport for gdsync
+
+Talks to the adb server directly over its smart-socket protocol
+(localhost:5037) instead of spawning one `adb` process per file, and keeps a
+single sync: connection open so that all pushes and pulls of a sync run share
+the same device connection.
+"""
+
+import io
+import os
+import socket
+import struct
+import subprocess
+import shlex
+import time
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = int(os.environ.get("ANDROID_ADB_SERVER_PORT", "5037"))
+
+# Maximum payload of a single sync DATA packet (fixed by the adb protocol)
+SYNC_DATA_MAX = 64 * 1024
+DEFAULT_FILE_MODE = 0o100644
+EXIT_MARKER = "__GDSYNC_EXIT__:"
+
+
+class AdbError(Exception):
+    """Raised when the adb server or the device rejects a request"""
+
+
+class AdbConnectionError(AdbError):
+    """Raised when the connection to the adb server is lost"""
+
+
+def _recv_exact(sock, size):
+    """Read exactly size bytes from a socket"""
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(min(size, SYNC_DATA_MAX))
+        if not chunk:
+            raise AdbConnectionError("Connection closed by adb server")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_all(sock):
+    """Read from a socket until the other side closes it"""
+    chunks = []
+    while True:
+        chunk = sock.recv(SYNC_DATA_MAX)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+
+
+def split_exit_status(output):
+    """Split shell output ending in EXIT_MARKER into (output, exit_code)"""
+    head, marker, exit_code = output.rpartition(EXIT_MARKER)
+    if not marker:
+        return output, None
+    try:
+        return head, int(exit_code.strip())
+    except ValueError:
+        return head, None
+
+
+def _send_request(sock, payload):
+    """Send a smart-socket request and check the OKAY/FAIL status"""
+    data = payload.encode("utf-8")
+    sock.sendall(b"%04x" % len(data) + data)
+    _read_status(sock)
+
+
+def _read_status(sock):
+    """Read an OKAY/FAIL status, raising AdbError on FAIL"""
+    status = _recv_exact(sock, 4)
+    if status == b"OKAY":
+        return
+    if status == b"FAIL":
+        raise AdbError(_read_string(sock))
+    raise AdbError(f"Unexpected response from adb server: {status!r}")
+
+
+def _read_string(sock):
+    """Read a hex length-prefixed string"""
+    length = int(_recv_exact(sock, 4), 16)
+    return _recv_exact(sock, length).decode("utf-8", "replace")
+
+
+class SyncConnection:
+    """A sync: service connection, reusable for any number of transfers"""
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def _send_packet(self, packet_id, data=b""):
+        self.sock.sendall(packet_id + struct.pack("<I", len(data)) + data)
+
+    def _read_header(self):
+        header = _recv_exact(self.sock, 8)
+        return header[:4], struct.unpack("<I", header[4:])[0]
+
+    def _read_fail(self, length):
+        return AdbError(_recv_exact(self.sock, length).decode("utf-8", "replace"))
+
+    def stat(self, remote_path):
+        """Return (mode, size, mtime) of a remote path, mode is 0 if missing"""
+        self._send_packet(b"STAT", remote_path.encode("utf-8"))
+        header = _recv_exact(self.sock, 16)
+        if header[:4] != b"STAT":
+            raise AdbError(f"Unexpected sync response: {header[:4]!r}")
+        return struct.unpack("<III", header[4:])
+
+    def listdir(self, remote_path):
+        """List a remote directory as (name, mode, size, mtime) tuples"""
+        self._send_packet(b"LIST", remote_path.encode("utf-8"))
+        entries = []
+        while True:
+            header = _recv_exact(self.sock, 20)
+            packet_id = header[:4]
+            mode, size, mtime, name_length = struct.unpack("<IIII", header[4:])
+            if packet_id == b"DONE":
+                return entries
+            if packet_id != b"DENT":
+                raise AdbError(f"Unexpected sync response: {packet_id!r}")
+            name = _recv_exact(self.sock, name_length).decode("utf-8", "replace")
+            if name not in (".", ".."):
+                entries.append((name, mode, size, mtime))
+
+    def push_stream(self, stream, remote_path, mode=DEFAULT_FILE_MODE, mtime=0, progress=None):
+        """Send the contents of a readable binary stream to remote_path"""
+        self._send_packet(b"SEND", f"{remote_path},{mode}".encode("utf-8"))
+        sent = 0
+        while True:
+            chunk = stream.read(SYNC_DATA_MAX)
+            if not chunk:
+                break
+            self._send_packet(b"DATA", chunk)
+            sent += len(chunk)
+            if progress:
+                progress(sent)
+        self.sock.sendall(b"DONE" + struct.pack("<I", int(mtime)))
+        packet_id, length = self._read_header()
+        if packet_id == b"FAIL":
+            raise self._read_fail(length)
+        if packet_id != b"OKAY":
+            raise AdbError(f"Unexpected sync response: {packet_id!r}")
+        return sent
+
+    def push(self, local_path, remote_path, progress=None):
+        """Push a local file, keeping its permissions and mtime"""
+        st = os.stat(local_path)
+        mode = DEFAULT_FILE_MODE | (st.st_mode & 0o777)
+        with open(local_path, "rb") as f:
+            return self.push_stream(f, remote_path, mode, st.st_mtime, progress)
+
+    def pull_stream(self, remote_path, stream, progress=None):
+        """Write the contents of remote_path to a writable binary stream"""
+        self._send_packet(b"RECV", remote_path.encode("utf-8"))
+        received = 0
+        while True:
+            packet_id, length = self._read_header()
+            if packet_id == b"DONE":
+                return received
+            if packet_id == b"FAIL":
+                raise self._read_fail(length)
+            if packet_id != b"DATA":
+                raise AdbError(f"Unexpected sync response: {packet_id!r}")
+            stream.write(_recv_exact(self.sock, length))
+            received += length
+            if progress:
+                progress(received)
+
+    def pull(self, remote_path, local_path, progress=None):
+        """Pull a remote file to local_path, leaving it untouched on failure"""
+        temp_path = local_path + ".gdsync-tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                received = self.pull_stream(remote_path, f, progress)
+            os.replace(temp_path, local_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return received
+
+    def close(self):
+        """Tell adbd we are done and close the socket"""
+        try:
+            self._send_packet(b"QUIT")
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class AdbClient:
+    """Client for the adb server that reuses one device connection for transfers"""
+
+    def __init__(self, adb_path="", serial=None, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=30):
+        self.adb_path = adb_path
+        self.serial = serial
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._sync = None
+        self._server_started = False
+
+    def clone(self):
+        """New client for the same server and device, with its own connections"""
+        return AdbClient(self.adb_path, self.serial, self.host, self.port, self.timeout)
+
+    def _connect(self):
+        """Connect to the adb server, starting it once if it is not running"""
+        try:
+            sock = socket.create_connection((self.host, self.port), self.timeout)
+        except OSError:
+            if not self.adb_path or self._server_started:
+                raise
+            self._server_started = True
+            subprocess.run([self.adb_path, "start-server"], capture_output=True)
+            sock = socket.create_connection((self.host, self.port), self.timeout)
+        # Sync packets are small and strictly request/response, so Nagle only adds latency
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def host_command(self, command):
+        """Run a host: service and return its string reply"""
+        sock = self._connect()
+        try:
+            _send_request(sock, command)
+            return _read_string(sock)
+        finally:
+            sock.close()
+
+    def server_version(self):
+        """Return the adb server protocol version"""
+        return int(self.host_command("host:version"), 16)
+
+    def devices(self):
+        """Return a list of (serial, state) for the attached devices"""
+        devices = []
+        for line in self.host_command("host:devices").splitlines():
+            parts = line.split("\t")
+            if len(parts) == 2:
+                devices.append((parts[0], parts[1]))
+        return devices
+
+    def open_service(self, service):
+        """Open a socket to a device service on the selected transport"""
+        sock = self._connect()
+        try:
+            if self.serial:
+                _send_request(sock, f"host:transport:{self.serial}")
+            else:
+                _send_request(sock, "host:transport-any")
+            _send_request(sock, service)
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    def shell(self, command, check=True):
+        """Run a shell command on the device and return its output"""
+        sock = self.open_service(f"shell:{command}; echo {EXIT_MARKER}$?")
+        try:
+            output = recv_all(sock).decode("utf-8", "replace")
+        finally:
+            sock.close()
+        output, exit_code = split_exit_status(output)
+        if check and exit_code != 0:
+            raise AdbError(f"Command failed ({exit_code if exit_code is not None else 'no status'}): {output.strip()}")
+        return output
+
+    def exec_out(self, command, stream, progress=None):
+        """Run a command with exec: and copy its raw stdout into stream"""
+        sock = self.open_service(f"exec:{command}")
+        received = 0
+        try:
+            while True:
+                chunk = sock.recv(SYNC_DATA_MAX)
+                if not chunk:
+                    return received
+                stream.write(chunk)
+                received += len(chunk)
+                if progress:
+                    progress(received)
+        finally:
+            sock.close()
+
+    def sync(self):
+        """Return the persistent sync connection, opening it on first use"""
+        if self._sync is None:
+            self._sync = SyncConnection(self.open_service("sync:"))
+        return self._sync
+
+    def _with_sync(self, operation):
+        """Run a sync operation, reconnecting once if the connection went stale"""
+        try:
+            return operation(self.sync())
+        except (OSError, AdbConnectionError):
+            self.reset()
+        except AdbError:
+            # adbd ends the sync service after a FAIL, so the socket is unusable
+            self.reset()
+            raise
+        try:
+            return operation(self.sync())
+        except Exception:
+            self.reset()
+            raise
+
+    def push(self, local_path, remote_path, progress=None):
+        """Push a file over the persistent sync connection"""
+        return self._with_sync(lambda conn: conn.push(local_path, remote_path, progress))
+
+    def pull(self, remote_path, local_path, progress=None):
+        """Pull a file over the persistent sync connection"""
+        return self._with_sync(lambda conn: conn.pull(remote_path, local_path, progress))
+
+    def push_bytes(self, data, remote_path):
+        """Write data to a remote file over the persistent sync connection"""
+        return self._with_sync(lambda conn: conn.push_stream(io.BytesIO(data), remote_path))
+
+    def push_stream(self, stream, remote_path, progress=None):
+        """Send a readable binary stream to remote_path over the persistent sync connection
+
+        Not retried on a stale connection like the other sync operations: the
+        stream may already be partly read.
+        """
+        try:
+            return self.sync().push_stream(stream, remote_path, mtime=time.time(), progress=progress)
+        except Exception:
+            self.reset()
+            raise
+
+    def stat(self, remote_path):
+        """Stat a remote path over the persistent sync connection"""
+        return self._with_sync(lambda conn: conn.stat(remote_path))
+
+    def listdir(self, remote_path):
+        """List a remote directory over the persistent sync connection"""
+        return self._with_sync(lambda conn: conn.listdir(remote_path))
+
+    def reset(self):
+        """Drop the sync connection so the next transfer reconnects"""
+        if self._sync is not None:
+            try:
+                self._sync.sock.close()
+            except OSError:
+                pass
+            self._sync = None
+
+    def close(self):
+        """Close the persistent sync connection"""
+        if self._sync is not None:
+            self._sync.close()
+            self._sync = None
+
+
+def quote(path):
+    """Quote a path for use in a device shell command"""
+    return shlex.quote(path)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Whole-document vs streaming parsing of decoded saves
+
+Builds a CCLocalLevels-style save and reads it two ways: the old path that
+decodes the whole file to XML and parses it into an element tree
+(parse_plist(decode_bytes(...))), and the streaming path that feeds decoded
+chunks to expat and yields one level at a time (iter_save). Checks that both
+give the same dicts, that the byte offsets of every level point at its XML,
+and that rewriting the save with SaveWriter gives the same XML as
+build_plist, and that the level index sees a level added at the front of the
+save as one new level. Reports time, throughput and peak Python memory of each path.
+
+    python benchmarks/bench_plist.py --levels 4000 --level-size 8192
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import levelindex
+import savefile
+from bench_savefile import make_save_xml
+
+
+def check_streaming(xml, encoded):
+    expected = savefile.parse_plist(xml)
+    for chunk_size in (5, 333, savefile.STREAM_CHUNK_SIZE):
+        entries = savefile.iter_save(io.BytesIO(encoded), chunk_size=chunk_size)
+        assert savefile.join_entries(entries) == expected, f"streaming parse differs (chunk size {chunk_size})"
+        assert savefile.join_entries(savefile.iter_plist([xml[i:i + chunk_size] for i in range(0, len(xml), chunk_size)], split=())) == expected
+
+    for keys, value, start, end in savefile.iter_plist([xml], offsets=True):
+        span = xml[start:end]
+        assert span.startswith(f"<k>{keys[-1]}</k>".encode()), f"offsets of {keys} are off"
+        assert savefile.join_entries(savefile.iter_plist([b"<d>" + span + b"</d>"], split=())) == {keys[-1]: value}
+
+    out = io.BytesIO()
+    writer = savefile.SaveWriter(out)
+    for keys, value in savefile.iter_save(io.BytesIO(encoded)):
+        writer.write(keys, value)
+    writer.close()
+    assert savefile.decode_bytes(out.getvalue()) == xml, "streaming rewrite differs from build_plist"
+
+    empty = savefile.build_plist({"LLM_01": {}, "LLM_02": 38})
+    assert savefile.join_entries(savefile.iter_plist([empty])) == {"LLM_01": {}, "LLM_02": 38}
+
+
+def check_level_index(xml):
+    """GD adds new levels at k_0, which must not make every other level look changed"""
+    data = savefile.parse_plist(xml)
+    levels = data["LLM_01"]
+    count = sum(1 for key in levels if key.startswith("k_"))
+    shifted = {"_isArr": True, "k_0": dict(levels["k_0"], k2="Added at the front")}
+    for i in range(count):
+        shifted[f"k_{i + 1}"] = levels[f"k_{i}"]
+    with tempfile.TemporaryDirectory(prefix="gdsync-bench-") as work:
+        old_path = os.path.join(work, "old.dat")
+        new_path = os.path.join(work, "new.dat")
+        with open(old_path, "wb") as f:
+            f.write(savefile.encode_bytes(xml))
+        with open(new_path, "wb") as f:
+            f.write(savefile.encode_bytes(savefile.build_plist(dict(data, LLM_01=shifted))))
+        old = levelindex.build_index(old_path)
+        new = levelindex.build_index(new_path)
+
+    assert levelindex.diff_indexes(old, new) == (["Added at the front"], [], []), "a level added at k_0 changed the others"
+    assert levelindex.describe_diff(old, new) == "1 new"
+    assert not old.same_content(new)
+    for entry in old.entries:
+        value = xml[entry.start:entry.end].split(b"</k>", 1)[1]
+        assert entry.hash == hashlib.md5(value).hexdigest(), f"hash of {entry.key} is not the md5 of its value"
+
+
+def measure(function):
+    """(seconds, peak traced bytes) of one call"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--levels", type=int, default=2000)
+    parser.add_argument("--level-size", type=int, default=8192, help="bytes of object data per level")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    xml = make_save_xml(args.levels, args.level_size)
+    encoded = savefile.encode_bytes(xml)
+    check_streaming(xml, encoded)
+    check_level_index(xml)
+    print(f"{args.levels} levels: {len(xml) / 1e6:.1f} MB of XML, {len(encoded) / 1e6:.1f} MB encoded, checks OK")
+
+    def whole():
+        savefile.parse_plist(savefile.decode_bytes(encoded))
+
+    def streaming():
+        for _ in savefile.iter_save(io.BytesIO(encoded)):
+            pass
+
+    def streaming_dicts():
+        savefile.join_entries(savefile.iter_save(io.BytesIO(encoded)))
+
+    def rewrite_whole():
+        savefile.encode_bytes(savefile.build_plist(savefile.parse_plist(savefile.decode_bytes(encoded))))
+
+    def rewrite_streaming():
+        writer = savefile.SaveWriter(io.BytesIO())
+        for keys, value in savefile.iter_save(io.BytesIO(encoded)):
+            writer.write(keys, value)
+        writer.close()
+
+    for label, function in [
+        ("parse, whole document", whole),
+        ("parse, streaming", streaming),
+        ("parse, streaming into dicts", streaming_dicts),
+        ("rewrite, whole document", rewrite_whole),
+        ("rewrite, streaming", rewrite_streaming),
+    ]:
+        elapsed = min(measure(function)[0] for _ in range(args.runs))
+        _, peak = measure(function)
+        print(f"{label:<30} {elapsed:7.3f} s  {len(xml) / elapsed / 1e6:7.1f} MB/s XML  peak {peak / 1e6:7.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Decode/encode throughput of the save-file engine on synthetic saves
+
+Builds a CCLocalLevels-style save with the requested number of levels, times
+the streaming decoder and encoder on it and reports their peak Python memory
+use. The round-trip tests of the engine are in tests/test_savefile.py.
+
+    python benchmarks/bench_savefile.py --levels 2000 --level-size 4096
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import savefile
+
+
+def make_level_data(rng, size):
+    """Level-string-like object data: repetitive but not trivially compressible"""
+    objects = []
+    length = 0
+    while length < size:
+        obj = f"1,{rng.randint(1, 1900)},2,{rng.randint(0, 90000)},3,{rng.randint(0, 3000)};"
+        objects.append(obj)
+        length += len(obj)
+    return ("kS38,1_40_2_125_3_255_11_255_12_255_13_255_4_-1_6_1000_7_1_15_1_18_0_8_1|;" + "".join(objects)).encode()
+
+
+def make_save_xml(levels, level_size, seed=1):
+    rng = random.Random(seed)
+    data = {"LLM_01": {"_isArr": True}, "LLM_02": 38}
+    for i in range(levels):
+        data["LLM_01"][f"k_{i}"] = {
+            "kCEK": 4,
+            "k1": 100000 + i,
+            "k2": f"Level {i}",
+            "k4": savefile.encode_level_data(make_level_data(rng, level_size)),
+            "k5": "player",
+            "k13": True,
+            "k21": 2,
+            "k16": rng.randint(1, 40),
+        }
+    return savefile.build_plist(data)
+
+
+def measure(function, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    function(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--levels", type=int, default=2000)
+    parser.add_argument("--level-size", type=int, default=4096, help="bytes of object data per level")
+    args = parser.parse_args()
+
+    xml = make_save_xml(args.levels, args.level_size)
+
+    with tempfile.TemporaryDirectory() as directory:
+        xml_path = os.path.join(directory, "CCLocalLevels.xml")
+        save_path = os.path.join(directory, "CCLocalLevels.dat")
+        decoded_path = os.path.join(directory, "decoded.xml")
+        with open(xml_path, "wb") as f:
+            f.write(xml)
+
+        encode_time, encode_peak = measure(savefile.encode_file, xml_path, save_path)
+        decode_time, decode_peak = measure(savefile.decode_file, save_path, decoded_path)
+        save_size = os.path.getsize(save_path)
+        with open(decoded_path, "rb") as f:
+            assert f.read() == xml, "file round trip changed the XML"
+
+    mb = len(xml) / 1e6
+    print(f"{args.levels} levels: {mb:.1f} MB of XML, {save_size / 1e6:.1f} MB encoded, round trip OK")
+    print(f"decode: {decode_time:7.3f}s  {mb / decode_time:7.1f} MB/s  peak {decode_peak / 1e6:6.1f} MB")
+    print(f"encode: {encode_time:7.3f}s  {mb / encode_time:7.1f} MB/s  peak {encode_peak / 1e6:6.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for the GUIs (time to first frame)
+
+Launches gdsync.py (Qt) and gdsyncgtk.py (GTK) with GDSYNC_STARTUP_PROBE set,
+which makes them print how long the process took from its first line to the
+first painted frame and quit. Reports the wall time from spawning the process
+to that line (interpreter start included) and the in-process time, best and
+median over several runs. Also times the import of the sync engine, which the
+GUIs only load on the first sync, to show what was taken off the startup path.
+
+Without a display, the Qt front end runs on the offscreen platform and the
+GTK one is skipped, as is a front end whose toolkit is not installed.
+
+    python benchmarks/bench_startup.py --runs 10
+"""
+
+import argparse
+import importlib.util
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PROBE_ENV = "GDSYNC_STARTUP_PROBE"
+
+FRONTENDS = [
+    ("Qt (gdsync.py)", "gdsync.py", "PyQt6"),
+    ("GTK (gdsyncgtk.py)", "gdsyncgtk.py", "gi"),
+]
+
+
+def has_display():
+    if sys.platform in ("win32", "darwin"):
+        return True
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def time_frontend(script, timeout):
+    """Run a front end once, returns (wall seconds, in-process seconds)"""
+    env = dict(os.environ, **{PROBE_ENV: "1"})
+    if not has_display():
+        env["QT_QPA_PLATFORM"] = "offscreen"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(REPO, script)],
+        cwd=REPO, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+    )
+    try:
+        for line in process.stdout:
+            if line.startswith("first-frame "):
+                wall = time.perf_counter() - start
+                process.wait(timeout)
+                return wall, float(line.split()[1])
+        raise RuntimeError(f"{script} exited with {process.wait()} before its first frame")
+    finally:
+        if process.poll() is None:
+            process.kill()
+
+
+def time_engine_import():
+    """Seconds to import the sync engine in a fresh interpreter"""
+    code = "import time; t = time.perf_counter(); import synccore; print(time.perf_counter() - t)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=REPO, capture_output=True, text=True, check=True)
+    return float(output.stdout)
+
+
+def summary(samples):
+    return f"best {min(samples) * 1000:7.1f} ms  median {statistics.median(samples) * 1000:7.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for a front end")
+    args = parser.parse_args()
+
+    failed = False
+    for label, script, toolkit in FRONTENDS:
+        if importlib.util.find_spec(toolkit) is None:
+            print(f"{label}: skipped, {toolkit} is not installed")
+            continue
+        if toolkit == "gi" and not has_display():
+            print(f"{label}: skipped, no display")
+            continue
+        try:
+            runs = [time_frontend(script, args.timeout) for _ in range(args.runs)]
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            print(f"{label}: failed, {str(e)}")
+            failed = True
+            continue
+        print(f"{label}")
+        print(f"  spawn to first frame:  {summary([wall for wall, _ in runs])}")
+        print(f"  in-process:            {summary([inside for _, inside in runs])}")
+
+    imports = [time_engine_import() for _ in range(args.runs)]
+    print("Sync engine import, deferred to the first sync")
+    print(f"  import synccore:       {summary(imports)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+End-to-end sync benchmark against the fake adb server
+
+Builds a synthetic GD save folder (many small sfx files, a few large songs and
+big CCLocalLevels/CCGameManager saves) and runs every sync path of the engine
+against a fake device with the given per-request latency and bandwidth: cold
+and unchanged pushes and pulls of everything, a push after a level edit and
+the userdata-only syncs. Every step reports its wall time, the adb processes
+spawned on the PC (counted by a stand-in adb binary that forwards to the fake
+server), the commands run on the device and the bytes that crossed the link,
+so it can run in CI without a phone.
+
+    python benchmarks/bench_sync.py --latency 2 --bandwidth 40
+    python benchmarks/bench_sync.py --disable bulk --json > bench.json
+    python benchmarks/bench_sync.py --enable delta
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import stat
+import sys
+import tempfile
+import time
+
+REPO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, REPO)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# The adb client takes its server port from the environment when imported
+FAKE_ADB_PORT = free_port()
+os.environ["ANDROID_ADB_SERVER_PORT"] = str(FAKE_ADB_PORT)
+
+import savefile
+from bench_savefile import make_save_xml
+from fakeadb import FakeAdbServer
+from synccore import SyncEngine, ANDROID_SAVE_PATH
+
+# Stand-in for the adb binary: logs every spawn and forwards to the fake server
+FAKE_ADB = """
+import os
+import sys
+
+with open(os.environ["GDSYNC_BENCH_SPAWN_LOG"], "a") as f:
+    f.write(" ".join(sys.argv[1:]) + "\\n")
+sys.path.insert(0, os.environ["GDSYNC_BENCH_REPO"])
+from adbclient import AdbClient
+
+args = sys.argv[1:]
+serial = None
+if args[:1] == ["-s"]:
+    serial, args = args[1], args[2:]
+client = AdbClient(serial=serial)
+if args[0] == "devices":
+    print("List of devices attached")
+    for device, state in client.devices():
+        print(f"{device}\\t{state}")
+elif args[0] == "push":
+    client.push(args[1], args[2])
+elif args[0] == "pull":
+    client.pull(args[1], args[2])
+elif args[0] == "shell":
+    sys.stdout.write(client.shell(" ".join(args[1:]), check=False))
+else:
+    sys.exit(f"fake adb: unsupported command {args[0]}")
+"""
+
+OPTIONS = {
+    "bulk": "use_bulk_transfer",
+    "incremental": "use_incremental",
+    "delta": "use_delta",
+    "compression": "use_compression",
+    "staging": "use_staging",
+    "resume": "use_resume",
+    "snapshots": "use_snapshots",
+    "levelindex": "use_level_index",
+}
+
+
+def write_file(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def make_save_tree(directory, args, seed=1):
+    """Synthetic GD save folder, returns its total size"""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    write_file(os.path.join(directory, "CCLocalLevels.dat"), savefile.encode_bytes(make_save_xml(args.levels, args.level_size, seed)))
+    write_file(os.path.join(directory, "CCGameManager.dat"), savefile.encode_bytes(make_save_xml(args.levels // 8, 512, seed + 1)))
+    for name in ("CCLocalLevels2.dat", "CCGameManager2.dat"):
+        shutil.copyfile(os.path.join(directory, name.replace("2", "")), os.path.join(directory, name))
+    write_file(os.path.join(directory, "sfxlibrary.dat"), os.urandom(64 * 1024))
+    write_file(os.path.join(directory, "musiclibrary.dat"), os.urandom(128 * 1024))
+    for i in range(args.sfx):
+        write_file(os.path.join(directory, f"s{4000 + i}.ogg"), os.urandom(rng.randint(4 * 1024, 32 * 1024)))
+    for i in range(args.songs):
+        write_file(os.path.join(directory, f"{600000 + i}.mp3"), os.urandom(int(args.song_size * 1024 * 1024)))
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+
+def edit_levels(directory, args, seed):
+    """Rewrite CCLocalLevels.dat as GD would after editing a level"""
+    write_file(os.path.join(directory, "CCLocalLevels.dat"), savefile.encode_bytes(make_save_xml(args.levels, args.level_size, seed)))
+
+
+def bump(path):
+    """Make an edited file look newer than the last sync"""
+    later = time.time() + 5
+    os.utime(path, (later, later))
+
+
+def install_fake_adb(directory, spawn_log):
+    path = os.path.join(directory, "adb")
+    with open(path, "w") as f:
+        f.write(f"#!{sys.executable}\n{FAKE_ADB}")
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    os.environ["GDSYNC_BENCH_SPAWN_LOG"] = spawn_log
+    os.environ["GDSYNC_BENCH_REPO"] = REPO
+    return path
+
+
+def count_lines(path):
+    try:
+        with open(path) as f:
+            return sum(1 for _ in f)
+    except FileNotFoundError:
+        return 0
+
+
+def run_suite(args, work):
+    # GD creates its save folder on first launch
+    device_save = os.path.join(work, "device", ANDROID_SAVE_PATH.lstrip("/"))
+    os.makedirs(device_save)
+    server = FakeAdbServer(os.path.join(work, "device"), port=FAKE_ADB_PORT).start()
+    server.latency = args.latency / 1000
+    server.bandwidth = int(args.bandwidth * 1024 * 1024)
+
+    spawn_log = os.path.join(work, "spawns.log")
+    adb_path = install_fake_adb(work, spawn_log)
+    pc_push = os.path.join(work, "pc-push")
+    pc_pull = os.path.join(work, "pc-pull")
+    tree_size = make_save_tree(pc_push, args)
+
+    def sync(pc_path, to_phone, userdata_only=False):
+        engine = SyncEngine(adb_path, log=print if args.verbose else None)
+        for option in args.enable:
+            setattr(engine, OPTIONS[option], True)
+        for option in args.disable:
+            setattr(engine, OPTIONS[option], False)
+        try:
+            return engine.sync(pc_path, ANDROID_SAVE_PATH, to_phone, userdata_only)
+        finally:
+            engine.close()
+
+    def edit_and_push():
+        edit_levels(pc_push, args, seed=2)
+        write_file(os.path.join(pc_push, "600999.mp3"), os.urandom(int(args.song_size * 1024 * 1024)))
+        return sync(pc_push, True)
+
+    def edit_and_push_userdata():
+        game_manager = os.path.join(pc_push, "CCGameManager.dat")
+        write_file(game_manager, savefile.encode_bytes(make_save_xml(args.levels // 8, 512, 3)))
+        bump(game_manager)
+        return sync(pc_push, True, userdata_only=True)
+
+    def edit_on_phone_and_pull_userdata():
+        edit_levels(device_save, args, seed=4)
+        bump(os.path.join(device_save, "CCLocalLevels.dat"))
+        return sync(pc_pull, False, userdata_only=True)
+
+    steps = [
+        ("push all, cold", lambda: sync(pc_push, True)),
+        ("push all, unchanged", lambda: sync(pc_push, True)),
+        ("push all, level edit + song", edit_and_push),
+        ("push userdata, save edit", edit_and_push_userdata),
+        ("pull all, cold", lambda: sync(pc_pull, False)),
+        ("pull all, unchanged", lambda: sync(pc_pull, False)),
+        ("pull userdata, phone edit", edit_on_phone_and_pull_userdata),
+    ]
+
+    results = []
+    try:
+        for name, step in steps:
+            stats = dict(server.stats)
+            spawns = count_lines(spawn_log)
+            start = time.perf_counter()
+            success = step()
+            elapsed = time.perf_counter() - start
+            results.append({
+                "step": name,
+                "success": bool(success),
+                "seconds": round(elapsed, 3),
+                "spawns": count_lines(spawn_log) - spawns,
+                "device_commands": server.stats.get("commands", 0) - stats.get("commands", 0),
+                "requests": server.stats.get("requests", 0) - stats.get("requests", 0),
+                "bytes": server.stats.get("bytes", 0) - stats.get("bytes", 0),
+            })
+    finally:
+        server.stop()
+    return tree_size, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.0, help="ms added to every adb request")
+    parser.add_argument("--bandwidth", type=float, default=0.0, help="link speed in MB/s (0: unlimited)")
+    parser.add_argument("--sfx", type=int, default=500, help="number of small sfx files")
+    parser.add_argument("--songs", type=int, default=3, help="number of large songs")
+    parser.add_argument("--song-size", type=float, default=4.0, help="MB per song")
+    parser.add_argument("--levels", type=int, default=400)
+    parser.add_argument("--level-size", type=int, default=8192, help="bytes of object data per level")
+    parser.add_argument("--enable", action="append", default=[], choices=sorted(OPTIONS), help="turn an engine option on")
+    parser.add_argument("--disable", action="append", default=[], choices=sorted(OPTIONS), help="turn an engine option off")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show the engine log")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="gdsync-bench-") as work:
+        tree_size, results = run_suite(args, work)
+
+    if args.json:
+        json.dump({"tree_bytes": tree_size, "latency_ms": args.latency, "bandwidth_mb": args.bandwidth,
+                   "enabled": args.enable, "disabled": args.disable, "steps": results}, sys.stdout, indent=2)
+        print()
+    else:
+        print(f"save tree: {tree_size / 1e6:.1f} MB, latency {args.latency:g} ms, "
+              f"bandwidth {args.bandwidth or 'unlimited'} MB/s, enabled: {', '.join(args.enable) or 'defaults'}, disabled: {', '.join(args.disable) or 'nothing'}")
+        print(f"{'step':<30} {'ok':>3} {'seconds':>8} {'spawns':>7} {'dev cmds':>9} {'requests':>9} {'MB moved':>9}")
+        for r in results:
+            print(f"{r['step']:<30} {'yes' if r['success'] else 'NO':>3} {r['seconds']:8.3f} {r['spawns']:7d} "
+                  f"{r['device_commands']:9d} {r['requests']:9d} {r['bytes'] / 1e6:9.2f}")
+    return 0 if all(r["success"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
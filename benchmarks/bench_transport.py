@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Per-file overhead of one process per transfer vs the persistent ADB transport
+
+Runs against the fake adb server, so no phone is needed. The "before" case
+spawns a fresh process for every file, which connects to the server, selects
+the transport and opens a sync: service just like `adb push` does. The "after"
+case pushes every file over a single AdbClient connection.
+
+    python benchmarks/bench_transport.py --files 200 --size 4096
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from adbclient import AdbClient
+from fakeadb import FakeAdbServer
+
+REMOTE_DIR = "/storage/emulated/0/Android/media/com.geode.launcher/save"
+
+ONE_SHOT_PUSH = (
+    "import sys; sys.path.insert(0, sys.argv[1]); from adbclient import AdbClient; "
+    "c = AdbClient(port=int(sys.argv[2])); c.push(sys.argv[3], sys.argv[4]); c.close()"
+)
+
+
+def make_files(directory, count, size):
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"file{i:05d}.dat")
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        paths.append(path)
+    return paths
+
+
+def bench_spawn(paths, port):
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    start = time.perf_counter()
+    for path in paths:
+        subprocess.run(
+            [sys.executable, "-c", ONE_SHOT_PUSH, repo, str(port), path, f"{REMOTE_DIR}/{os.path.basename(path)}"],
+            check=True,
+        )
+    return time.perf_counter() - start
+
+
+def bench_persistent(paths, port):
+    start = time.perf_counter()
+    client = AdbClient(port=port)
+    for path in paths:
+        client.push(path, f"{REMOTE_DIR}/{os.path.basename(path)}")
+    client.close()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--size", type=int, default=4096, help="bytes per file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as local_dir, tempfile.TemporaryDirectory() as device_dir:
+        paths = make_files(local_dir, args.files, args.size)
+        server = FakeAdbServer(device_dir).start()
+        try:
+            spawn = bench_spawn(paths, server.port)
+            persistent = bench_persistent(paths, server.port)
+        finally:
+            server.stop()
+
+    print(f"{args.files} files of {args.size} bytes")
+    print(f"process per file:     {spawn:8.3f}s  ({spawn / args.files * 1000:7.2f} ms/file)")
+    print(f"persistent transport: {persistent:8.3f}s  ({persistent / args.files * 1000:7.2f} ms/file)")
+    print(f"speedup:              {spawn / persistent:8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
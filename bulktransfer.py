@@ -0,0 +1,148 @@
+"""
+Bulk transfer of the GD save root as a single tar stream
+
+Instead of one push/pull per file, the selected files are packed into a tar
+stream on one side and unpacked on the other, so the whole save root crosses
+the link in a single transfer: pulls read the tar from `adb exec:`, pushes send
+it as one file over sync: and unpack it with a shell command.
+"""
+
+import os
+import tarfile
+import threading
+
+from adbclient import AdbError, SYNC_DATA_MAX, quote
+
+# Temporary file list used by `tar -T` on the device (too long for the command line)
+REMOTE_LIST_PATH = "/data/local/tmp/gdsync-files.txt"
+# Pushed tar, extracted and deleted right after
+REMOTE_TAR_PATH = "/data/local/tmp/gdsync-push.tar"
+
+
+class _SocketReader:
+    """Minimal file-like wrapper so tarfile can read straight from a socket"""
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def read(self, size=SYNC_DATA_MAX):
+        return self.sock.recv(min(size, SYNC_DATA_MAX)) if size else b""
+
+
+class _ProgressReader:
+    """Reports how much of a file tarfile has read so far"""
+
+    def __init__(self, f, progress):
+        self.f = f
+        self.progress = progress
+        self.done = 0
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.done += len(data)
+        self.progress(self.done)
+        return data
+
+
+def _tar_member_name(name):
+    """Return the plain file name of a tar member, or None if it is not a root file"""
+    name = os.path.normpath(name)
+    if name.startswith("..") or os.path.isabs(name) or "/" in name or "\\" in name:
+        return None
+    return name
+
+
+def push_files(client, files, remote_dir, progress=None):
+    """Push [(local_path, name), ...] into remote_dir as one tar stream, return bytes sent
+
+    The tar is streamed with a sync: SEND to a temporary file on the device and
+    extracted there by a separate shell: command: the adb server closes an
+    exec: socket as soon as the client ends its input, so nothing can be
+    piped into a command and still report its status. progress(name, bytes)
+    is called as the bytes of each file are sent.
+    """
+    read_fd, write_fd = os.pipe()
+    sizes = []
+    errors = []
+
+    def write_tar():
+        try:
+            with os.fdopen(write_fd, "wb") as out:
+                with tarfile.open(fileobj=out, mode="w|", format=tarfile.GNU_FORMAT) as tar:
+                    for local_path, name in files:
+                        info = tar.gettarinfo(local_path, arcname=name)
+                        info.uid = info.gid = 0
+                        info.uname = info.gname = ""
+                        with open(local_path, "rb") as f:
+                            tar.addfile(info, _ProgressReader(f, lambda done, name=name: progress(name, done)) if progress else f)
+                        sizes.append(info.size)
+        except OSError as e:
+            # A broken pipe just means the push below gave up
+            errors.append(e)
+
+    writer = threading.Thread(target=write_tar, daemon=True)
+    writer.start()
+    try:
+        with os.fdopen(read_fd, "rb") as tar_stream:
+            client.push_stream(tar_stream, REMOTE_TAR_PATH)
+    finally:
+        writer.join()
+    if errors:
+        client.shell(f"rm -f {REMOTE_TAR_PATH}", check=False)
+        raise errors[0]
+
+    try:
+        client.shell(
+            f"mkdir -p {quote(remote_dir)} && tar -xf {REMOTE_TAR_PATH} -C {quote(remote_dir)}; "
+            f"status=$?; rm -f {REMOTE_TAR_PATH}; [ $status -eq 0 ]"
+        )
+    except AdbError as e:
+        raise AdbError(f"tar extraction failed on device: {str(e)}")
+    return sum(sizes)
+
+
+def pull_files(client, remote_dir, names, local_dir, progress=None):
+    """Pull the named files from remote_dir as one tar stream, return (names_received, bytes)
+
+    progress(name, bytes) is called as the bytes of each file arrive.
+    """
+    wanted = set(names)
+    client.push_bytes("".join(f"{n}\n" for n in names).encode("utf-8"), REMOTE_LIST_PATH)
+
+    command = f"cd {quote(remote_dir)} && tar -cf - -T {REMOTE_LIST_PATH} 2>/dev/null; rm -f {REMOTE_LIST_PATH}"
+    sock = client.open_service(f"exec:{command}")
+    received = []
+    total = 0
+    try:
+        with tarfile.open(fileobj=_SocketReader(sock), mode="r|") as tar:
+            for member in tar:
+                name = _tar_member_name(member.name)
+                if not member.isfile() or name not in wanted:
+                    continue
+                local_path = os.path.join(local_dir, name)
+                temp_path = local_path + ".gdsync-tmp"
+                source = tar.extractfile(member)
+                done = 0
+                try:
+                    with open(temp_path, "wb") as f:
+                        while True:
+                            chunk = source.read(SYNC_DATA_MAX)
+                            if not chunk:
+                                break
+                            f.write(chunk)
+                            done += len(chunk)
+                            if progress:
+                                progress(name, done)
+                    os.replace(temp_path, local_path)
+                except Exception:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                    raise
+                os.utime(local_path, (member.mtime, member.mtime))
+                received.append(name)
+                total += member.size
+    except tarfile.ReadError as e:
+        raise AdbError(f"Invalid tar stream from device: {str(e)}")
+    finally:
+        sock.close()
+    return received, total
@@ -0,0 +1,107 @@
+"""
+On-the-wire gzip compression for pushes and pulls
+
+Files that compress well (GD .dat saves, level and config files) are gzipped
+on the fly and unpacked on the other side: pushes send the gzip stream as a
+file over sync:, pulls read it from `adb exec:`. Songs and other
+already-compressed media are left to the plain sync: transfer. Which files
+qualify is decided by CompressionRules (extension lists and a minimum size).
+"""
+
+import os
+import zlib
+
+from adbclient import AdbError, SYNC_DATA_MAX, quote
+
+DEFAULT_MIN_SIZE = 64 * 1024
+DEFAULT_EXTENSIONS = (".dat", ".json", ".txt", ".xml", ".plist", ".gmd", ".ini", ".log")
+# gzip on the phone is CPU bound, a low level keeps it ahead of the link
+DEVICE_LEVEL = 1
+LOCAL_LEVEL = 6
+
+
+class CompressionRules:
+    """Decides which files are worth compressing on the wire"""
+
+    def __init__(self, min_size=DEFAULT_MIN_SIZE, extensions=DEFAULT_EXTENSIONS):
+        self.min_size = min_size
+        self.extensions = tuple(e.lower() for e in extensions)
+
+    def should_compress(self, name, size):
+        """True if a file of this name and size should be compressed"""
+        return size >= self.min_size and name.lower().endswith(self.extensions)
+
+
+class _GzipReader:
+    """Readable stream yielding the gzip compression of a file"""
+
+    def __init__(self, f, level):
+        self.f = f
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        self.finished = False
+
+    def read(self, size=SYNC_DATA_MAX):
+        while not self.finished:
+            chunk = self.f.read(SYNC_DATA_MAX)
+            if chunk:
+                data = self.compressor.compress(chunk)
+            else:
+                data = self.compressor.flush()
+                self.finished = True
+            if data:
+                return data
+        return b""
+
+
+class _GunzipWriter:
+    """Writable stream that gunzips into a file"""
+
+    def __init__(self, f):
+        self.f = f
+        self.decompressor = zlib.decompressobj(31)
+
+    def write(self, data):
+        self.f.write(self.decompressor.decompress(data))
+
+    def finish(self):
+        self.f.write(self.decompressor.flush())
+        if not self.decompressor.eof:
+            raise AdbError("Compressed stream ended early")
+
+
+def push_compressed(client, local_path, remote_path, level=LOCAL_LEVEL):
+    """Push a file gzipped on the wire, returns the number of compressed bytes sent
+
+    The gzip stream goes to a temporary file over sync: and is unpacked by a
+    separate shell: command, since an exec: stream cannot be fed and still
+    report the status of its command.
+    """
+    temp_path = f"{remote_path}.gdsync-tmp"
+    gz_path = f"{temp_path}.gz"
+    with open(local_path, "rb") as f:
+        sent = client.push_stream(_GzipReader(f, level), gz_path)
+    try:
+        client.shell(
+            f"gzip -dc {quote(gz_path)} > {quote(temp_path)} && mv -f {quote(temp_path)} {quote(remote_path)}; "
+            f"status=$?; rm -f {quote(gz_path)} {quote(temp_path)}; [ $status -eq 0 ]"
+        )
+    except AdbError as e:
+        raise AdbError(f"Compressed push failed on device: {str(e)}")
+    return sent
+
+
+def pull_compressed(client, remote_path, local_path, level=DEVICE_LEVEL):
+    """Pull a file gzipped on the wire, returns the number of compressed bytes received"""
+    temp_path = local_path + ".gdsync-tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            writer = _GunzipWriter(f)
+            received = client.exec_out(f"gzip -{int(level)} -c {quote(remote_path)} 2>/dev/null", writer)
+            writer.finish()
+        os.replace(temp_path, local_path)
+    except zlib.error as e:
+        raise AdbError(f"Invalid compressed stream from device: {str(e)}")
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return received
@@ -0,0 +1,127 @@
+"""
+Persistent settings and cached discovery results
+
+Keeps what gdsync works out at startup so the next launch can skip it: the
+adb binary and its version, the GD save folder on the PC, the devices seen
+and where the last sync went. Cached entries are checked with a stat instead
+of being discovered again: the adb entry is trusted while the binary keeps its
+size and mtime, the save folder while it still exists. The file manifests are
+not copied here, they stay in the sync state file of the save folder.
+Everything lives in one JSON file in the per-user config folder.
+"""
+
+import json
+import os
+import platform
+import re
+import subprocess
+import time
+
+CONFIG_FILENAME = "config.json"
+CONFIG_VERSION = 1
+ADB_VERSION_TIMEOUT = 10
+
+
+def default_config_dir():
+    """Per-user folder for the config file"""
+    if platform.system() == "Windows":
+        return os.path.join(os.environ.get("APPDATA") or os.path.expanduser("~"), "gdsync")
+    if platform.system() == "Darwin":
+        return os.path.expanduser("~/Library/Application Support/gdsync")
+    return os.path.join(os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config"), "gdsync")
+
+
+def file_signature(path):
+    """[size, mtime in ns] of a file, or None if it is gone"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def adb_version(adb_path):
+    """Version reported by `adb version`, or "" if it could not be run"""
+    try:
+        process = subprocess.run([adb_path, "version"], capture_output=True, text=True, timeout=ADB_VERSION_TIMEOUT)
+    except (OSError, subprocess.SubprocessError):
+        return ""
+    match = re.search(r"version (\S+)", process.stdout)
+    return match.group(1) if match else ""
+
+
+class Config:
+    """gdsync's config file, loaded once and saved after every change"""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(default_config_dir(), CONFIG_FILENAME)
+        self.data = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == CONFIG_VERSION:
+                return data
+        except (OSError, ValueError):
+            pass
+        return {"version": CONFIG_VERSION}
+
+    def save(self):
+        """Atomically write the config file, returns False on error"""
+        temp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp_path, "w") as f:
+                json.dump(self.data, f, indent=1, sort_keys=True)
+            os.replace(temp_path, self.path)
+        except OSError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def set(self, key, value):
+        self.data[key] = value
+        return self.save()
+
+    def cached_adb(self):
+        """(path, version) of the adb found earlier, or None if the binary changed since"""
+        entry = self.data.get("adb")
+        if not entry or file_signature(entry["path"]) != entry["signature"]:
+            return None
+        return entry["path"], entry["version"]
+
+    def remember_adb(self, path, version):
+        return self.set("adb", {"path": path, "version": version, "signature": file_signature(path)})
+
+    def cached_gd_path(self):
+        """GD save folder set up earlier, or None if it no longer exists"""
+        path = self.data.get("gd_pc_path")
+        return path if path and os.path.isdir(path) else None
+
+    def remember_gd_path(self, path):
+        return self.set("gd_pc_path", path)
+
+    def devices(self):
+        """Serials of the devices seen, most recently seen first"""
+        devices = self.data.get("devices", {})
+        return sorted(devices, key=lambda serial: devices[serial], reverse=True)
+
+    def remember_devices(self, serials):
+        devices = self.data.setdefault("devices", {})
+        now = int(time.time())
+        for serial in serials:
+            devices[serial] = now
+        return self.save()
+
+    def remember_sync(self, pc_path, to_phone, success, serials=None):
+        """Record where the last sync went, its manifests are in pc_path's state file"""
+        return self.set("last_sync", {
+            "pc_path": pc_path,
+            "direction": "push" if to_phone else "pull",
+            "success": bool(success),
+            "devices": list(serials or []),
+            "time": int(time.time()),
+        })
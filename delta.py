@@ -0,0 +1,203 @@
+"""
+Block delta transfer for the large GD save files
+
+Compares fixed-size block hashes of the new file with those of the copy that
+already exists on the other side and sends only the blocks that differ. The
+device side needs nothing but toybox (dd, md5sum, truncate): block hashes are
+computed with one shell loop, and a pushed shell script patches a copy of the
+old file, checks its md5 and only then moves it into place. Every failure
+raises DeltaError so the caller can fall back to a full copy.
+
+Saves are gzipped before they are base64 encoded, so one changed level
+shifts every compressed byte after it, and GD puts new and edited levels
+at k_0, near the start of the file. Few blocks ever match, which is why the
+engine only tries a delta when it is turned on (use_delta, --delta).
+"""
+
+import hashlib
+import os
+import posixpath
+import shutil
+
+from adbclient import AdbError, quote
+from manifest import file_md5
+
+# Files that get big enough on heavy accounts for a delta to pay off
+DELTA_FILES = ("CCLocalLevels.dat", "CCLocalLevels2.dat", "CCGameManager.dat", "CCGameManager2.dat")
+DELTA_MIN_SIZE = 1024 * 1024
+MIN_BLOCK_SIZE = 64 * 1024
+MAX_BLOCKS = 256
+# Give up on the delta when more than this fraction of the file changed
+MAX_CHANGED_FRACTION = 0.75
+
+
+class DeltaError(Exception):
+    """Raised when a delta transfer cannot be used or failed verification"""
+
+
+def block_size_for(size):
+    """Block size giving at most MAX_BLOCKS blocks, as a power of two"""
+    block_size = MIN_BLOCK_SIZE
+    while block_size * MAX_BLOCKS < size:
+        block_size *= 2
+    return block_size
+
+
+def block_count(size, block_size):
+    return (size + block_size - 1) // block_size
+
+
+def local_block_hashes(path, block_size):
+    """md5 of every block of a local file"""
+    hashes = []
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return hashes
+            hashes.append(hashlib.md5(block).hexdigest())
+
+
+def remote_block_hashes(client, remote_path, size, block_size):
+    """md5 of every block of a device file, computed on the device in one shell call"""
+    count = block_count(size, block_size)
+    if count == 0:
+        return []
+    command = (
+        f"i=0; while [ $i -lt {count} ]; do "
+        f"dd if={quote(remote_path)} bs={block_size} skip=$i count=1 2>/dev/null | md5sum; "
+        f"i=$((i+1)); done"
+    )
+    hashes = [line.split()[0] for line in client.shell(command).splitlines() if line.strip()]
+    if len(hashes) != count or any(len(h) != 32 for h in hashes):
+        raise DeltaError(f"Could not read block hashes of {remote_path}")
+    return hashes
+
+
+def changed_blocks(new_hashes, old_hashes):
+    """Indexes of the blocks of the new file that differ from the old one"""
+    return [i for i, digest in enumerate(new_hashes) if i >= len(old_hashes) or old_hashes[i] != digest]
+
+
+def _check_worth_it(changed, total_blocks):
+    if total_blocks == 0 or len(changed) > total_blocks * MAX_CHANGED_FRACTION:
+        raise DeltaError(f"{len(changed)}/{total_blocks} blocks changed, a full copy is cheaper")
+
+
+def push_delta(client, local_path, remote_path, remote_size, target_path=None):
+    """Update remote_path to match local_path by sending only changed blocks, returns bytes sent
+
+    The patched file is moved to target_path instead when one is given.
+    """
+    local_size = os.path.getsize(local_path)
+    block_size = block_size_for(max(local_size, remote_size))
+    new_hashes = local_block_hashes(local_path, block_size)
+    old_hashes = remote_block_hashes(client, remote_path, remote_size, block_size)
+    changed = changed_blocks(new_hashes, old_hashes)
+    _check_worth_it(changed, len(new_hashes))
+
+    expected_md5 = file_md5(local_path)
+    with open(local_path, "rb") as f:
+        blocks = []
+        for index in changed:
+            f.seek(index * block_size)
+            blocks.append(f.read(block_size))
+
+    # The patch script runs inside the save folder and only uses file names
+    remote_dir, name = remote_path.rsplit("/", 1)
+    temp_name = f"{name}.gdsync-tmp"
+    blocks_name = f"{name}.gdsync-blocks"
+    script_name = f"{name}.gdsync-patch.sh"
+    lines = [
+        "set -e",
+        f"cp {quote(name)} {quote(temp_name)}",
+    ]
+    for position, index in enumerate(changed):
+        lines.append(
+            f"dd if={quote(blocks_name)} of={quote(temp_name)} bs={block_size} "
+            f"skip={position} seek={index} count=1 conv=notrunc 2>/dev/null"
+        )
+    lines += [
+        f"truncate -s {local_size} {quote(temp_name)}",
+        f"if [ \"$(md5sum < {quote(temp_name)} | cut -c1-32)\" != {expected_md5} ]; then echo MISMATCH; exit 1; fi",
+        f"mv -f {quote(temp_name)} {quote(posixpath.relpath(target_path, remote_dir) if target_path else name)}",
+    ]
+
+    try:
+        client.push_bytes(b"".join(blocks), f"{remote_dir}/{blocks_name}")
+        client.push_bytes(("\n".join(lines) + "\n").encode("utf-8"), f"{remote_dir}/{script_name}")
+        client.shell(f"cd {quote(remote_dir)} && sh {quote(script_name)}")
+    except AdbError as e:
+        raise DeltaError(f"Delta patch failed on device: {str(e)}")
+    finally:
+        try:
+            client.shell(f"cd {quote(remote_dir)} && rm -f {quote(blocks_name)} {quote(script_name)} {quote(temp_name)}", check=False)
+        except (AdbError, OSError):
+            pass
+    return sum(len(block) for block in blocks)
+
+
+def pull_delta(client, remote_path, local_path, remote_size, remote_md5=None):
+    """Update local_path to match remote_path by fetching only changed blocks, returns bytes received"""
+    local_size = os.path.getsize(local_path)
+    block_size = block_size_for(max(local_size, remote_size))
+    old_hashes = local_block_hashes(local_path, block_size)
+    new_hashes = remote_block_hashes(client, remote_path, remote_size, block_size)
+    changed = changed_blocks(new_hashes, old_hashes)
+    _check_worth_it(changed, len(new_hashes))
+
+    if remote_md5 is None:
+        remote_md5 = client.shell(f"md5sum < {quote(remote_path)}").split()[0]
+
+    temp_path = local_path + ".gdsync-tmp"
+    received = 0
+    try:
+        shutil.copyfile(local_path, temp_path)
+        with open(temp_path, "r+b") as f:
+            if changed:
+                command = (
+                    f"for i in {' '.join(str(i) for i in changed)}; do "
+                    f"dd if={quote(remote_path)} bs={block_size} skip=$i count=1 2>/dev/null; done"
+                )
+                writer = _BlockWriter(f, changed, block_size)
+                received = client.exec_out(command, writer)
+                writer.check_complete(remote_size)
+            f.truncate(remote_size)
+        if file_md5(temp_path) != remote_md5:
+            raise DeltaError(f"Delta result for {local_path} failed verification")
+        os.replace(temp_path, local_path)
+    except (AdbError, OSError) as e:
+        raise DeltaError(f"Delta pull failed: {str(e)}")
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return received
+
+
+class _BlockWriter:
+    """Writes a concatenated stream of blocks to their offsets in a file"""
+
+    def __init__(self, f, indexes, block_size):
+        self.f = f
+        self.indexes = indexes
+        self.block_size = block_size
+        self.position = 0
+
+    def write(self, data):
+        while data:
+            block, offset = divmod(self.position, self.block_size)
+            if block >= len(self.indexes):
+                raise DeltaError("Device sent more data than requested")
+            take = min(len(data), self.block_size - offset)
+            self.f.seek(self.indexes[block] * self.block_size + offset)
+            self.f.write(data[:take])
+            self.position += take
+            data = data[take:]
+
+    def check_complete(self, remote_size):
+        """Make sure every requested block arrived (the last one may be short)"""
+        expected = 0
+        for index in self.indexes:
+            expected += max(0, min(self.block_size, remote_size - index * self.block_size))
+        if self.position != expected:
+            raise DeltaError(f"Incomplete block stream ({self.position}/{expected} bytes)")
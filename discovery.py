@@ -0,0 +1,309 @@
+"""
+Finding GD save folders on the PC
+
+GD keeps its saves in AppData/Local/GeometryDash inside whatever Windows it
+runs on: a Proton prefix in any Steam library (as the Steam game or as a
+non-Steam shortcut), a plain Wine prefix, or a Lutris, Bottles, PlayOnLinux or
+CrossOver prefix. The Steam libraries are read from libraryfolders.vdf, the
+prefixes are listed from the folders these tools use, and every prefix is
+checked for a GeometryDash folder with CCGameManager.dat in it. The home
+directory is never walked. Prefixes are checked on a few worker threads under
+an overall timeout, so a slow or hung mount only drops its own prefixes. The
+result is cached in the config file and reused while the folders still exist.
+"""
+
+import glob
+import os
+import platform
+import re
+import threading
+import time
+from collections import namedtuple
+
+GD_STEAM_APP_ID = "322170"
+SAVE_MARKER = "CCGameManager.dat"
+SCAN_TIMEOUT = 3.0
+SCAN_WORKERS = 8
+# How deep a prefix may sit below a games folder like ~/Games
+GAMES_DIR_DEPTH = 2
+CACHE_KEY = "gd_candidates"
+
+# path: the GeometryDash save folder, source: where it was found,
+# mtime: of CCGameManager.dat, the most recently played install sorts first
+Candidate = namedtuple("Candidate", ["path", "source", "mtime"])
+
+_VDF_TOKEN = re.compile(r'"((?:[^"\\]|\\.)*)"|([{}])|//[^\n]*')
+
+
+def parse_vdf(text):
+    """Parse Valve KeyValues text (libraryfolders.vdf) into nested dicts"""
+    root = {}
+    stack = [root]
+    key = None
+    for match in _VDF_TOKEN.finditer(text):
+        string, brace = match.groups()
+        if brace == "{":
+            child = {}
+            stack[-1][key if key is not None else ""] = child
+            stack.append(child)
+            key = None
+        elif brace == "}":
+            if len(stack) > 1:
+                stack.pop()
+            key = None
+        elif string is not None:
+            string = re.sub(r"\\(.)", r"\1", string)
+            if key is None:
+                key = string
+            else:
+                stack[-1][key] = string
+                key = None
+    return root
+
+
+def steam_roots():
+    """Folders Steam may be installed in on this system"""
+    home = os.path.expanduser("~")
+    if platform.system() == "Windows":
+        return [os.path.join(os.environ.get(name, ""), "Steam") for name in ("ProgramFiles(x86)", "ProgramFiles") if os.environ.get(name)]
+    if platform.system() == "Darwin":
+        return [os.path.join(home, "Library", "Application Support", "Steam")]
+    return [
+        os.path.join(home, ".local", "share", "Steam"),
+        os.path.join(home, ".steam", "steam"),
+        os.path.join(home, ".steam", "root"),
+        os.path.join(home, ".var", "app", "com.valvesoftware.Steam", ".local", "share", "Steam"),
+        os.path.join(home, "snap", "steam", "common", ".local", "share", "Steam"),
+    ]
+
+
+def steam_libraries(roots=None):
+    """Steam library folders from every libraryfolders.vdf found, without duplicates"""
+    libraries = []
+    for root in roots if roots is not None else steam_roots():
+        if not os.path.isdir(root):
+            continue
+        libraries.append(root)
+        for vdf_path in (os.path.join(root, "steamapps", "libraryfolders.vdf"), os.path.join(root, "config", "libraryfolders.vdf")):
+            try:
+                with open(vdf_path, "r", encoding="utf-8", errors="replace") as f:
+                    data = parse_vdf(f.read())
+            except OSError:
+                continue
+            for section in data.values():
+                if not isinstance(section, dict):
+                    continue
+                for key, value in section.items():
+                    # New format: "0" { "path" "..." }, old format: "1" "..."
+                    if isinstance(value, dict) and value.get("path"):
+                        libraries.append(value["path"])
+                    elif isinstance(value, str) and key.isdigit():
+                        libraries.append(value)
+    return unique_paths(libraries)
+
+
+def unique_paths(paths):
+    seen = set()
+    unique = []
+    for path in paths:
+        real = os.path.realpath(path)
+        if real not in seen:
+            seen.add(real)
+            unique.append(path)
+    return unique
+
+
+def lutris_prefixes():
+    """Wine prefixes named in the Lutris game configs"""
+    home = os.path.expanduser("~")
+    prefixes = []
+    for config_dir in (os.path.join(home, ".config", "lutris", "games"), os.path.join(home, ".local", "share", "lutris", "games")):
+        for config_path in glob.glob(os.path.join(config_dir, "*.yml")):
+            try:
+                with open(config_path, "r", encoding="utf-8", errors="replace") as f:
+                    for line in f:
+                        match = re.match(r"\s*prefix:\s*['\"]?(.+?)['\"]?\s*$", line)
+                        if match:
+                            prefixes.append(os.path.expanduser(match.group(1)))
+            except OSError:
+                continue
+    return prefixes
+
+
+def find_prefixes(directory, depth=GAMES_DIR_DEPTH):
+    """Wine prefixes (folders with a drive_c) up to depth levels below directory"""
+    prefixes = []
+    try:
+        entries = [entry for entry in os.scandir(directory) if entry.is_dir(follow_symlinks=False)]
+    except OSError:
+        return prefixes
+    for entry in entries:
+        if os.path.isdir(os.path.join(entry.path, "drive_c")):
+            prefixes.append(entry.path)
+        elif depth > 1:
+            prefixes.extend(find_prefixes(entry.path, depth - 1))
+    return prefixes
+
+
+def prefix_sources():
+    """(function, args, source) jobs that list the prefixes to check"""
+    home = os.path.expanduser("~")
+    jobs = []
+    for library in steam_libraries():
+        jobs.append((compatdata_prefixes, (library,), "Steam"))
+    if platform.system() == "Darwin":
+        jobs.append((glob.glob, (os.path.join(home, "Library", "Application Support", "CrossOver", "Bottles", "*"),), "CrossOver"))
+    if platform.system() != "Windows":
+        wine = [os.environ["WINEPREFIX"]] if os.environ.get("WINEPREFIX") else []
+        wine.append(os.path.join(home, ".wine"))
+        jobs.append((list, (wine,), "Wine"))
+        jobs.append((glob.glob, (os.path.join(home, ".local", "share", "wineprefixes", "*"),), "Wine"))
+        jobs.append((lutris_prefixes, (), "Lutris"))
+        jobs.append((find_prefixes, (os.path.join(home, "Games"),), "Lutris"))
+        for bottles in (os.path.join(home, ".local", "share", "bottles", "bottles"),
+                        os.path.join(home, ".var", "app", "com.usebottles.bottles", "data", "bottles", "bottles")):
+            jobs.append((glob.glob, (os.path.join(bottles, "*"),), "Bottles"))
+        jobs.append((glob.glob, (os.path.join(home, ".PlayOnLinux", "wineprefix", "*"),), "PlayOnLinux"))
+    return jobs
+
+
+def compatdata_prefixes(library):
+    """Proton prefixes of a Steam library, GD's own first, then non-Steam shortcuts"""
+    compatdata = os.path.join(library, "steamapps", "compatdata")
+    try:
+        app_ids = sorted(entry.name for entry in os.scandir(compatdata) if entry.is_dir())
+    except OSError:
+        return []
+    app_ids.sort(key=lambda app_id: app_id != GD_STEAM_APP_ID)
+    return [os.path.join(compatdata, app_id, "pfx") for app_id in app_ids]
+
+
+def save_folders_in_prefix(prefix):
+    """GeometryDash save folders of any Windows user in a Wine prefix"""
+    folders = []
+    users = os.path.join(prefix, "drive_c", "users")
+    try:
+        names = [entry.name for entry in os.scandir(users) if entry.is_dir()]
+    except OSError:
+        return folders
+    for name in names:
+        for local in (os.path.join("AppData", "Local"), os.path.join("Local Settings", "Application Data")):
+            folder = os.path.join(users, name, local, "GeometryDash")
+            if os.path.isfile(os.path.join(folder, SAVE_MARKER)):
+                folders.append(folder)
+    return folders
+
+
+def native_save_folders():
+    """Save folders of GD running natively on Windows or macOS"""
+    if platform.system() == "Windows" and os.environ.get("LOCALAPPDATA"):
+        folders = [os.path.join(os.environ["LOCALAPPDATA"], "GeometryDash")]
+    elif platform.system() == "Darwin":
+        folders = [os.path.expanduser("~/Library/Application Support/GeometryDash")]
+    else:
+        folders = []
+    return [folder for folder in folders if os.path.isfile(os.path.join(folder, SAVE_MARKER))]
+
+
+def prefix_of(folder):
+    """Wine prefix a save folder is in, or None for a native install"""
+    index = folder.find(os.sep + "drive_c" + os.sep)
+    return folder[:index] if index >= 0 else None
+
+
+def describe(candidate):
+    """Short label for a candidate, like Steam (322170) or Bottles (GD)"""
+    prefix = prefix_of(candidate.path)
+    if prefix is None:
+        return candidate.source
+    name = os.path.basename(prefix)
+    if name == "pfx":
+        # Proton prefixes are compatdata/<app id>/pfx
+        name = os.path.basename(os.path.dirname(prefix))
+    return f"{candidate.source} ({name})"
+
+
+def run_bounded(jobs, timeout=SCAN_TIMEOUT, workers=SCAN_WORKERS):
+    """Run (function, args, source) jobs on a few threads, returns [(result, source)] of those done in time
+
+    Workers are daemon threads: one stuck on a dead network mount is left
+    behind instead of holding up the scan or the exit of the program.
+    """
+    results = []
+    lock = threading.Lock()
+    pending = list(jobs)
+
+    def work():
+        while True:
+            with lock:
+                if not pending:
+                    return
+                function, args, source = pending.pop(0)
+            try:
+                result = function(*args)
+            except OSError:
+                continue
+            with lock:
+                results.append((result, source))
+
+    threads = [threading.Thread(target=work, daemon=True) for _ in range(min(workers, len(jobs)))]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + timeout
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+    with lock:
+        pending.clear()
+        return list(results)
+
+
+def find_candidates(timeout=SCAN_TIMEOUT, workers=SCAN_WORKERS):
+    """Scan for GD save folders, most recently played first"""
+    deadline = time.monotonic() + timeout
+    prefixes = []
+    for found, source in run_bounded(prefix_sources(), timeout, workers):
+        prefixes.extend((prefix, source) for prefix in found)
+    prefixes = [(prefix, source) for prefix, source in prefixes if os.path.isdir(prefix)]
+    jobs = [(save_folders_in_prefix, (prefix,), source) for prefix, source in prefixes]
+    folders = [(folder, "Native") for folder in native_save_folders()]
+    for found, source in run_bounded(jobs, max(0.0, deadline - time.monotonic()), workers):
+        folders.extend((folder, source) for folder in found)
+
+    candidates = []
+    for folder in unique_paths(folder for folder, _ in folders):
+        source = next(source for path, source in folders if path == folder)
+        try:
+            mtime = int(os.stat(os.path.join(folder, SAVE_MARKER)).st_mtime)
+        except OSError:
+            continue
+        candidates.append(Candidate(folder, source, mtime))
+    candidates.sort(key=lambda candidate: candidate.mtime, reverse=True)
+    return candidates
+
+
+def cached_candidates(config):
+    """Candidates cached in the config, or None if there are none or a folder is gone"""
+    cached = [Candidate(*entry) for entry in config.get(CACHE_KEY, [])]
+    if cached and all(os.path.isfile(os.path.join(candidate.path, SAVE_MARKER)) for candidate in cached):
+        return cached
+    return None
+
+
+def remember_candidates(config, candidates):
+    return config.set(CACHE_KEY, [list(candidate) for candidate in candidates])
+
+
+def discover(config=None, refresh=False, timeout=SCAN_TIMEOUT):
+    """GD save folders on this PC, from the config cache while its folders still exist
+
+    The GUIs call cached_candidates on the UI thread and run find_candidates
+    on a worker instead, so a first scan never blocks the window.
+    """
+    if config is not None and not refresh:
+        cached = cached_candidates(config)
+        if cached:
+            return cached
+    candidates = find_candidates(timeout)
+    if config is not None:
+        remember_candidates(config, candidates)
+    return candidates
@@ -0,0 +1,334 @@
+"""
+Fake adb server for testing and benchmarking gdsync without a phone
+
+Speaks the adb smart-socket protocol on localhost and serves each device from
+a local directory: a remote path like /storage/emulated/0/... maps to
+<root>/storage/emulated/0/... and shell commands run through the local `sh`
+with device paths rewritten to the backing directory.
+"""
+
+import os
+import re
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import threading
+
+SYNC_DATA_MAX = 64 * 1024
+DEVICE_PREFIXES = ("/storage", "/sdcard", "/data/local/tmp")
+
+
+class FakeDevice:
+    """A fake Android device backed by a local directory"""
+
+    def __init__(self, serial, root):
+        self.serial = serial
+        self.root = os.path.abspath(root)
+        self._prefix_re = re.compile(r"(?<![\w/.])(" + "|".join(re.escape(p) for p in DEVICE_PREFIXES) + r")(?=/|\b)")
+
+    def local_path(self, remote_path):
+        """Map a device path to its backing local path"""
+        return os.path.join(self.root, remote_path.lstrip("/"))
+
+    def map_command(self, command):
+        """Rewrite device paths in a shell command to local paths"""
+        return self._prefix_re.sub(lambda m: self.root + m.group(1), command)
+
+    def unmap_output(self, data):
+        """Rewrite local paths in command output back to device paths"""
+        return data.replace(self.root.encode("utf-8"), b"")
+
+
+class FakeAdbHandler(socketserver.BaseRequestHandler):
+    """Handles one client connection to the fake adb server"""
+
+    def recv_exact(self, size):
+        chunks = []
+        while size > 0:
+            chunk = self.request.recv(min(size, SYNC_DATA_MAX))
+            if not chunk:
+                raise ConnectionError("client closed connection")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def okay(self, payload=None):
+        if payload is None:
+            self.request.sendall(b"OKAY")
+        else:
+            data = payload.encode("utf-8")
+            self.request.sendall(b"OKAY" + b"%04x" % len(data) + data)
+
+    def fail(self, message):
+        data = message.encode("utf-8")
+        self.request.sendall(b"FAIL" + b"%04x" % len(data) + data)
+
+    def setup(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self):
+        server = self.server
+        device = None
+        try:
+            while True:
+                length = int(self.recv_exact(4), 16)
+                service = self.recv_exact(length).decode("utf-8")
+                server.count("requests")
+                if service == "host:version":
+                    self.okay("%04x" % 41)
+                    return
+                if service in ("host:devices", "host:devices-l"):
+                    self.okay("".join(f"{s}\tdevice\n" for s in server.devices))
+                    return
+                if service.startswith("host:transport"):
+                    device = server.find_device(service)
+                    if device is None:
+                        self.fail("device not found" if server.devices else "no devices/emulators found")
+                        return
+                    self.okay()
+                    continue
+                if device is None:
+                    self.fail(f"unknown host service: {service}")
+                    return
+                server.delay()
+                if service.startswith("shell:"):
+                    self.okay()
+                    self.run_command(device, service[len("shell:"):], merge_stderr=True)
+                elif service.startswith("exec:"):
+                    self.okay()
+                    self.run_command(device, service[len("exec:"):], merge_stderr=False)
+                elif service == "sync:":
+                    self.okay()
+                    self.sync(device)
+                else:
+                    self.fail(f"unknown service: {service}")
+                return
+        except (ConnectionError, OSError, ValueError):
+            return
+
+    def run_command(self, device, command, merge_stderr):
+        """Run a device command locally, streaming stdin and stdout over the socket"""
+        self.server.count("commands")
+        process = subprocess.Popen(
+            ["sh", "-c", device.map_command(command)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT if merge_stderr else subprocess.DEVNULL,
+            cwd=device.root,
+        )
+
+        def feed_stdin():
+            try:
+                while True:
+                    chunk = self.request.recv(SYNC_DATA_MAX)
+                    if not chunk:
+                        # Like the real adb server: a client that ends its input closes
+                        # the whole stream, so no output or exit status comes back
+                        process.kill()
+                        break
+                    self.server.throttle(len(chunk))
+                    self.server.count("bytes", len(chunk))
+                    process.stdin.write(chunk)
+            except OSError:
+                pass
+            finally:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+
+        feeder = threading.Thread(target=feed_stdin, daemon=True)
+        feeder.start()
+        while True:
+            chunk = process.stdout.read1(SYNC_DATA_MAX)
+            if not chunk:
+                break
+            self.server.throttle(len(chunk))
+            self.server.count("bytes", len(chunk))
+            self.request.sendall(device.unmap_output(chunk) if merge_stderr else chunk)
+        process.wait()
+
+    def sync(self, device):
+        """Serve sync: requests until QUIT or disconnect"""
+        while True:
+            header = self.recv_exact(8)
+            packet_id, length = header[:4], struct.unpack("<I", header[4:])[0]
+            if packet_id == b"QUIT":
+                return
+            path = self.recv_exact(length).decode("utf-8")
+            self.server.delay()
+            if packet_id == b"STAT":
+                self.sync_stat(device, path)
+            elif packet_id == b"LIST":
+                self.sync_list(device, path)
+            elif packet_id == b"SEND":
+                if not self.sync_send(device, path):
+                    return
+            elif packet_id == b"RECV":
+                if not self.sync_recv(device, path):
+                    return
+            else:
+                return
+
+    def sync_fail(self, message):
+        data = message.encode("utf-8")
+        self.request.sendall(b"FAIL" + struct.pack("<I", len(data)) + data)
+
+    def sync_stat(self, device, path):
+        try:
+            st = os.stat(device.local_path(path))
+            values = (st.st_mode, st.st_size & 0xFFFFFFFF, int(st.st_mtime))
+        except OSError:
+            values = (0, 0, 0)
+        self.request.sendall(b"STAT" + struct.pack("<III", *values))
+
+    def sync_list(self, device, path):
+        local = device.local_path(path)
+        try:
+            names = os.listdir(local)
+        except OSError:
+            names = []
+        for name in names:
+            st = os.lstat(os.path.join(local, name))
+            encoded = name.encode("utf-8")
+            self.request.sendall(
+                b"DENT" + struct.pack("<IIII", st.st_mode, st.st_size & 0xFFFFFFFF, int(st.st_mtime), len(encoded)) + encoded
+            )
+        self.request.sendall(b"DONE" + struct.pack("<IIII", 0, 0, 0, 0))
+
+    def sync_send(self, device, spec):
+        path, _, mode = spec.rpartition(",")
+        local = device.local_path(path)
+        self.server.count("transfers")
+        try:
+            directory = os.path.dirname(local)
+            os.makedirs(directory, exist_ok=True)
+            f = open(local, "wb")
+        except OSError as e:
+            f = None
+            error = str(e)
+        while True:
+            header = self.recv_exact(8)
+            packet_id, length = header[:4], struct.unpack("<I", header[4:])[0]
+            if packet_id == b"DATA":
+                data = self.recv_exact(length)
+                self.server.throttle(length)
+                self.server.count("bytes", length)
+                if f:
+                    f.write(data)
+            elif packet_id == b"DONE":
+                break
+            else:
+                return False
+        if f is None:
+            self.sync_fail(f"couldn't create file: {error}")
+            return False
+        f.close()
+        try:
+            os.chmod(local, int(mode) & 0o777)
+            if length:
+                os.utime(local, (length, length))
+        except (OSError, ValueError):
+            pass
+        self.request.sendall(b"OKAY" + struct.pack("<I", 0))
+        return True
+
+    def sync_recv(self, device, path):
+        self.server.count("transfers")
+        try:
+            f = open(device.local_path(path), "rb")
+        except OSError as e:
+            self.sync_fail(f"remote object '{path}' does not exist" if isinstance(e, FileNotFoundError) else str(e))
+            return False
+        with f:
+            while True:
+                data = f.read(SYNC_DATA_MAX)
+                if not data:
+                    break
+                self.server.throttle(len(data))
+                self.server.count("bytes", len(data))
+                self.request.sendall(b"DATA" + struct.pack("<I", len(data)) + data)
+        self.request.sendall(b"DONE" + struct.pack("<I", 0))
+        return True
+
+
+class FakeAdbServer(socketserver.ThreadingTCPServer):
+    """Threaded fake adb server serving one or more directory-backed devices"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, roots, host="127.0.0.1", port=0):
+        super().__init__((host, port), FakeAdbHandler)
+        if isinstance(roots, (str, os.PathLike)):
+            roots = {"emulator-5554": roots}
+        self.device_map = {serial: FakeDevice(serial, root) for serial, root in roots.items()}
+        self.devices = list(self.device_map)
+        self.latency = 0.0
+        self.bandwidth = 0
+        self.stats = {}
+        self._stats_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def find_device(self, service):
+        """Resolve a host:transport* request to a device"""
+        if service.startswith("host:transport:"):
+            return self.device_map.get(service[len("host:transport:"):])
+        if len(self.devices) == 1:
+            return self.device_map[self.devices[0]]
+        return None
+
+    def count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] = self.stats.get(key, 0) + amount
+
+    def delay(self):
+        """Simulate per-request link latency"""
+        if self.latency:
+            threading.Event().wait(self.latency)
+
+    def throttle(self, size):
+        """Simulate limited link bandwidth"""
+        if self.bandwidth:
+            threading.Event().wait(size / self.bandwidth)
+
+    def start(self):
+        """Serve requests in a background thread"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the listening socket"""
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fake adb server backed by a local directory")
+    parser.add_argument("root", help="directory used as the device filesystem")
+    parser.add_argument("--port", type=int, default=5037)
+    parser.add_argument("--serial", default="emulator-5554")
+    args = parser.parse_args()
+
+    server = FakeAdbServer({args.serial: args.root}, port=args.port)
+    print(f"Fake adb server for {args.serial} listening on 127.0.0.1:{server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
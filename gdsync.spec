@@ -1,6 +1,12 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
 import platform
 
+# A onefile build unpacks everything to a temp folder on every launch, the
+# default onedir build starts straight from dist/GDSync. GDSYNC_ONEFILE=1
+# still builds the single-file executable for releases.
+onefile = os.environ.get("GDSYNC_ONEFILE") == "1"
+
 # Determine icon file based on platform
 if platform.system() == "Windows":
     icon_file = 'icon.ico'
@@ -25,24 +31,28 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # Never imported by the GUI, keeps them out of the bundle
+    excludes=[
+        'tkinter',
+        'unittest',
+        'pydoc',
+        'PyQt6.QtNetwork',
+        'PyQt6.QtQml',
+        'PyQt6.QtQuick',
+    ],
     noarchive=False,
     optimize=0,
 )
 
 pyz = PYZ(a.pure)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.datas,
-    [],
+# UPX-packed libraries have to be unpacked in memory on every start
+exe_options = dict(
     name='GDSync',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=False,
     upx_exclude=[],
     runtime_tmpdir=None,
     console=False,
@@ -53,3 +63,30 @@ exe = EXE(
     entitlements_file=None,
     icon=icon_file
 )
+
+if onefile:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.datas,
+        [],
+        **exe_options
+    )
+else:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        **exe_options
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.datas,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        name='GDSync'
+    )
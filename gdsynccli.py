@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Command line front end for gdsync
+
+Runs the same sync engine as the GUIs without importing Qt or GTK, for
+scripts, build boxes and timing runs:
+
+    python gdsynccli.py pull --pc-path ~/.wine/.../GeometryDash --userdata
+    python gdsynccli.py push --pc-path ... --dry-run --json
+    python gdsynccli.py restore --pc-path ... --snapshot 20240101-120000
+
+--pc-path and --adb default to the save folder and adb found by the GUIs,
+which are kept in the gdsync config file.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from adbclient import AdbError
+from config import Config, adb_version
+import discovery
+from synccore import SyncEngine, ANDROID_SAVE_PATH, find_adb, sync_devices
+from scheduler import DEFAULT_WORKERS, MAX_WORKERS
+from planner import format_size, format_duration
+import manifest
+import snapshots
+import watcher
+
+
+def log_line(stream, message):
+    # One write per line so lines from parallel device syncs do not interleave
+    stream.write(f"{message}\n")
+    stream.flush()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Sync Geometry Dash data between the phone and the PC")
+    parser.add_argument("direction", choices=["pull", "push", "snapshots", "restore", "history", "discover"],
+                        help="pull: phone to PC, push: PC to phone, snapshots: list the PC snapshots, "
+                        "restore: put a PC snapshot back, history: transfer speed of past syncs, "
+                        "discover: list the GD save folders on this PC")
+    parser.add_argument("--pc-path", default=None, help="GD save folder on the PC (default: the one set up in the GUI)")
+    parser.add_argument("--android-path", default=ANDROID_SAVE_PATH, help="GD save folder on the phone")
+    parser.add_argument("--userdata", action="store_true", help="only sync the user data files")
+    parser.add_argument("--dry-run", action="store_true", help="show the sync plan without transferring")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON (log goes to stderr)")
+    parser.add_argument("--watch", action="store_true", help="keep running: push when the PC saves change, "
+                        "or pull when the phone saves change")
+    parser.add_argument("--debounce", type=float, default=watcher.DEFAULT_DEBOUNCE, help="seconds the PC saves must stay unchanged")
+    parser.add_argument("--interval", type=float, default=watcher.DEFAULT_DEVICE_INTERVAL, help="seconds between phone polls")
+    parser.add_argument("--adb", default=None, help="path of the adb binary (default: the one found last time, "
+                        "or the bundled one, or the one on PATH)")
+    parser.add_argument("-s", "--serial", action="append", help="device serial, repeat to sync several devices at once")
+    parser.add_argument("--all-devices", action="store_true", help="sync every attached device at once")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help=f"parallel transfers (1-{MAX_WORKERS})")
+    parser.add_argument("--merge", action="store_true", help="three-way merge CCLocalLevels.dat by level")
+    parser.add_argument("--no-bulk", action="store_true", help="never use the single-stream bulk transfer")
+    parser.add_argument("--no-incremental", action="store_true", help="transfer files even if unchanged")
+    parser.add_argument("--delta", action="store_true", help="try block delta transfers for large saves "
+                        "(rarely pays off, an edit shifts the compressed data)")
+    parser.add_argument("--no-compression", action="store_true", help="never compress on the wire")
+    parser.add_argument("--no-staging", action="store_true", help="push straight over the saves on the phone "
+                        "instead of staging and committing them")
+    parser.add_argument("--no-resume", action="store_true", help="do not continue an interrupted sync, copy everything again")
+    parser.add_argument("--no-snapshot", action="store_true", help="do not snapshot the PC saves before a pull")
+    parser.add_argument("--snapshot", default=None, help="snapshot id to restore (default: the newest)")
+    return parser
+
+
+def run_watch(engine, pc_path, args):
+    """Watch mode: sync every settled change until interrupted"""
+    try:
+        if args.direction == "push":
+            watcher.watch(engine, pc_path, args.android_path, userdata_only=args.userdata, debounce=args.debounce)
+        else:
+            os.makedirs(pc_path, exist_ok=True)
+            watcher.poll_device(engine, pc_path, args.android_path, interval=args.interval)
+    except KeyboardInterrupt:
+        engine.log("Stopped watching")
+    except OSError as e:
+        engine.log(f"Cannot watch {pc_path}: {str(e)}")
+        return 1
+    finally:
+        engine.close()
+    return 0
+
+
+def run_snapshots(pc_path, args):
+    """List the snapshots of the PC save folder or restore one"""
+    store = snapshots.SnapshotStore(pc_path)
+    available = store.list()
+    if args.direction == "snapshots":
+        if args.json:
+            json.dump([{"id": snapshot_id, **index} for snapshot_id, index in available], sys.stdout, indent=2)
+            print()
+        for snapshot_id, index in [] if args.json else available:
+            size = sum(entry["size"] for entry in index["files"].values())
+            print(f"{snapshot_id}  {len(index['files'])} files, {format_size(size)}  {index.get('reason', '')}")
+        return 0
+
+    if not available:
+        print("No snapshots to restore", file=sys.stderr)
+        return 1
+    snapshot_id = args.snapshot or available[-1][0]
+    indexes = dict(available)
+    if snapshot_id not in indexes:
+        print(f"No snapshot {snapshot_id}, list them with the snapshots command", file=sys.stderr)
+        return 1
+    if args.dry_run:
+        print(f"Would restore {', '.join(sorted(indexes[snapshot_id]['files']))} from {snapshot_id}")
+        return 0
+    try:
+        restored = store.restore(snapshot_id)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Could not restore {snapshot_id}: {str(e)}", file=sys.stderr)
+        return 1
+    print(f"Restored {len(restored)} files from {snapshot_id}")
+    return 0
+
+
+def print_history(pc_path, args):
+    """Show the transfer statistics recorded for past syncs, newest last"""
+    history = manifest.load_state(pc_path).get("history", [])
+    if args.json:
+        json.dump(history, sys.stdout, indent=2)
+        print()
+        return 0
+    for stats in history:
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stats["time"]))
+        print(
+            f"{when}  {stats['direction']:<4}  {stats['device'] or '-':<20}  "
+            f"{format_size(stats['bytes']):>10} in {format_duration(stats['seconds']):>7}  "
+            f"{format_size(stats['throughput'])}/s"
+        )
+    return 0
+
+
+def print_discovery(config, args):
+    """Scan for GD save folders again and list them, most recently played first"""
+    candidates = discovery.discover(config, refresh=True)
+    if args.json:
+        json.dump([candidate._asdict() for candidate in candidates], sys.stdout, indent=2)
+        print()
+        return 0 if candidates else 1
+    if not candidates:
+        print("No GD save folders found")
+        return 1
+    for candidate in candidates:
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(candidate.mtime))
+        print(f"{when}  {discovery.describe(candidate):<24}  {candidate.path}")
+    return 0
+
+
+def resolve_adb(config):
+    """adb found on an earlier run if the binary did not change, otherwise look for it and remember it"""
+    cached = config.cached_adb()
+    if cached:
+        return cached[0]
+    path = find_adb(getattr(sys, "_MEIPASS", None))
+    if path:
+        config.remember_adb(path, adb_version(path))
+    return path
+
+
+def engine_result(engine, success):
+    """JSON-friendly summary of one engine's sync"""
+    plan = engine.plan
+    return {
+        "success": success,
+        "transferred": engine.transferred,
+        "stats": engine.sync_stats,
+        "plan": None if plan is None else {
+            "actions": [action._asdict() for action in plan.actions],
+            "transfer_bytes": plan.transfer_bytes(),
+            "estimated_seconds": round(plan.estimate_seconds(), 3),
+        },
+    }
+
+
+def run_devices(engine, pc_path, args):
+    """Sync every selected device at once, returns (success, {serial: result})"""
+    serials = args.serial
+    if args.all_devices:
+        try:
+            serials = engine.list_devices()
+        except (AdbError, OSError) as e:
+            engine.log(f"Could not list devices: {str(e)}")
+            return False, {}
+        if not serials:
+            engine.log("No devices attached")
+            return False, {}
+    engine.log(f"Syncing {len(serials)} devices: {', '.join(serials)}")
+    results = sync_devices(engine, serials, pc_path, args.android_path, args.direction == "push", args.userdata)
+    for serial, (success, _) in results.items():
+        engine.log(f"[{serial}] {'OK' if success else 'FAILED'}")
+    return (
+        all(success for success, _ in results.values()),
+        {serial: engine_result(device_engine, success) for serial, (success, device_engine) in results.items()},
+    )
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.watch and (args.dry_run or args.json):
+        parser.error("--watch does not work with --dry-run or --json")
+    multi_device = args.all_devices or len(args.serial or []) > 1
+    if multi_device and (args.direction == "pull" or args.merge or args.watch):
+        parser.error("several devices can only be used with push, without --merge and --watch")
+    config = Config()
+    if args.direction == "discover":
+        return print_discovery(config, args)
+    pc_path = os.path.expanduser(args.pc_path) if args.pc_path else config.cached_gd_path()
+    if not pc_path:
+        parser.error("--pc-path is required until a GD save folder has been set up")
+    if args.direction in ("snapshots", "restore"):
+        return run_snapshots(pc_path, args)
+    if args.direction == "history":
+        return print_history(pc_path, args)
+    log_stream = sys.stderr if args.json else sys.stdout
+
+    engine = SyncEngine(
+        args.adb if args.adb is not None else resolve_adb(config),
+        log=lambda message: log_line(log_stream, message),
+        serial=args.serial[0] if args.serial and not multi_device else None,
+    )
+    engine.use_bulk_transfer = not args.no_bulk
+    engine.use_incremental = not args.no_incremental
+    engine.use_delta = args.delta
+    engine.use_compression = not args.no_compression
+    engine.use_merge = args.merge
+    engine.use_snapshots = not args.no_snapshot
+    engine.use_resume = not args.no_resume
+    engine.use_staging = not args.no_staging
+    engine.dry_run = args.dry_run
+    engine.transfer_workers = args.workers
+
+    to_phone = args.direction == "push"
+    if args.watch:
+        return run_watch(engine, pc_path, args)
+    start = time.perf_counter()
+    devices = {}
+    try:
+        if multi_device:
+            success, devices = run_devices(engine, pc_path, args)
+        else:
+            success = engine.sync(pc_path, args.android_path, to_phone, args.userdata)
+    except KeyboardInterrupt:
+        engine.log("Interrupted")
+        success = False
+    finally:
+        engine.close()
+    elapsed = time.perf_counter() - start
+    if not args.dry_run:
+        serials = list(devices) if multi_device else args.serial or []
+        config.remember_sync(pc_path, to_phone, success, serials)
+
+    if args.json:
+        result = {
+            "success": success,
+            "direction": args.direction,
+            "scope": "userdata" if args.userdata else "all",
+            "dry_run": args.dry_run,
+            "seconds": round(elapsed, 3),
+        }
+        if multi_device:
+            result["devices"] = devices
+        else:
+            result.update(engine_result(engine, success))
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    else:
+        print(("Sync completed successfully" if success else "Sync completed with errors") + f" in {elapsed:.1f}s")
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,8 @@
+import time
+
+# Taken before the toolkit is imported, for the startup benchmark
+START_TIME = time.perf_counter()
+
 import sys
 import os
 import subprocess
@@ -12,18 +17,26 @@ gi.require_version('Adw', '1')
 
 from gi.repository import Gtk, GObject, Gio, Adw, GLib
 from threading import Thread
-import time
+from scheduler import DEFAULT_WORKERS, MAX_WORKERS
+from logpipe import LogPipeline, FLUSH_INTERVAL_MS, MAX_VIEW_LINES
+from config import Config, adb_version
+import discovery
+
+# Set by benchmarks/bench_startup.py: print the time to the first frame and quit
+STARTUP_PROBE_ENV = "GDSYNC_STARTUP_PROBE"
 
 class InstallationSetupDialog(Gtk.Window):
     """Dialog for setting up GD installation path"""
     
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, candidates=None):
         super().__init__()
         self.set_title("Geometry Dash Installation Setup")
         self.set_default_size(500, 400)
         self.set_transient_for(parent)
         self.set_modal(True)
         self.selected_path = ""
+        # Save folders found by discovery, listed first
+        self.candidates = candidates or []
         self.response_callback = None
         self.init_ui()
         
@@ -42,6 +55,8 @@ class InstallationSetupDialog(Gtk.Window):
         
         # Installation type dropdown
         self.installation_combo = Gtk.ComboBoxText()
+        for candidate in self.candidates:
+            self.installation_combo.append_text(f"Found: {discovery.describe(candidate)}")
         self.installation_combo.append_text("Wine (Default)")
         self.installation_combo.append_text("Steam with Proton")
         self.installation_combo.append_text("Manual/Custom Path")
@@ -99,8 +114,18 @@ class InstallationSetupDialog(Gtk.Window):
         home_dir = os.path.expanduser("~")
         username = os.environ.get("USER", "user")
         selection = combo.get_active_text()
+        index = combo.get_active()
         
-        if selection == "Wine (Default)":
+        if 0 <= index < len(self.candidates):
+            candidate = self.candidates[index]
+            self.selected_path = candidate.path
+            self.browse_btn.set_sensitive(False)
+            info_text = (
+                f"Found by scanning the {candidate.source} prefixes.\n"
+                f"CCGameManager.dat last saved {time.strftime('%Y-%m-%d %H:%M', time.localtime(candidate.mtime))}.\n"
+                f"Path: {self.selected_path}"
+            )
+        elif selection == "Wine (Default)":
             self.selected_path = os.path.join(home_dir, ".wine", "drive_c", "users", username, "AppData", "Local", "GeometryDash")
             self.browse_btn.set_sensitive(False)
             info_text = (
@@ -172,7 +197,7 @@ class SyncWorker(GObject.Object):
     """Worker for sync operations to prevent UI freezing"""
     
     __gsignals__ = {
-        'progress-updated': (GObject.SignalFlags.RUN_FIRST, None, (int, int)),
+        'progress-updated': (GObject.SignalFlags.RUN_FIRST, None, (GObject.TYPE_INT64, GObject.TYPE_INT64, float, float)),
         'log-message': (GObject.SignalFlags.RUN_FIRST, None, (str,)),
         'sync-finished': (GObject.SignalFlags.RUN_FIRST, None, (bool,)),
     }
@@ -206,10 +231,44 @@ class GDSync(Adw.ApplicationWindow):
         self.adb_path = ""
         self.gd_pc_path = ""
         self.sync_worker = None
+        self.sync_target = None
+        self.log_pipeline = LogPipeline()
+        self.config = Config()
+        # Created on the first sync, so the window does not wait for the engine imports
+        self.engine = None
         self.init_ui()
-        self.detect_adb()
-        self.setup_gd_installation_auto()
+        
+        # Engine log lines are queued and shown in batches
+        GLib.timeout_add(FLUSH_INTERVAL_MS, self.flush_log)
+        self.load_config()
         self.log("GDSync initialized. Ready for operation.")
+    
+    def load_config(self):
+        """Take the ADB and GD paths of an earlier launch, if they are still valid"""
+        cached_adb = self.config.cached_adb()
+        if cached_adb:
+            self.adb_path, version = cached_adb
+            self.log(f"Using ADB from config: {self.adb_path} (version {version or 'unknown'})")
+        gd_path = self.config.cached_gd_path()
+        if gd_path:
+            self.gd_pc_path = gd_path
+            self.install_label.set_text(f"GD Installation: {gd_path}")
+            self.log(f"GD installation path loaded from config: {gd_path}")
+    
+    def finish_startup(self):
+        """Startup work that runs once the window is on screen, if the config did not cover it"""
+        if not self.adb_path:
+            self.detect_adb()
+        if not self.gd_pc_path:
+            self.setup_gd_installation_auto()
+        return GLib.SOURCE_REMOVE
+    
+    def get_engine(self):
+        """Get the sync engine, importing and creating it on first use"""
+        if self.engine is None:
+            from synccore import SyncEngine
+            self.engine = SyncEngine(log=self.sync_log, progress=self.report_progress)
+        return self.engine
         
     def init_ui(self):
         # Main box
@@ -303,6 +362,43 @@ class GDSync(Adw.ApplicationWindow):
         data_box.append(self.all_data)
         main_box.append(data_box)
         
+        # Transfer options
+        options_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=20)
+        options_label = Gtk.Label(label="Options:")
+        options_label.set_size_request(80, -1)
+        
+        self.bulk_transfer = Gtk.CheckButton(label="Bulk transfer (single stream for all data)")
+        self.bulk_transfer.set_active(True)
+        self.incremental = Gtk.CheckButton(label="Skip unchanged files")
+        self.incremental.set_active(True)
+        self.delta_mode = Gtk.CheckButton(label="Delta transfer for large saves")
+        self.delta_mode.set_active(False)
+        
+        options_box.append(options_label)
+        options_box.append(self.bulk_transfer)
+        options_box.append(self.incremental)
+        options_box.append(self.delta_mode)
+        main_box.append(options_box)
+        
+        # Parallel transfers
+        workers_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=20)
+        workers_label = Gtk.Label(label="Parallel transfers:")
+        self.workers_spin = Gtk.SpinButton.new_with_range(1, MAX_WORKERS, 1)
+        self.workers_spin.set_value(DEFAULT_WORKERS)
+        self.compress_mode = Gtk.CheckButton(label="Compress on the wire")
+        self.compress_mode.set_active(True)
+        self.merge_mode = Gtk.CheckButton(label="Merge levels")
+        self.merge_mode.set_tooltip_text("Three-way merge of CCLocalLevels.dat by level instead of overwriting it")
+        self.dry_run_mode = Gtk.CheckButton(label="Dry run")
+        self.dry_run_mode.set_tooltip_text("Only show what would be transferred and how long it would take")
+        
+        workers_box.append(workers_label)
+        workers_box.append(self.workers_spin)
+        workers_box.append(self.compress_mode)
+        workers_box.append(self.merge_mode)
+        workers_box.append(self.dry_run_mode)
+        main_box.append(workers_box)
+        
         # Buttons section
         button_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
         button_box.set_halign(Gtk.Align.END)
@@ -320,32 +416,51 @@ class GDSync(Adw.ApplicationWindow):
         
         self.set_content(main_box)
     
+    def discover_gd_installations(self, callback):
+        """Find the GD save folders, from the config cache or on a worker thread, then call callback(candidates) on the UI thread"""
+        cached = discovery.cached_candidates(self.config)
+        if cached:
+            callback(cached)
+            return
+        self.log("Looking for GD save folders...")
+        Thread(target=self.discover_worker, args=(callback,), daemon=True).start()
+    
+    def discover_worker(self, callback):
+        """Scan for GD save folders, off the UI thread"""
+        candidates = discovery.find_candidates()
+        GLib.idle_add(self.on_gd_discovered, candidates, callback)
+    
+    def on_gd_discovered(self, candidates, callback):
+        """Cache the scan result and hand it on, on the UI thread"""
+        discovery.remember_candidates(self.config, candidates)
+        callback(candidates)
+        return GLib.SOURCE_REMOVE
+    
     def setup_gd_installation_auto(self):
         """Auto-setup GD installation if possible"""
-        home_dir = os.path.expanduser("~")
-        username = os.environ.get("USER", "user")
-        
-        # Try Wine path first
-        wine_path = os.path.join(home_dir, ".wine", "drive_c", "users", username, "AppData", "Local", "GeometryDash")
-        if os.path.exists(wine_path):
-            self.gd_pc_path = wine_path
-            self.install_label.set_text(f"GD Installation: {wine_path}")
-            self.log(f"Auto-detected Wine GD installation: {wine_path}")
-            return
-        
-        # Try Steam with Proton path
-        steam_path = os.path.join(home_dir, ".local", "share", "Steam", "steamapps", "compatdata", "322170", "pfx", "drive_c", "users", "steamuser", "AppData", "Local", "GeometryDash")
-        if os.path.exists(steam_path):
-            self.gd_pc_path = steam_path
-            self.install_label.set_text(f"GD Installation: {steam_path}")
-            self.log(f"Auto-detected Steam GD installation: {steam_path}")
+        self.discover_gd_installations(self.on_auto_discovered)
+    
+    def on_auto_discovered(self, candidates):
+        """Take the most recently played GD installation found, if any"""
+        if candidates:
+            # The most recently played install
+            candidate = candidates[0]
+            self.gd_pc_path = candidate.path
+            self.install_label.set_text(f"GD Installation: {candidate.path}")
+            self.config.remember_gd_path(candidate.path)
+            self.log(f"Auto-detected {discovery.describe(candidate)} GD installation: {candidate.path}")
+            if len(candidates) > 1:
+                self.log(f"Found {len(candidates)} GD save folders, use Setup GD Installation to pick another one")
             return
         
         self.log("No GD installation auto-detected. Please setup manually.")
     
     def setup_gd_installation(self, button):
         """Setup Geometry Dash installation path"""
-        dialog = InstallationSetupDialog(self)
+        self.discover_gd_installations(self.show_setup_dialog)
+    
+    def show_setup_dialog(self, candidates):
+        dialog = InstallationSetupDialog(self, candidates)
         dialog.run_async(self.on_setup_response)
     
     def on_setup_response(self, response, path):
@@ -354,6 +469,7 @@ class GDSync(Adw.ApplicationWindow):
             if path and self.validate_gd_installation(path):
                 self.gd_pc_path = path
                 self.install_label.set_text(f"GD Installation: {path}")
+                self.config.remember_gd_path(path)
                 self.log(f"GD installation path set to: {path}")
             elif path:
                 self.log(f"Invalid GD installation path: {path}")
@@ -397,6 +513,7 @@ class GDSync(Adw.ApplicationWindow):
                 self.log("Warning: CCGameManager.dat not found. Continuing anyway...")
                 self.gd_pc_path = path
                 self.install_label.set_text(f"GD Installation: {path}")
+                self.config.remember_gd_path(path)
                 self.log(f"GD installation path set to: {path}")
             else:
                 info_dialog = Gtk.AlertDialog()
@@ -445,21 +562,45 @@ class GDSync(Adw.ApplicationWindow):
         return base_path
     
     def log(self, message):
-        """Add message to the logs panel"""
-        buffer = self.logs_text.get_buffer()
-        end_iter = buffer.get_end_iter()
-        buffer.insert(end_iter, message + "\n")
-        
-        # Auto-scroll to bottom
-        mark = buffer.get_insert()
-        self.logs_text.scroll_mark_onscreen(mark)
-    
-    def update_progress(self, value, max_value=100):
+        """Add message to the logs panel, from the UI thread"""
+        self.log_pipeline.put(message)
+        self.flush_log()
+    
+    def flush_log(self):
+        """Show the queued log lines in one update, keeping at most MAX_VIEW_LINES"""
+        lines, skipped = self.log_pipeline.drain()
+        if skipped:
+            lines.insert(0, self.log_pipeline.skipped_message(skipped))
+        if lines:
+            buffer = self.logs_text.get_buffer()
+            buffer.insert(buffer.get_end_iter(), "\n".join(lines) + "\n")
+            
+            # Drop the oldest lines
+            excess = buffer.get_line_count() - MAX_VIEW_LINES
+            if excess > 0:
+                buffer.delete(buffer.get_start_iter(), buffer.get_iter_at_line(excess)[1])
+            
+            # Auto-scroll to bottom
+            buffer.place_cursor(buffer.get_end_iter())
+            self.logs_text.scroll_mark_onscreen(buffer.get_insert())
+        return GLib.SOURCE_CONTINUE
+    
+    def report_progress(self, done, total, rate, eta):
+        """Report byte progress from the worker thread to the UI"""
+        worker = self.sync_worker
+        if worker:
+            GLib.idle_add(lambda: worker.emit('progress-updated', done, total, rate, eta))
+    
+    def sync_log(self, message):
+        """Log a message from the sync engine, which may run in the worker thread"""
+        self.log_pipeline.put(message)
+    
+    def update_progress(self, value, max_value=100, text=None):
         """Update progress bar"""
         if max_value > 0:
             fraction = value / max_value
             self.progress_bar.set_fraction(fraction)
-            self.progress_bar.set_text(f"{value}/{max_value}")
+            self.progress_bar.set_text(text or f"{value}/{max_value}")
         else:
             self.progress_bar.set_fraction(0)
             self.progress_bar.set_text("0/0")
@@ -591,36 +732,39 @@ class GDSync(Adw.ApplicationWindow):
             return False
     
     def detect_adb(self):
-        """Attempt to detect ADB on the system"""
+        """Look for ADB in a background thread, the result arrives in on_adb_detected"""
+        Thread(target=self.detect_adb_worker, daemon=True).start()
+    
+    def detect_adb_worker(self):
+        """Find ADB and ask for its version, off the UI thread"""
+        path, source = self.find_adb()
+        GLib.idle_add(self.on_adb_detected, path, source, adb_version(path) if path else "")
+    
+    def find_adb(self):
+        """Return (ADB path, where it was found), the path is empty if there is none"""
         # First, try bundled ADB (for Windows PyInstaller builds)
         bundled_adb_path = os.path.join(self.get_resource_path(), "adb", "adb.exe" if platform.system() == "Windows" else "adb")
         if os.path.exists(bundled_adb_path):
-            self.adb_path = bundled_adb_path
-            self.log(f"Using bundled ADB: {self.adb_path}")
-            return
+            return bundled_adb_path, "bundled"
+        
+        # Search PATH in-process instead of spawning which/where
+        return shutil.which("adb") or "", "PATH"
+    
+    def on_adb_detected(self, path, source, version):
+        """Handle the result of detect_adb on the UI thread"""
+        if path:
+            self.adb_path = path
+            self.config.remember_adb(path, version)
+            if source == "bundled":
+                self.log(f"Using bundled ADB: {self.adb_path} (version {version or 'unknown'})")
+            else:
+                self.log(f"ADB found in PATH: {self.adb_path} (version {version or 'unknown'})")
+            return GLib.SOURCE_REMOVE
         
-        # Try to find ADB in PATH
-        try:
-            if platform.system() == "Windows":
-                process = subprocess.run(["where", "adb"], capture_output=True, text=True)
-                if process.returncode == 0:
-                    self.adb_path = process.stdout.strip().split("\n")[0]
-            else:  # Linux/Unix
-                process = subprocess.run(["which", "adb"], capture_output=True, text=True)
-                if process.returncode == 0:
-                    self.adb_path = process.stdout.strip()
-            
-            if self.adb_path:
-                self.log(f"ADB found in PATH: {self.adb_path}")
-                return
-            
-            # ADB not found, show installation options
-            self.log("ADB not found on system.")
-            self.show_adb_installation_dialog()
-                    
-        except Exception as e:
-            self.log(f"Error detecting ADB: {str(e)}")
-            self.show_adb_installation_dialog()
+        # ADB not found, show installation options
+        self.log("ADB not found on system.")
+        self.show_adb_installation_dialog()
+        return GLib.SOURCE_REMOVE
     
     def show_adb_installation_dialog(self):
         """Show ADB installation dialog based on OS"""
@@ -672,198 +816,18 @@ class GDSync(Adw.ApplicationWindow):
     
     def get_geometry_dash_paths(self):
         """Get paths for Geometry Dash data"""
+        from synccore import ANDROID_SAVE_PATH
+        
         # Android path is always the same
-        gd_android_path = "/storage/emulated/0/Android/media/com.geode.launcher/save"
+        gd_android_path = ANDROID_SAVE_PATH
         
         # Use the configured PC path
         return self.gd_pc_path, gd_android_path
     
-    def should_exclude_path(self, file_path):
-        """Check if a file/folder should be excluded from sync"""
-        excluded_patterns = [
-            "geode/mods/tobyadd.gdh/Macros",
-            "/geode/mods/tobyadd.gdh/Macros/",
-            "\\geode\\mods\\tobyadd.gdh\\Macros\\",
-            "geode\\mods\\tobyadd.gdh\\Macros"
-        ]
-        
-        for pattern in excluded_patterns:
-            if pattern in file_path:
-                return True
-        return False
-    
-    def get_files_to_sync(self, directory):
-        """Get list of files to sync, excluding directories and unwanted paths"""
-        files_to_sync = []
-        
-        if not os.path.exists(directory):
-            return files_to_sync
-        
-        # Only get files from the root directory, exclude subfolders
-        try:
-            for item in os.listdir(directory):
-                item_path = os.path.join(directory, item)
-                if os.path.isfile(item_path) and not self.should_exclude_path(item_path):
-                    files_to_sync.append((item_path, item))
-        except Exception as e:
-            self.log(f"Error reading directory {directory}: {str(e)}")
-        
-        return files_to_sync
-    
-    def run_adb_command(self, command):
-        """Run an ADB command and log the output"""
-        if not self.adb_path:
-            self.log("Error: ADB path not set. Please configure in Settings.")
-            return False
-        
-        try:
-            full_command = [self.adb_path] + command
-            self.log(f"Running: {' '.join(full_command)}")
-            
-            process = subprocess.run(
-                full_command, 
-                capture_output=True,
-                text=True
-            )
-            
-            if process.stdout:
-                self.log(process.stdout)
-            
-            if process.returncode != 0:
-                if process.stderr:
-                    self.log(f"Error: {process.stderr}")
-                return False
-            
-            return True
-        except Exception as e:
-            self.log(f"Error executing command: {str(e)}")
-            return False
-    
-    def sync_phone_to_pc_userdata(self, pc_path, android_path):
-        """Sync only user data from phone to PC"""
-        self.log("Syncing user data from phone to PC...")
-        
-        files = [
-            "CCLocalLevels.dat", 
-            "CCLocalLevels2.dat", 
-            "CCGameManager.dat",
-            "CCGameManager2.dat",
-            "sfxlibrary.dat",
-            "musiclibrary.dat"
-        ]
-        
-        success = True
-        for i, file in enumerate(files):
-            if self.sync_worker:
-                GLib.idle_add(lambda i=i, total=len(files): self.sync_worker.emit('progress-updated', i, total))
-            if not self.run_adb_command(["pull", f"{android_path}/{file}", pc_path]):
-                success = False
-        
-        if self.sync_worker:
-            GLib.idle_add(lambda: self.sync_worker.emit('progress-updated', len(files), len(files)))
-        return success
-    
-    def sync_pc_to_phone_userdata(self, pc_path, android_path):
-        """Sync only user data from PC to phone"""
-        self.log("Syncing user data from PC to phone...")
-        
-        files = [
-            "CCLocalLevels.dat", 
-            "CCLocalLevels2.dat", 
-            "CCGameManager.dat",
-            "CCGameManager2.dat",
-            "sfxlibrary.dat",
-            "musiclibrary.dat"
-        ]
-        
-        success = True
-        for i, file in enumerate(files):
-            if self.sync_worker:
-                GLib.idle_add(lambda i=i, total=len(files): self.sync_worker.emit('progress-updated', i, total))
-            file_path = os.path.join(pc_path, file)
-            if os.path.exists(file_path):
-                if not self.run_adb_command(["push", file_path, android_path]):
-                    success = False
-            else:
-                self.log(f"Warning: File not found: {file_path}")
-                success = False
-        
-        if self.sync_worker:
-            GLib.idle_add(lambda: self.sync_worker.emit('progress-updated', len(files), len(files)))
-        return success
-    
-    def sync_phone_to_pc_all(self, pc_path, android_path):
-        """Sync all data from phone to PC, file by file"""
-        self.log("Syncing all data from phone to PC...")
-        
-        # Get list of files only from the root directory (no subdirectories)
-        result = subprocess.run(
-            [self.adb_path, "shell", f"find {android_path} -maxdepth 1 -type f"],
-            capture_output=True,
-            text=True
-        )
-        
-        if result.returncode != 0:
-            self.log(f"Error getting file list: {result.stderr}")
-            return False
-        
-        all_files = [f.strip() for f in result.stdout.strip().split('\n') if f.strip()]
-        # Filter out excluded paths
-        files = [f for f in all_files if not self.should_exclude_path(f)]
-        success = True
-        
-        self.log(f"Found {len(files)} files to sync from root directory")
-        for i, file_path in enumerate(files):
-            if self.sync_worker:
-                GLib.idle_add(lambda i=i, total=len(files): self.sync_worker.emit('progress-updated', i, total))
-            
-            # Get just the filename for local storage
-            filename = os.path.basename(file_path)
-            local_file_path = os.path.join(pc_path, filename)
-            
-            self.log(f"Pulling file {i+1}/{len(files)}: {filename}")
-            if not self.run_adb_command(["pull", file_path, local_file_path]):
-                success = False
-        
-        if self.sync_worker:
-            GLib.idle_add(lambda: self.sync_worker.emit('progress-updated', len(files), len(files)))
-        return success
-    
-    def sync_pc_to_phone_all(self, pc_path, android_path):
-        """Sync all data from PC to phone, file by file"""
-        self.log("Syncing all data from PC to phone...")
-        
-        if not os.path.exists(pc_path):
-            self.log(f"Error: PC path does not exist: {pc_path}")
-            return False
-        
-        # Get files to sync (only from root directory, excluding subfolders)
-        files_to_sync = self.get_files_to_sync(pc_path)
-        
-        if not files_to_sync:
-            self.log("No files found to sync")
-            return False
-        
-        self.log(f"Found {len(files_to_sync)} files to sync from root directory")
-        success = True
-        
-        for i, (file_path, filename) in enumerate(files_to_sync):
-            if self.sync_worker:
-                GLib.idle_add(lambda i=i, total=len(files_to_sync): self.sync_worker.emit('progress-updated', i, total))
-            
-            # Push the file directly to the android path
-            remote_file_path = f"{android_path}/{filename}"
-            self.log(f"Pushing file {i+1}/{len(files_to_sync)}: {filename}")
-            if not self.run_adb_command(["push", file_path, remote_file_path]):
-                success = False
-        
-        if self.sync_worker:
-            GLib.idle_add(lambda: self.sync_worker.emit('progress-updated', len(files_to_sync), len(files_to_sync)))
-        return success
-    
-    def on_sync_progress(self, worker, current, total):
-        """Handle progress updates from worker thread"""
-        self.update_progress(current, total)
+    def on_sync_progress(self, worker, done, total, rate, eta):
+        """Handle byte progress updates from worker thread"""
+        from progress import format_progress
+        self.update_progress(done, total, format_progress(done, total, rate, eta))
     
     def on_sync_log(self, worker, message):
         """Handle log messages from worker thread"""
@@ -873,8 +837,15 @@ class GDSync(Adw.ApplicationWindow):
         """Handle sync completion"""
         self.sync_btn.set_sensitive(True)
         self.sync_worker = None
-        
-        if success:
+        self.flush_log()
+        if self.sync_target and not self.engine.dry_run:
+            pc_path, to_phone, serials = self.sync_target
+            self.config.remember_sync(pc_path, to_phone, success, serials)
+        
+        if success and self.engine.dry_run:
+            self.log("Dry run finished, no files were transferred.")
+            self.show_info_dialog("Dry Run", "Dry run finished. The sync plan is shown in the log.")
+        elif success:
             self.log("Sync completed successfully!")
             self.show_info_dialog("Success", "Geometry Dash data sync completed successfully!")
         else:
@@ -900,35 +871,53 @@ class GDSync(Adw.ApplicationWindow):
         self.progress_bar.set_text("0/0")
         
         # Check ADB device connection
+        engine = self.get_engine()
+        engine.adb_path = self.adb_path
         self.log("Checking device connection...")
-        if not self.run_adb_command(["devices"]):
+        try:
+            serials = engine.list_devices()
+        except Exception as e:
+            self.log(f"Could not list devices: {str(e)}")
+            serials = []
+        if not serials:
             self.show_error_dialog("Error", "Failed to connect to ADB device. Make sure your device is connected and USB debugging is enabled.")
             return
+        self.log(f"Connected devices: {', '.join(serials)}")
+        self.config.remember_devices(serials)
         
-        pc_path, android_path = self.get_geometry_dash_paths()
+        to_phone = not self.phone_to_pc.get_active()
+        if len(serials) > 1 and (not to_phone or self.merge_mode.get_active()):
+            self.show_error_dialog("Error", f"{len(serials)} devices are connected. Several devices can only be synced at once from PC to phone, without level merging. Connect only one device for this sync.")
+            return
         
-        # Make sure PC path exists
-        if not os.path.exists(pc_path):
-            os.makedirs(pc_path, exist_ok=True)
-            self.log(f"Created PC directory: {pc_path}")
+        pc_path, android_path = self.get_geometry_dash_paths()
         
         # Disable sync button during operation
         self.sync_btn.set_sensitive(False)
-        
-        # Determine which sync operation to perform and start worker thread
-        if self.phone_to_pc.get_active():
-            if self.only_userdata.get_active():
-                sync_func = self.sync_phone_to_pc_userdata
-            else:
-                sync_func = self.sync_phone_to_pc_all
-        else:  # PC to Phone
-            if self.only_userdata.get_active():
-                sync_func = self.sync_pc_to_phone_userdata
-            else:
-                sync_func = self.sync_pc_to_phone_all
-        
-        # Create and start worker thread
-        self.sync_worker = SyncWorker(sync_func, pc_path, android_path)
+        engine.use_bulk_transfer = self.bulk_transfer.get_active()
+        engine.use_incremental = self.incremental.get_active()
+        engine.use_delta = self.delta_mode.get_active()
+        engine.use_compression = self.compress_mode.get_active()
+        engine.use_merge = self.merge_mode.get_active()
+        engine.dry_run = self.dry_run_mode.get_active()
+        engine.transfer_workers = self.workers_spin.get_value_as_int()
+        
+        # Create and start worker thread, one engine per device when several are connected
+        self.sync_target = (pc_path, to_phone, serials)
+        if len(serials) > 1:
+            from synccore import sync_all_devices
+            self.sync_worker = SyncWorker(
+                sync_all_devices, engine, serials, pc_path, android_path,
+                to_phone, self.only_userdata.get_active()
+            )
+        else:
+            if engine.serial != serials[0]:
+                engine.close()
+                engine.serial = serials[0]
+            self.sync_worker = SyncWorker(
+                engine.sync, pc_path, android_path,
+                to_phone, self.only_userdata.get_active()
+            )
         self.sync_worker.connect('progress-updated', self.on_sync_progress)
         self.sync_worker.connect('log-message', self.on_sync_log)
         self.sync_worker.connect('sync-finished', self.on_sync_finished)
@@ -942,10 +931,23 @@ class GDSyncApp(Adw.Application):
     def on_activate(self, app):
         self.window = GDSync(self)
         self.window.present()
+        if os.environ.get(STARTUP_PROBE_ENV):
+            # Default-priority idles run after GTK's layout and paint of the first frame
+            GLib.idle_add(self.report_first_frame)
+        else:
+            GLib.idle_add(self.window.finish_startup)
+    
+    def report_first_frame(self):
+        print(f"first-frame {time.perf_counter() - START_TIME:.4f}", flush=True)
+        self.quit()
+        return GLib.SOURCE_REMOVE
 
 def main():
     app = GDSyncApp()
-    return app.run(sys.argv)
+    exit_code = app.run(sys.argv)
+    if getattr(app, "window", None):
+        app.window.log_pipeline.close()
+    return exit_code
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,180 @@
+"""
+Per-level index of CCLocalLevels saves
+
+Next to a levels save, gdsync keeps a small JSON sidecar listing every entry
+of the decoded save: the level key, its name, the md5 of the entry's value
+XML and its byte span in the decoded stream. The key is left out of the hash:
+GD adds new levels at k_0 and shifts the keys of all others, which must not
+make every level look changed. The index is built in one streaming pass
+(savefile.iter_save with offsets) and is trusted while the save keeps its
+size and mtime, so two saves can be compared, and their changed levels
+listed, by reading two small JSON files instead of decoding and parsing both
+saves in full. The merge uses this to skip the three-way merge when only one
+side changed since the last one.
+"""
+
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+import merge
+import savefile
+
+INDEX_DIRNAME = ".gdsync-index"
+INDEX_VERSION = 2
+
+# parent: "" for a top-level entry or the dict a level is in (LLM_01),
+# name: the level name ("" for other entries), hash: md5 of the entry's value
+# XML without its <k> key, start/end: the byte span of the whole entry
+IndexEntry = namedtuple("IndexEntry", ["parent", "key", "name", "hash", "start", "end"])
+
+
+class LevelIndex:
+    """Entries of one save plus the size and mtime of the file they describe"""
+
+    def __init__(self, entries, signature=None):
+        self.entries = entries
+        self.signature = signature
+
+    def same_content(self, other):
+        """True if both saves hold the same entries under the same keys, byte for byte"""
+        if other is None:
+            return False
+        return [entry[:4] for entry in self.entries] == [entry[:4] for entry in other.entries]
+
+    def levels(self):
+        """Level entries as {name: entry}, named like merge.index_levels names them"""
+        entries = sorted(
+            (int(entry.key[2:]), entry) for entry in self.entries
+            if entry.parent == merge.LEVELS_KEY and entry.key.startswith("k_") and entry.key[2:].isdigit()
+        )
+        levels = {}
+        seen = {}
+        for _, entry in entries:
+            seen[entry.name] = seen.get(entry.name, 0) + 1
+            levels[entry.name if seen[entry.name] == 1 else f"{entry.name}#{seen[entry.name]}"] = entry
+        return levels
+
+
+def file_signature(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def index_path(path):
+    """Where the index of the save at path is kept"""
+    return os.path.join(os.path.dirname(path), INDEX_DIRNAME, os.path.basename(path) + ".json")
+
+
+def build_index(path):
+    """Index the save at path in one streaming pass"""
+    signature = file_signature(path)
+    # Decoded bytes not hashed yet, starting at offset base of the stream
+    buffer = bytearray()
+    base = 0
+
+    def chunks(src):
+        for chunk in savefile._decode_chunks(src, savefile._DECODE_TABLE, savefile._DECODE_JUNK, savefile.STREAM_CHUNK_SIZE):
+            buffer.extend(chunk)
+            yield chunk
+
+    entries = []
+    with open(path, "rb") as f:
+        for keys, value, start, end in savefile.iter_plist(chunks(f), offsets=True):
+            span = buffer[start - base:end - base]
+            # Hash the value only, the span starts with the <k>key</k> of the entry
+            digest = hashlib.md5(span[span.find(b"</k>") + len(b"</k>"):]).hexdigest()
+            del buffer[:end - base]
+            base = end
+            name = ""
+            if len(keys) == 2 and isinstance(value, dict):
+                name = str(value.get(merge.NAME_KEY, ""))
+            parent, key = keys if len(keys) == 2 else ("", keys[0])
+            entries.append(IndexEntry(parent, key, name, digest, start, end))
+    return LevelIndex(entries, signature)
+
+
+def load_index(path):
+    """The stored index of the save at path, or None if missing or out of date"""
+    try:
+        with open(index_path(path), "r") as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION or data.get("signature") != file_signature(path):
+            return None
+        return LevelIndex([IndexEntry(*entry) for entry in data["entries"]], data["signature"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_index(path, index):
+    """Atomically write the index of the save at path"""
+    sidecar = index_path(path)
+    os.makedirs(os.path.dirname(sidecar), exist_ok=True)
+    with open(sidecar + ".tmp", "w") as f:
+        json.dump({"version": INDEX_VERSION, "signature": index.signature, "entries": index.entries}, f)
+    os.replace(sidecar + ".tmp", sidecar)
+
+
+def get_index(path, save=True, same_as=None):
+    """Index of the save at path: the stored one while still valid, else built and stored
+
+    same_as is the index of a save with the same content (the file path was
+    just copied from), which is reused instead of reading the file again.
+    """
+    index = load_index(path)
+    if index is not None:
+        return index
+    if same_as is not None:
+        index = LevelIndex(same_as.entries, file_signature(path))
+    else:
+        index = build_index(path)
+    if save:
+        save_index(path, index)
+    return index
+
+
+def diff_indexes(old, new):
+    """Level names (added, removed, changed) going from one index to the other"""
+    old_levels = old.levels()
+    new_levels = new.levels()
+    added = [name for name in new_levels if name not in old_levels]
+    removed = [name for name in old_levels if name not in new_levels]
+    changed = [name for name, entry in new_levels.items() if name in old_levels and old_levels[name].hash != entry.hash]
+    return added, removed, changed
+
+
+def describe_diff(old, new):
+    """Short summary of a diff, like: 2 changed, 1 new"""
+    added, removed, changed = diff_indexes(old, new)
+    parts = [f"{len(names)} {label}" for names, label in ((changed, "changed"), (added, "new"), (removed, "deleted")) if names]
+    return ", ".join(parts) or "no level changes"
+
+
+def quick_merge(base_file, pc_file, phone_file):
+    """Merge from the indexes alone when at most one side changed since the base
+
+    Returns (MergeResult without data, index of the merged save, summary of
+    the changes taken) or None when there is no base or both sides changed,
+    and a full merge is needed.
+    """
+    if base_file is None or not os.path.exists(base_file):
+        return None
+    base = get_index(base_file)
+    pc = get_index(pc_file)
+    phone = get_index(phone_file, save=False)
+    if pc.same_content(phone) or phone.same_content(base):
+        merged, changes = pc, describe_diff(base, pc)
+        pc_changed = False
+        phone_changed = not pc.same_content(phone)
+    elif pc.same_content(base):
+        merged, changes = phone, describe_diff(base, phone)
+        pc_changed = True
+        phone_changed = False
+    else:
+        return None
+    result = merge.MergeResult(
+        None, pc_changed=pc_changed, phone_changed=phone_changed, conflicts=0,
+        level_count=len(merged.levels()),
+    )
+    return result, merged, changes
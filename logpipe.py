@@ -0,0 +1,83 @@
+"""
+Log pipeline for the GUIs
+
+The sync engine logs from worker threads, thousands of lines on a big sync.
+Lines go onto a thread-safe queue and the UI thread takes them off in batches
+on a timer, so the log view is updated a few times per second instead of once
+per line. The view only keeps the newest MAX_VIEW_LINES lines; the full log is
+written to a rotating file by a background thread.
+"""
+
+import logging
+import logging.handlers
+import os
+import platform
+import queue
+
+FLUSH_INTERVAL_MS = 100
+MAX_VIEW_LINES = 2000
+LOG_FILENAME = "gdsync.log"
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUPS = 3
+
+
+def default_log_dir():
+    """Per-user folder for the log file"""
+    if platform.system() == "Windows":
+        return os.path.join(os.environ.get("LOCALAPPDATA") or os.path.expanduser("~"), "gdsync", "logs")
+    if platform.system() == "Darwin":
+        return os.path.expanduser("~/Library/Logs/gdsync")
+    return os.path.join(os.environ.get("XDG_STATE_HOME") or os.path.expanduser("~/.local/state"), "gdsync")
+
+
+class LogPipeline:
+    """Queue between threads that log and the UI thread that shows the log"""
+
+    def __init__(self, path=None):
+        self.lines = queue.SimpleQueue()
+        self.path = path or os.path.join(default_log_dir(), LOG_FILENAME)
+        self.listener = None
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                self.path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8"
+            )
+        except OSError:
+            # The log view still works without a log file
+            self.path = None
+            return
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        self.records = queue.SimpleQueue()
+        self.listener = logging.handlers.QueueListener(self.records, handler)
+        self.listener.start()
+
+    def put(self, message):
+        """Queue a message, from any thread"""
+        self.lines.put(message)
+        if self.listener is not None:
+            self.records.put(logging.makeLogRecord({"msg": message}))
+
+    def drain(self, keep=MAX_VIEW_LINES):
+        """Take every queued message, returns (newest keep messages, number left out)"""
+        batch = []
+        while True:
+            try:
+                batch.append(self.lines.get_nowait())
+            except queue.Empty:
+                break
+        if len(batch) <= keep:
+            return batch, 0
+        return batch[-keep:], len(batch) - keep
+
+    def skipped_message(self, skipped):
+        """Line shown in place of messages that were left out of the view"""
+        where = f", see {self.path}" if self.path else ""
+        return f"... {skipped} lines not shown{where}"
+
+    def close(self):
+        """Write out the remaining messages and close the log file"""
+        if self.listener is not None:
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+            self.listener = None
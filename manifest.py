@@ -0,0 +1,258 @@
+"""
+File manifests for incremental sync
+
+A manifest maps a file name in the save folder to its size, mtime and md5.
+The local side is scanned with os.scandir, the device side with an `adb
+shell` call that inventories the whole save tree (stat + md5sum). Both sides
+reuse the hashes recorded for files whose size and mtime did not change, so
+only new or modified files are read. The manifests of the last successful
+sync are kept in a state file in the PC save folder so that unchanged files
+are never copied again, with one device manifest per device serial.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from adbclient import quote
+
+STATE_FILENAME = ".gdsync-state.json"
+STATE_VERSION = 2
+HASH_CHUNK_SIZE = 1024 * 1024
+# More changed device files than this are hashed with one find over the tree
+# instead of being listed on the md5sum command line
+REMOTE_HASH_LIST_MAX = 200
+
+# Device manifest key of syncs run without a serial (the only attached device)
+DEFAULT_DEVICE = ""
+
+# Several engines (one per device) may update the same state file at once
+_STATE_LOCK = threading.Lock()
+
+
+def file_md5(path):
+    """Return the md5 hex digest of a local file"""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def scan_local(directory, names=None, previous=None, exclude=None, hashes=True):
+    """Manifest of the files in the root of directory
+
+    Hashes are taken from previous when size and mtime are unchanged, so only
+    new or modified files are read. Without hashes no file is read at all.
+    """
+    manifest = {}
+    previous = previous or {}
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return manifest
+
+    for entry in entries:
+        if names is not None and entry.name not in names:
+            continue
+        if entry.name == STATE_FILENAME or not entry.is_file(follow_symlinks=False):
+            continue
+        if exclude and exclude(entry.path):
+            continue
+        st = entry.stat()
+        mtime = int(st.st_mtime)
+        old = previous.get(entry.name)
+        if old and old.get("size") == st.st_size and old.get("mtime") == mtime and old.get("md5"):
+            md5 = old["md5"]
+        elif not hashes:
+            md5 = None
+        else:
+            md5 = file_md5(entry.path)
+        manifest[entry.name] = {"size": st.st_size, "mtime": mtime, "md5": md5}
+    return manifest
+
+
+class LocalManifestCache:
+    """Shares scan_local results between engines syncing the same PC folder"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.scans = {}
+
+    def scan(self, directory, names=None, previous=None, exclude=None, hashes=True):
+        """scan_local, done once per directory and set of names"""
+        key = (os.path.abspath(directory), frozenset(names) if names is not None else None, exclude, hashes)
+        with self.lock:
+            if key not in self.scans:
+                self.scans[key] = scan_local(directory, names, previous, exclude, hashes)
+            return {name: dict(entry) for name, entry in self.scans[key].items()}
+
+
+def remote_inventory_command(directory, hashes=True, max_depth=None, names=None):
+    """Shell command listing the files under directory as tagged lines
+
+    F <size> <mtime> ./<path>    one per file, from stat
+    H <md5>  ./<path>            one per file, from md5sum (if hashes)
+    """
+    find = "find ."
+    if max_depth is not None:
+        find += f" -maxdepth {int(max_depth)}"
+    find += " -type f"
+    if names is not None:
+        find += " \\( " + " -o ".join(f"-name {quote(n)}" for n in names) + " \\)"
+    command = f"cd {quote(directory)} && {{ {find} -exec stat -c 'F %s %Y %n' {{}} + 2>/dev/null"
+    if hashes:
+        command += f"; {find} -exec md5sum {{}} + 2>/dev/null | sed 's/^/H /'"
+    return command + "; }; true"
+
+
+def parse_remote_inventory(output, inventory=None):
+    """Parse the output of remote_inventory_command into a manifest keyed by relative path
+
+    With inventory, the parsed entries and hashes are added to that manifest.
+    """
+    if inventory is None:
+        inventory = {}
+    hashes = {}
+    for line in output.splitlines():
+        tag, _, rest = line.partition(" ")
+        if tag == "F":
+            parts = rest.split(" ", 2)
+            if len(parts) != 3 or not parts[2].startswith("./"):
+                continue
+            try:
+                inventory[parts[2][2:]] = {"size": int(parts[0]), "mtime": int(parts[1]), "md5": None}
+            except ValueError:
+                continue
+        elif tag == "H":
+            digest, _, path = rest.partition("  ")
+            if len(digest) == 32 and path.startswith("./"):
+                hashes[path[2:]] = digest
+    for path, digest in hashes.items():
+        if path in inventory:
+            inventory[path]["md5"] = digest
+    return inventory
+
+
+def remote_inventory(client, directory, hashes=True, max_depth=None, names=None, previous=None):
+    """Name, size, mtime and md5 of every file under a device directory
+
+    Without previous this is one shell call that stats and hashes everything.
+    With previous (the remote manifest of the last sync), hashes are reused
+    for files whose size and mtime did not change, so a second call hashes
+    only the new or modified files, and is skipped when there are none.
+    """
+    if names is not None and not names:
+        return {}
+    if not hashes or not previous:
+        command = remote_inventory_command(directory, hashes, max_depth, names)
+        return parse_remote_inventory(client.shell(command, check=False))
+
+    command = remote_inventory_command(directory, False, max_depth, names)
+    inventory = parse_remote_inventory(client.shell(command, check=False))
+    to_hash = []
+    for path, entry in inventory.items():
+        old = previous.get(path)
+        if old and old.get("size") == entry["size"] and old.get("mtime") == entry["mtime"] and old.get("md5"):
+            entry["md5"] = old["md5"]
+        else:
+            to_hash.append(path)
+    if not to_hash:
+        return inventory
+    if len(to_hash) > REMOTE_HASH_LIST_MAX:
+        command = remote_inventory_command(directory, True, max_depth, names)
+    else:
+        command = f"cd {quote(directory)} && md5sum {' '.join(quote('./' + path) for path in to_hash)} 2>/dev/null | sed 's/^/H /'; true"
+    return parse_remote_inventory(client.shell(command, check=False), inventory)
+
+
+def root_files(inventory, names=None):
+    """Entries of an inventory that live directly in its root directory"""
+    return {
+        path: entry for path, entry in inventory.items()
+        if "/" not in path and path != STATE_FILENAME and (names is None or path in names)
+    }
+
+
+def same_content(a, b):
+    """True if two manifest entries describe the same file content"""
+    if a is None or b is None:
+        return False
+    if a.get("md5") and b.get("md5"):
+        return a["md5"] == b["md5"]
+    return a.get("size") == b.get("size") and a.get("mtime") == b.get("mtime")
+
+
+def load_state(pc_path):
+    """Load the state of the last successful sync, or an empty state"""
+    try:
+        with open(os.path.join(pc_path, STATE_FILENAME), "r") as f:
+            state = json.load(f)
+        if state.get("version") == 1:
+            # Version 1 kept a single device manifest for every device
+            state["remotes"] = {DEFAULT_DEVICE: state.pop("remote", {})}
+            state["version"] = STATE_VERSION
+        if state.get("version") == STATE_VERSION:
+            return state
+    except (OSError, ValueError):
+        pass
+    return {"version": STATE_VERSION, "local": {}, "remotes": {}}
+
+
+def remote_state(state, serial=None):
+    """Device manifest recorded for the device with this serial"""
+    return state["remotes"].get(serial or DEFAULT_DEVICE, {})
+
+
+def _write_state(pc_path, state):
+    state["version"] = STATE_VERSION
+    state["last_sync"] = int(time.time())
+    path = os.path.join(pc_path, STATE_FILENAME)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def save_state(pc_path, state):
+    """Atomically write the sync state file"""
+    with _STATE_LOCK:
+        _write_state(pc_path, state)
+
+
+def update_state(pc_path, update):
+    """Apply update(state) to the state file as it is now, returns the new state
+
+    Loading, updating and writing happen under one lock, so syncs of several
+    devices add their changes to each other's instead of the last one
+    overwriting the file.
+    """
+    with _STATE_LOCK:
+        state = load_state(pc_path)
+        update(state)
+        _write_state(pc_path, state)
+    return state
+
+
+def record_sync(state, local, remote, transferred, to_phone, pc_path, serial=None):
+    """Update state with the manifests after transferring the given files to or from one device"""
+    local = dict(local)
+    remote = dict(remote)
+    for name in transferred:
+        if to_phone:
+            if name in local:
+                remote[name] = dict(local[name])
+        elif name in remote:
+            try:
+                st = os.stat(os.path.join(pc_path, name))
+            except OSError:
+                continue
+            local[name] = {"size": st.st_size, "mtime": int(st.st_mtime), "md5": remote[name]["md5"]}
+    state["local"].update(local)
+    state["remotes"].setdefault(serial or DEFAULT_DEVICE, {}).update(remote)
+    return state
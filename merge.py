@@ -0,0 +1,153 @@
+"""
+Three-way merge of CCLocalLevels between phone and PC
+
+Both copies and the copy from the last merge (the base, kept in the PC save
+folder) are decoded and their local levels indexed by name, so the merge is a
+single pass over three dicts. A level changed on one side only takes that
+side's version, a level deleted on one side and untouched on the other is
+deleted, and a level changed on both sides is kept twice: the preferred side
+keeps the name, the other copy gets a suffix. Without a base every level that
+differs is treated as a conflict, so nothing is lost on the first merge.
+"""
+
+import os
+import shutil
+
+import savefile
+
+LEVELS_FILE = "CCLocalLevels.dat"
+BASE_DIRNAME = ".gdsync-base"
+LEVELS_KEY = savefile.LEVELS_KEY
+NAME_KEY = "k2"
+ARRAY_MARKER = "_isArr"
+
+
+class MergeResult:
+    """Outcome of a merge: the merged save and what changed on each side"""
+
+    def __init__(self, data, pc_changed, phone_changed, conflicts, level_count):
+        self.data = data
+        self.pc_changed = pc_changed
+        self.phone_changed = phone_changed
+        self.conflicts = conflicts
+        self.level_count = level_count
+
+
+def base_path(pc_path):
+    """Where the base copy for the next merge is kept"""
+    return os.path.join(pc_path, BASE_DIRNAME, LEVELS_FILE)
+
+
+def index_levels(save):
+    """Levels of a decoded save as {key: level}, in the order GD lists them
+
+    The key is the level name; repeated names get "#2", "#3", ... in list order.
+    """
+    levels = save.get(LEVELS_KEY, {})
+    entries = sorted(
+        (int(key[2:]), level) for key, level in levels.items()
+        if key.startswith("k_") and key[2:].isdigit() and isinstance(level, dict)
+    )
+    index = {}
+    seen = {}
+    for _, level in entries:
+        name = str(level.get(NAME_KEY, ""))
+        seen[name] = seen.get(name, 0) + 1
+        index[name if seen[name] == 1 else f"{name}#{seen[name]}"] = level
+    return index
+
+
+def _merge_value(base, pc, phone, prefer_phone):
+    """Three-way choice for one value, None meaning absent; returns (value, conflict)"""
+    if pc == phone:
+        return pc, False
+    if pc == base:
+        return phone, False
+    if phone == base:
+        return pc, False
+    return (phone if prefer_phone else pc), True
+
+
+def merge_levels(base, pc, phone, prefer_phone=False, suffix=None):
+    """Merge three level indexes, returns (list of levels in order, conflict count)"""
+    if suffix is None:
+        suffix = " (PC)" if prefer_phone else " (phone)"
+    merged = []
+    conflicts = 0
+
+    # Levels only the phone knows about go first, like new levels do in GD
+    keys = [key for key in phone if key not in pc] + list(pc)
+    for key in keys:
+        level, conflict = _merge_value(base.get(key), pc.get(key), phone.get(key), prefer_phone)
+        if conflict and (pc.get(key) is None or phone.get(key) is None):
+            # Deleted on one side but edited on the other: keep the edit
+            conflicts += 1
+            merged.append(pc.get(key) or phone.get(key))
+        elif conflict:
+            conflicts += 1
+            other = dict(pc[key] if prefer_phone else phone[key])
+            other[NAME_KEY] = f"{other.get(NAME_KEY, '')}{suffix}"
+            merged.append(level)
+            merged.append(other)
+        elif level is not None:
+            merged.append(level)
+    return merged, conflicts
+
+
+def merge_saves(base, pc, phone, prefer_phone=False):
+    """Merge three decoded CCLocalLevels saves, returns (merged save, conflict count)"""
+    levels, conflicts = merge_levels(index_levels(base), index_levels(pc), index_levels(phone), prefer_phone)
+
+    merged = {}
+    keys = list(pc) + [key for key in phone if key not in pc]
+    for key in keys:
+        if key == LEVELS_KEY:
+            continue
+        value, _ = _merge_value(base.get(key), pc.get(key), phone.get(key), prefer_phone)
+        if value is not None:
+            merged[key] = value
+
+    level_dict = {ARRAY_MARKER: True}
+    for i, level in enumerate(levels):
+        level_dict[f"k_{i}"] = level
+    merged = {LEVELS_KEY: level_dict, **merged}
+    return merged, conflicts
+
+
+def load_save(path):
+    """Decode and parse a save file, or return an empty save if it does not exist
+
+    The save is streamed, so only the parsed levels are held, not the decoded
+    XML or its element tree.
+    """
+    if path is None or not os.path.exists(path):
+        return {}
+    return savefile.join_entries(savefile.iter_save_file(path))
+
+
+def merge_files(base_file, pc_file, phone_file, prefer_phone=False):
+    """Three-way merge of save files on disk, returns a MergeResult"""
+    base = load_save(base_file)
+    pc = load_save(pc_file)
+    phone = load_save(phone_file)
+    data, conflicts = merge_saves(base, pc, phone, prefer_phone)
+    return MergeResult(
+        data,
+        pc_changed=data != pc,
+        phone_changed=data != phone,
+        conflicts=conflicts,
+        level_count=len(data[LEVELS_KEY]) - 1,
+    )
+
+
+def write_save(data, path):
+    """Encode a merged save to path atomically, one level at a time"""
+    savefile.write_save_file(path, savefile.split_entries(data))
+
+
+def save_base(source_file, pc_path):
+    """Keep a copy of the merged save as the base of the next merge"""
+    path = base_path(pc_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    shutil.copyfile(source_file, path + ".tmp")
+    os.replace(path + ".tmp", path)
@@ -0,0 +1,148 @@
+"""
+Sync planning for gdsync
+
+Before any data moves, every file of a sync gets an action (push, pull, skip,
+or missing for a requested file the source does not have) with its byte
+count, based on the local manifest (os.scandir) and the single remote
+inventory. Nothing is ever deleted: a file only the destination has is left
+alone. The plan can be shown on its own as a dry run, and its duration is
+estimated from the link throughput measured during earlier syncs, which is
+kept in the sync state file.
+"""
+
+import time
+from collections import namedtuple
+
+import manifest
+
+PUSH = "push"
+PULL = "pull"
+SKIP = "skip"
+MISSING = "missing"
+
+# Used until a sync has measured the real link (a slow wireless adb link)
+DEFAULT_THROUGHPUT = 4 * 1024 * 1024
+# Fixed cost per transferred file: service setup, stat and mtime round trips
+PER_FILE_OVERHEAD = 0.01
+# Weight of the newest measurement in the moving average
+THROUGHPUT_WEIGHT = 0.5
+# Transfers shorter than this say more about latency than about bandwidth
+MIN_MEASURED_BYTES = 256 * 1024
+# Number of syncs kept in the transfer history
+HISTORY_LENGTH = 50
+
+Action = namedtuple("Action", ["kind", "name", "size"])
+
+
+class SyncPlan:
+    """Ordered list of actions for one sync direction"""
+
+    def __init__(self, actions, to_phone, throughput=None):
+        self.actions = actions
+        self.to_phone = to_phone
+        self.throughput = throughput
+
+    def names(self, kind):
+        """Names of the files with the given action"""
+        return [action.name for action in self.actions if action.kind == kind]
+
+    def transfers(self):
+        """Names of the files that have to be copied"""
+        return self.names(PUSH if self.to_phone else PULL)
+
+    def total(self, kind):
+        """Number of files and bytes for an action"""
+        sizes = [action.size for action in self.actions if action.kind == kind]
+        return len(sizes), sum(sizes)
+
+    def transfer_bytes(self):
+        return self.total(PUSH if self.to_phone else PULL)[1]
+
+    def estimate_seconds(self, throughput=None):
+        """Expected duration of the transfers in seconds"""
+        count, size = self.total(PUSH if self.to_phone else PULL)
+        return size / (throughput or self.throughput or DEFAULT_THROUGHPUT) + count * PER_FILE_OVERHEAD
+
+    def summary(self, throughput=None):
+        """One line per action kind plus the duration estimate"""
+        throughput = throughput or self.throughput
+        lines = []
+        for kind in (PUSH, PULL, SKIP, MISSING):
+            count, size = self.total(kind)
+            if count:
+                lines.append(f"{kind}: {count} files" if kind == MISSING else f"{kind}: {count} files, {format_size(size)}")
+        source = "measured" if throughput else "assumed"
+        speed = throughput or DEFAULT_THROUGHPUT
+        lines.append(
+            f"Estimated time: {format_duration(self.estimate_seconds(throughput))} "
+            f"at {format_size(speed)}/s ({source})"
+        )
+        return lines
+
+
+def build_plan(names, local, remote, to_phone, incremental=True, throughput=None):
+    """Plan a sync of names from one manifest to the other
+
+    With incremental, files whose content already matches are skipped. Names
+    the source does not have are reported as missing, not copied. The
+    throughput (bytes per second) is used for the duration estimate.
+    """
+    source, destination = (local, remote) if to_phone else (remote, local)
+    kind = PUSH if to_phone else PULL
+    actions = []
+    for name in names:
+        entry = source.get(name)
+        if entry is None:
+            actions.append(Action(MISSING, name, 0))
+        elif incremental and manifest.same_content(entry, destination.get(name)):
+            actions.append(Action(SKIP, name, entry["size"]))
+        else:
+            actions.append(Action(kind, name, entry["size"]))
+    return SyncPlan(actions, to_phone, throughput)
+
+
+def measured_throughput(state):
+    """Link throughput in bytes per second from earlier syncs, or None"""
+    return state.get("throughput") or None
+
+
+def record_throughput(state, size, seconds):
+    """Fold one measured transfer into the moving average kept in state"""
+    if size < MIN_MEASURED_BYTES or seconds <= 0:
+        return state
+    sample = size / seconds
+    previous = state.get("throughput")
+    state["throughput"] = sample if not previous else previous + THROUGHPUT_WEIGHT * (sample - previous)
+    return state
+
+
+def sync_stats(size, seconds, to_phone, serial=None):
+    """Transfer statistics of one sync, as kept in the history"""
+    return {
+        "time": int(time.time()),
+        "direction": PUSH if to_phone else PULL,
+        "device": serial or "",
+        "bytes": size,
+        "seconds": round(seconds, 3),
+        "throughput": round(size / seconds) if seconds > 0 else 0,
+    }
+
+
+def record_history(state, stats):
+    """Append the statistics of a sync to the history kept in state"""
+    state["history"] = (state.get("history", []) + [stats])[-HISTORY_LENGTH:]
+    return state
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def format_duration(seconds):
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}m {seconds:02d}s"
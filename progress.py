@@ -0,0 +1,76 @@
+"""
+Byte progress of a sync
+
+Transfers report how many bytes of each file they have moved so far, from the
+sync: transport's per-packet callback or the exec: stream. The tracker sums
+them across the worker threads, smooths the transfer rate and derives the time
+left, and passes (done bytes, total bytes, bytes per second, seconds left) to
+the front end at most every REPORT_INTERVAL seconds.
+"""
+
+import threading
+import time
+
+from planner import format_size, format_duration
+
+REPORT_INTERVAL = 0.2
+# Weight of the newest rate sample in the moving average
+RATE_WEIGHT = 0.3
+
+
+class ProgressTracker:
+    """Thread-safe byte counter with a smoothed rate and ETA"""
+
+    def __init__(self, total, callback, interval=REPORT_INTERVAL):
+        self.total = total
+        self.callback = callback
+        self.interval = interval
+        self.done = 0
+        self.rate = 0.0
+        self.files = {}
+        self.lock = threading.Lock()
+        self.start = time.monotonic()
+        self.last_time = self.start
+        self.last_done = 0
+
+    def update(self, name, done):
+        """Set the bytes moved so far for one file"""
+        with self.lock:
+            self.done += done - self.files.get(name, 0)
+            self.files[name] = done
+        self.report()
+
+    def finish(self, name, size):
+        """Count a file as complete, however many bytes it really needed on the wire"""
+        self.update(name, size)
+
+    def report(self, force=False):
+        now = time.monotonic()
+        with self.lock:
+            elapsed = now - self.last_time
+            if not force and elapsed < self.interval:
+                return
+            if elapsed > 0:
+                sample = (self.done - self.last_done) / elapsed
+                self.rate = sample if not self.rate else self.rate + RATE_WEIGHT * (sample - self.rate)
+            self.last_time = now
+            self.last_done = self.done
+            done, total, rate = self.done, max(self.total, self.done), self.rate
+        eta = (total - done) / rate if rate > 0 else 0.0
+        if self.callback:
+            self.callback(done, total, rate, eta)
+
+    def average_rate(self):
+        """Bytes per second over the whole transfer"""
+        elapsed = time.monotonic() - self.start
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+
+def format_progress(done, total, rate, eta):
+    """Progress line for the front ends: bytes done, live rate and time left"""
+    text = f"{format_size(done)} / {format_size(total)}"
+    if rate > 0:
+        text += f"  {format_size(rate)}/s"
+        if done < total:
+            text += f"  ETA {format_duration(eta)}"
+    return text
@@ -0,0 +1,205 @@
+"""
+Resumable transfers for gdsync
+
+A journal in the PC save folder gets one line for every file a sync has
+finished, keyed by the sync direction and device, so a sync that died halfway
+(cable pulled, process killed) is continued by the next one without copying
+the finished files again. Large files are written to a part file next to their
+destination and only renamed into place once complete; a part file left behind
+by an interrupted sync is continued from its current length, as long as the
+source still has the size and mtime it had when the part file was started.
+"""
+
+import json
+import os
+import threading
+
+from adbclient import AdbError, quote
+
+JOURNAL_FILENAME = ".gdsync-journal"
+PART_SUFFIX = ".gdsync-part"
+# Smaller files are cheaper to copy again than to checkpoint
+RESUME_MIN_SIZE = 1024 * 1024
+# Data sent per sync: request when pushing, the most an interruption loses
+RESUME_SEGMENT_SIZE = 8 * 1024 * 1024
+
+DONE = "done"
+PARTIAL = "partial"
+FORGOTTEN = "forgotten"
+
+# Engines of several devices append to the same journal file
+_JOURNAL_LOCK = threading.Lock()
+
+
+class TransferJournal:
+    """Append-only record of the files one sync direction has finished"""
+
+    def __init__(self, pc_path, key):
+        self.path = os.path.join(pc_path, JOURNAL_FILENAME)
+        self.key = key
+        self.done = {}
+        self.partial = {}
+        for record in self._read():
+            if record.get("key") != key:
+                continue
+            name, signature = record["name"], tuple(record["signature"])
+            if record["state"] == DONE:
+                self.done[name] = signature
+                self.partial.pop(name, None)
+            elif record["state"] == FORGOTTEN:
+                self.done.pop(name, None)
+                self.partial.pop(name, None)
+            else:
+                self.partial[name] = signature
+
+    def _read(self):
+        records = []
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # The last line may have been cut off by the interruption
+                        continue
+        except FileNotFoundError:
+            pass
+        return records
+
+    def _append(self, state, name, signature):
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"key": self.key, "state": state, "name": name, "signature": list(signature)}) + "\n")
+
+    def resuming(self):
+        """True if an interrupted sync left work behind"""
+        return bool(self.done or self.partial)
+
+    def is_done(self, name, signature):
+        """True if an earlier sync finished this file from the same source"""
+        return signature is not None and self.done.get(name) == tuple(signature)
+
+    def start_partial(self, name, signature):
+        """Note that a part file is being written, returns True if an existing one may be continued"""
+        signature = tuple(signature)
+        with _JOURNAL_LOCK:
+            if self.partial.get(name) == signature:
+                return True
+            self.partial[name] = signature
+            self._append(PARTIAL, name, signature)
+        return False
+
+    def mark_done(self, name, signature):
+        if signature is None:
+            return
+        signature = tuple(signature)
+        with _JOURNAL_LOCK:
+            self.done[name] = signature
+            self.partial.pop(name, None)
+            self._append(DONE, name, signature)
+
+    def forget(self, name):
+        """Drop a finished file, so the next sync copies it again"""
+        with _JOURNAL_LOCK:
+            signature = self.done.pop(name, None) or ()
+            self.partial.pop(name, None)
+            self._append(FORGOTTEN, name, signature)
+
+    def finish(self):
+        """Forget this sync's records once everything was transferred"""
+        with _JOURNAL_LOCK:
+            self.done = {}
+            self.partial = {}
+            if not os.path.exists(self.path):
+                return
+            others = [record for record in self._read() if record.get("key") != self.key]
+            if not others:
+                os.remove(self.path)
+                return
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w") as f:
+                f.writelines(json.dumps(record) + "\n" for record in others)
+            os.replace(temp_path, self.path)
+
+
+class _Segment:
+    """Reads at most size bytes of a file"""
+
+    def __init__(self, f, size):
+        self.f = f
+        self.left = size
+
+    def read(self, size=-1):
+        if self.left <= 0:
+            return b""
+        data = self.f.read(self.left if size < 0 else min(size, self.left))
+        self.left -= len(data)
+        return data
+
+
+def push_resumable(client, local_path, remote_path, mtime, resumable, progress=None):
+    """Push through a part file on the device, continuing it if resumable
+
+    sync: cannot append to a file, so the data is sent in segments: the first
+    one straight into the part file, the others into a chunk file that a
+    shell: command appends to the part file. An interruption loses at most
+    the segment in flight. Returns (bytes sent, offset the push started at).
+    On failure the part file is left on the device for the next attempt.
+    progress gets the bytes of the file that are on the device so far.
+    """
+    part_path = remote_path + PART_SUFFIX
+    chunk_path = part_path + ".chunk"
+    size = os.path.getsize(local_path)
+    offset = 0
+    if resumable:
+        mode, part_size, _ = client.stat(part_path)
+        if mode and part_size <= size:
+            offset = part_size
+    done = offset
+    with open(local_path, "rb") as f:
+        f.seek(offset)
+        while done < size:
+            segment = _Segment(f, min(RESUME_SEGMENT_SIZE, size - done))
+            segment_progress = progress and (lambda n, done=done: progress(done + n))
+            if not done:
+                sent = client.push_stream(segment, part_path, segment_progress)
+            else:
+                sent = client.push_stream(segment, chunk_path, segment_progress)
+                client.shell(f"cat {quote(chunk_path)} >> {quote(part_path)} && rm -f {quote(chunk_path)}")
+            if not sent:
+                # The file shrank since it was measured, the size check below fails
+                break
+            done += sent
+    try:
+        client.shell(
+            f"[ \"$(wc -c < {quote(part_path)})\" -eq {size} ] && "
+            f"{{ touch -c -m -d @{int(mtime)} {quote(part_path)} 2>/dev/null; mv -f {quote(part_path)} {quote(remote_path)}; }}"
+        )
+    except AdbError as e:
+        raise AdbError(f"Push of {os.path.basename(local_path)} incomplete on device: {str(e)}")
+    return done - offset, offset
+
+
+def pull_resumable(client, remote_path, local_path, size, resumable, progress=None):
+    """Pull through a local part file, continuing it if resumable
+
+    Returns (bytes received, offset the pull started at). On failure the part
+    file is kept for the next attempt. progress gets the bytes of the file
+    that are on the PC so far.
+    """
+    part_path = local_path + PART_SUFFIX
+    offset = 0
+    if resumable and os.path.exists(part_path):
+        offset = os.path.getsize(part_path)
+        if offset > size:
+            offset = 0
+    received = 0
+    with open(part_path, "ab" if offset else "wb") as f:
+        if offset < size:
+            received = client.exec_out(
+                f"tail -c +{offset + 1} {quote(remote_path)} 2>/dev/null", f,
+                progress and (lambda n: progress(offset + n))
+            )
+    if os.path.getsize(part_path) != size:
+        raise AdbError(f"Received {os.path.getsize(part_path)} of {size} bytes of {os.path.basename(remote_path)}")
+    os.replace(part_path, local_path)
+    return received, offset
@@ -0,0 +1,449 @@
+"""
+Decoder and encoder for the Geometry Dash save format
+
+CCGameManager.dat and CCLocalLevels.dat are a plist-style XML document that
+is gzipped, base64 encoded (URL-safe alphabet) and XORed with 11. Decoding
+and encoding stream in fixed-size chunks, so memory stays bounded no matter
+how big the save is; the per-byte work (XOR and the alphabet swap) is a single
+bytes.translate call per chunk. Level strings inside CCLocalLevels (key k4)
+use the same encoding without the XOR layer.
+
+The decoded XML can also be read as a stream of entries (iter_save), one
+level at a time, and written back the same way (SaveWriter), so a big
+CCLocalLevels never has to exist as one XML string or element tree.
+"""
+
+import binascii
+import io
+import os
+import xml.etree.ElementTree as ET
+import zlib
+from xml.parsers import expat
+
+XOR_KEY = 11
+CHUNK_SIZE = 1024 * 1024
+COMPRESS_LEVEL = 6
+# Smaller reads for streaming, one chunk can inflate to ten times its size
+STREAM_CHUNK_SIZE = 64 * 1024
+# The dict of CCLocalLevels that holds the levels
+LEVELS_KEY = "LLM_01"
+
+# XOR and the URL-safe alphabet swap in one translation table per direction
+_DECODE_TABLE = bytes(
+    {ord("-"): ord("+"), ord("_"): ord("/")}.get(b ^ XOR_KEY, b ^ XOR_KEY) for b in range(256)
+)
+_ENCODE_TABLE = bytes(
+    {ord("+"): ord("-"), ord("/"): ord("_")}.get(b, b) ^ XOR_KEY for b in range(256)
+)
+# Padding, whitespace and trailing NULs (all XORed) that GD leaves in the text
+_DECODE_JUNK = bytes(c ^ XOR_KEY for c in b"\x00\t\r\n =")
+_PLAIN_DECODE_TABLE = bytes({ord("-"): ord("+"), ord("_"): ord("/")}.get(b, b) for b in range(256))
+_PLAIN_ENCODE_TABLE = bytes({ord("+"): ord("-"), ord("/"): ord("_")}.get(b, b) for b in range(256))
+_PLAIN_JUNK = b"\x00\t\r\n ="
+
+
+class SaveFileError(Exception):
+    """Raised when a save file cannot be decoded"""
+
+
+def _b64decode(data):
+    """Decode standard base64 with the padding removed"""
+    try:
+        return binascii.a2b_base64(data + b"=" * (-len(data) % 4))
+    except binascii.Error as e:
+        raise SaveFileError(f"Invalid base64 data: {str(e)}")
+
+
+def _decode_chunks(src, table, junk, chunk_size):
+    """Generator of the decoded data of src, one piece per chunk read"""
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 32)
+    pending = b""
+    try:
+        while True:
+            chunk = src.read(chunk_size)
+            if not chunk:
+                break
+            data = pending + chunk.translate(table, junk)
+            usable = len(data) - len(data) % 4
+            pending = data[usable:]
+            out = decompressor.decompress(_b64decode(data[:usable]))
+            if out:
+                yield out
+        out = decompressor.decompress(_b64decode(pending)) + decompressor.flush()
+    except zlib.error as e:
+        raise SaveFileError(f"Invalid compressed data: {str(e)}")
+    if out:
+        yield out
+    if not decompressor.eof:
+        raise SaveFileError("Save data is truncated")
+
+
+def _decode(src, dst, table, junk, chunk_size):
+    written = 0
+    for out in _decode_chunks(src, table, junk, chunk_size):
+        dst.write(out)
+        written += len(out)
+    return written
+
+
+class _Encoder:
+    """Compresses and base64-encodes the data written to it into dst"""
+
+    def __init__(self, dst, table, level):
+        self.dst = dst
+        self.table = table
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+        self.pending = b""
+        self.written = 0
+
+    def write(self, data):
+        self._output(self.compressor.compress(data), final=False)
+        return len(data)
+
+    def close(self):
+        """Flush the encoded data, returns the bytes written to dst"""
+        self._output(self.compressor.flush(), final=True)
+        return self.written
+
+    def _output(self, data, final):
+        # base64 works in groups of 3 bytes, the rest waits for the next write
+        data = self.pending + data
+        usable = len(data) if final else len(data) - len(data) % 3
+        self.pending = data[usable:]
+        if usable:
+            out = binascii.b2a_base64(data[:usable], newline=False).translate(self.table)
+            self.dst.write(out)
+            self.written += len(out)
+
+
+def _encode(src, dst, table, level, chunk_size):
+    encoder = _Encoder(dst, table, level)
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            return encoder.close()
+        encoder.write(chunk)
+
+
+def decode_stream(src, dst, chunk_size=CHUNK_SIZE):
+    """Decode a save from src into plist XML written to dst, returns bytes written"""
+    return _decode(src, dst, _DECODE_TABLE, _DECODE_JUNK, chunk_size)
+
+
+def encode_stream(src, dst, level=COMPRESS_LEVEL, chunk_size=CHUNK_SIZE):
+    """Encode plist XML from src into the save format written to dst, returns bytes written"""
+    return _encode(src, dst, _ENCODE_TABLE, level, chunk_size)
+
+
+def decode_bytes(data):
+    """Decode a whole save held in memory into plist XML"""
+    out = io.BytesIO()
+    decode_stream(io.BytesIO(data), out, chunk_size=max(len(data), 4))
+    return out.getvalue()
+
+
+def encode_bytes(xml, level=COMPRESS_LEVEL):
+    """Encode plist XML into the save format"""
+    out = io.BytesIO()
+    encode_stream(io.BytesIO(xml), out, level, chunk_size=max(len(xml), 1))
+    return out.getvalue()
+
+
+def decode_file(path, xml_path):
+    """Decode the save at path into an XML file, returns its size"""
+    with open(path, "rb") as src, open(xml_path, "wb") as dst:
+        return decode_stream(src, dst)
+
+
+def encode_file(xml_path, path, level=COMPRESS_LEVEL):
+    """Encode an XML file into a save at path, replacing it atomically"""
+    temp_path = path + ".gdsync-tmp"
+    try:
+        with open(xml_path, "rb") as src, open(temp_path, "wb") as dst:
+            written = encode_stream(src, dst, level)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return written
+
+
+def decode_level_data(data):
+    """Decode a level string (k4) into the raw level data"""
+    if isinstance(data, str):
+        data = data.encode("ascii")
+    out = io.BytesIO()
+    _decode(io.BytesIO(data), out, _PLAIN_DECODE_TABLE, _PLAIN_JUNK, max(len(data), 4))
+    return out.getvalue()
+
+
+def encode_level_data(raw, level=COMPRESS_LEVEL):
+    """Encode raw level data into a level string (k4)"""
+    out = io.BytesIO()
+    _encode(io.BytesIO(raw), out, _PLAIN_ENCODE_TABLE, level, max(len(raw), 1))
+    return out.getvalue().decode("ascii")
+
+
+def _parse_value(element):
+    tag = element.tag
+    if tag in ("d", "dict"):
+        return _parse_dict(element)
+    if tag in ("a", "array"):
+        return [_parse_value(child) for child in element]
+    if tag in ("t", "true"):
+        return True
+    if tag in ("f", "false"):
+        return False
+    text = element.text or ""
+    if tag in ("i", "integer"):
+        return int(text)
+    if tag in ("r", "real"):
+        return float(text)
+    return text
+
+
+def _parse_dict(element):
+    result = {}
+    children = list(element)
+    for key, value in zip(children[::2], children[1::2]):
+        result[key.text or ""] = _parse_value(value)
+    return result
+
+
+def parse_plist(xml):
+    """Parse decoded save XML into nested dicts"""
+    try:
+        root = ET.fromstring(xml)
+    except ET.ParseError as e:
+        raise SaveFileError(f"Invalid save XML: {str(e)}")
+    top = root[0] if root.tag == "plist" and len(root) else root
+    return _parse_value(top)
+
+
+def _build_value(parent, value):
+    if isinstance(value, dict):
+        element = ET.SubElement(parent, "d")
+        for key, item in value.items():
+            ET.SubElement(element, "k").text = key
+            _build_value(element, item)
+    elif isinstance(value, list):
+        element = ET.SubElement(parent, "a")
+        for item in value:
+            _build_value(element, item)
+    elif value is True:
+        ET.SubElement(parent, "t")
+    elif value is False:
+        ET.SubElement(parent, "f")
+    elif isinstance(value, int):
+        ET.SubElement(parent, "i").text = str(value)
+    elif isinstance(value, float):
+        text = repr(value)
+        ET.SubElement(parent, "r").text = text[:-2] if text.endswith(".0") else text
+    else:
+        ET.SubElement(parent, "s").text = str(value)
+
+
+def build_plist(data):
+    """Serialize nested dicts into save XML in the compact form GD writes"""
+    root = ET.Element("plist", {"version": "1.0", "gjver": "2.0"})
+    _build_value(root, data)
+    root[0].tag = "dict"
+    return b'<?xml version="1.0"?>' + ET.tostring(root, encoding="utf-8", xml_declaration=False)
+
+
+def _element_value(tag, children, text):
+    """Value of a finished element, children already converted"""
+    if tag in ("d", "dict"):
+        return {children[i]: children[i + 1] for i in range(0, len(children) - 1, 2)}
+    if tag in ("a", "array"):
+        return children
+    if tag in ("t", "true"):
+        return True
+    if tag in ("f", "false"):
+        return False
+    if tag in ("i", "integer"):
+        return int(text)
+    if tag in ("r", "real"):
+        return float(text)
+    return text
+
+
+def iter_plist(chunks, split=(LEVELS_KEY,), offsets=False):
+    """Stream the entries of decoded save XML, fed as an iterable of byte chunks
+
+    Yields (keys, value) for every entry of the top dict, with keys = (key,).
+    The dicts named in split are not built whole: each of their entries is
+    yielded on its own with keys = (key, entry key), so only one level is in
+    memory at a time. With offsets, yields (keys, value, start, end) where
+    start:end is the entry's byte span in the XML, from its <k> up to the
+    next entry.
+    """
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    ready = []
+    # Elements being built below the entry level: [tag, children, text parts]
+    stack = []
+    state = {"depth": 0, "top": None, "key": None, "split": None, "child": None, "pending": None, "seen": False}
+
+    def finish_entry(position):
+        if state["pending"] is not None:
+            keys, value, start = state["pending"]
+            ready.append((keys, value, start, position) if offsets else (keys, value))
+            state["pending"] = None
+
+    def entry_depth():
+        return state["top"] + (2 if state["split"] is not None else 1)
+
+    def start_element(tag, attributes):
+        state["depth"] += 1
+        depth = state["depth"]
+        if depth == 1:
+            # GD wraps the top dict in <plist>, a bare dict is read as well
+            state["top"] = 2 if tag == "plist" else 1
+            if state["top"] == 2:
+                return
+        if depth <= state["top"]:
+            return
+        if stack:
+            stack.append([tag, [], []])
+            return
+        if depth == entry_depth() and tag == "k":
+            finish_entry(parser.CurrentByteIndex)
+            state["entry_start"] = parser.CurrentByteIndex
+        elif depth == state["top"] + 1 and tag in ("d", "dict") and state["key"] in split:
+            state["split"] = state["key"]
+            state["seen"] = False
+            return
+        stack.append([tag, [], []])
+
+    def end_element(tag):
+        depth = state["depth"]
+        state["depth"] -= 1
+        if depth <= state["top"]:
+            if depth == state["top"]:
+                finish_entry(parser.CurrentByteIndex)
+            return
+        if state["split"] is not None and depth == state["top"] + 1:
+            # End of a split dict
+            finish_entry(parser.CurrentByteIndex)
+            if not state["seen"]:
+                ready.append(((state["split"],), {}, state["entry_start"], parser.CurrentByteIndex) if offsets else ((state["split"],), {}))
+            state["split"] = None
+            return
+        tag, children, text = stack.pop()
+        value = _element_value(tag, children, "".join(text))
+        if stack:
+            stack[-1][1].append(value)
+        elif tag == "k":
+            state["child" if state["split"] is not None else "key"] = value
+        elif state["split"] is not None:
+            state["seen"] = True
+            state["pending"] = ((state["split"], state["child"]), value, state["entry_start"])
+        else:
+            state["pending"] = ((state["key"],), value, state["entry_start"])
+
+    def character_data(data):
+        if stack:
+            stack[-1][2].append(data)
+
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    parser.CharacterDataHandler = character_data
+    try:
+        for chunk in chunks:
+            parser.Parse(chunk, False)
+            yield from ready
+            ready.clear()
+        parser.Parse(b"", True)
+    except (expat.ExpatError, ValueError) as e:
+        raise SaveFileError(f"Invalid save XML: {str(e)}")
+    yield from ready
+
+
+def iter_save(src, split=(LEVELS_KEY,), offsets=False, chunk_size=STREAM_CHUNK_SIZE):
+    """Stream the entries of an encoded save read from src, see iter_plist"""
+    return iter_plist(_decode_chunks(src, _DECODE_TABLE, _DECODE_JUNK, chunk_size), split, offsets)
+
+
+def iter_save_file(path, split=(LEVELS_KEY,), offsets=False):
+    """Stream the entries of the save at path, see iter_plist"""
+    with open(path, "rb") as f:
+        yield from iter_save(f, split, offsets)
+
+
+def _entry_xml(key, value):
+    holder = ET.Element("d")
+    ET.SubElement(holder, "k").text = key
+    _build_value(holder, value)
+    return b"".join(ET.tostring(child, encoding="utf-8", xml_declaration=False) for child in holder)
+
+
+class SaveWriter:
+    """Writes a save entry by entry, encoding it on the fly
+
+    Takes the (keys, value) entries iter_plist yields, so a save can be
+    rewritten without ever holding it whole: consecutive entries with
+    keys = (key, entry key) are written into one dict named key.
+    """
+
+    def __init__(self, dst, level=COMPRESS_LEVEL):
+        self.encoder = _Encoder(dst, _ENCODE_TABLE, level)
+        self.open_dict = None
+        self.encoder.write(b'<?xml version="1.0"?><plist version="1.0" gjver="2.0"><dict>')
+
+    def write(self, keys, value):
+        if len(keys) == 2 and self.open_dict != keys[0]:
+            self._close_dict()
+            self.encoder.write(_entry_xml(keys[0], {})[:-len(b"<d />")] + b"<d>")
+            self.open_dict = keys[0]
+        elif len(keys) == 1:
+            self._close_dict()
+        self.encoder.write(_entry_xml(keys[-1], value))
+
+    def _close_dict(self):
+        if self.open_dict is not None:
+            self.encoder.write(b"</d>")
+            self.open_dict = None
+
+    def close(self):
+        """Finish the save, returns the bytes written"""
+        self._close_dict()
+        self.encoder.write(b"</dict></plist>")
+        return self.encoder.close()
+
+
+def write_save_file(path, entries, level=COMPRESS_LEVEL):
+    """Write (keys, value) entries as a save at path, replacing it atomically"""
+    temp_path = path + ".gdsync-tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            written = SaveWriter(f, level)
+            for keys, value in entries:
+                written.write(keys, value)
+            size = written.close()
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return size
+
+
+def split_entries(data, split=(LEVELS_KEY,)):
+    """The (keys, value) entries of a parsed save, as iter_plist yields them"""
+    for key, value in data.items():
+        if key in split and isinstance(value, dict) and value:
+            for child_key, child in value.items():
+                yield (key, child_key), child
+        else:
+            yield (key,), value
+
+
+def join_entries(entries):
+    """Build the nested dicts back from (keys, value) entries"""
+    data = {}
+    for keys, value in entries:
+        if len(keys) == 2:
+            data.setdefault(keys[0], {})[keys[1]] = value
+        else:
+            data[keys[0]] = value
+    return data
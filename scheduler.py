@@ -0,0 +1,72 @@
+"""
+Concurrent transfer scheduler for gdsync
+
+Runs push/pull jobs on a bounded pool of worker threads. Every worker gets
+its own AdbClient (a sync: connection carries one transfer at a time), jobs
+are started largest first so one big song never ends up as the last straggler,
+and progress is summed across all workers.
+"""
+
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from adbclient import AdbError
+
+DEFAULT_WORKERS = 4
+MAX_WORKERS = 8
+
+TransferJob = namedtuple("TransferJob", ["name", "size", "source", "destination"])
+
+
+class TransferScheduler:
+    """Bounded worker pool that runs transfer jobs concurrently"""
+
+    def __init__(self, client_factory, workers=DEFAULT_WORKERS, log=None):
+        self.client_factory = client_factory
+        self.workers = max(1, min(int(workers), MAX_WORKERS))
+        self.log = log
+
+    def run(self, jobs, transfer, progress=None):
+        """Run transfer(job, client) for every job, returns {job.name: success}
+
+        A job that raises AdbError or OSError counts as failed and is logged,
+        any other exception is a bug and is raised.
+        """
+        if not jobs:
+            return {}
+
+        # Largest first: small files fill the gaps while the big ones are still running
+        ordered = sorted(jobs, key=lambda job: job.size, reverse=True)
+        total = len(ordered)
+        lock = threading.Lock()
+        local = threading.local()
+        clients = []
+        done = [0]
+
+        def run_job(job):
+            client = getattr(local, "client", None)
+            if client is None:
+                client = local.client = self.client_factory()
+                with lock:
+                    clients.append(client)
+            try:
+                ok = bool(transfer(job, client))
+            except (AdbError, OSError) as e:
+                ok = False
+                if self.log:
+                    self.log(f"Transfer of {job.name} failed: {str(e)}")
+                client.reset()
+            with lock:
+                done[0] += 1
+                if progress:
+                    progress(done[0], total)
+            return ok
+
+        try:
+            with ThreadPoolExecutor(max_workers=min(self.workers, total)) as pool:
+                results = list(pool.map(run_job, ordered))
+        finally:
+            for client in clients:
+                client.close()
+        return {job.name: ok for job, ok in zip(ordered, results)}
@@ -0,0 +1,146 @@
+"""
+Content-addressed snapshots of the PC save folder
+
+Before a pull overwrites PC files, their current versions are copied into a
+store inside the save folder: every blob is named by its md5 (the same hash
+the sync manifests already keep, so usually nothing is re-read), and a small
+JSON index per snapshot maps file names to blobs. Content that is already in
+the store is never copied again, so a song that did not change costs nothing
+no matter how many snapshots refer to it.
+
+Blobs are copied, never hardlinked to the live save files: GD rewrites its
+files in place, which would silently change a hardlinked blob.
+"""
+
+import json
+import os
+import shutil
+import stat
+import time
+
+from manifest import file_md5
+
+STORE_DIRNAME = ".gdsync-snapshots"
+DEFAULT_KEEP = 20
+
+
+class SnapshotStore:
+    """Blob store plus snapshot indexes under <pc_path>/.gdsync-snapshots"""
+
+    def __init__(self, pc_path):
+        self.pc_path = pc_path
+        self.root = os.path.join(pc_path, STORE_DIRNAME)
+        self.objects = os.path.join(self.root, "objects")
+        self.index = os.path.join(self.root, "snapshots")
+
+    def object_path(self, md5):
+        return os.path.join(self.objects, md5[:2], md5)
+
+    def add_file(self, path, md5):
+        """Copy a file into the store unless its content is already there, returns bytes stored"""
+        target = self.object_path(md5)
+        if os.path.exists(target):
+            return 0
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp_path = target + ".tmp"
+        try:
+            shutil.copyfile(path, temp_path)
+            os.chmod(temp_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            os.replace(temp_path, target)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return os.path.getsize(target)
+
+    def take(self, entries, reason=""):
+        """Snapshot the named PC files, returns (snapshot id, bytes newly stored)
+
+        entries maps file names to manifest entries; missing or hash-less
+        entries are hashed here.
+        """
+        files = {}
+        stored = 0
+        for name, entry in sorted(entries.items()):
+            path = os.path.join(self.pc_path, name)
+            if not os.path.isfile(path):
+                continue
+            st = os.stat(path)
+            md5 = entry.get("md5") if entry and entry.get("size") == st.st_size else None
+            md5 = md5 or file_md5(path)
+            stored += self.add_file(path, md5)
+            files[name] = {"md5": md5, "size": st.st_size, "mtime": int(st.st_mtime)}
+        if not files:
+            return None, 0
+
+        os.makedirs(self.index, exist_ok=True)
+        snapshot_id = time.strftime("%Y%m%d-%H%M%S")
+        suffix = 1
+        while os.path.exists(self._index_path(snapshot_id)):
+            suffix += 1
+            snapshot_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{suffix:02d}"
+        path = self._index_path(snapshot_id)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"created": int(time.time()), "reason": reason, "files": files}, f, indent=1, sort_keys=True)
+        os.replace(path + ".tmp", path)
+        return snapshot_id, stored
+
+    def _index_path(self, snapshot_id):
+        return os.path.join(self.index, f"{snapshot_id}.json")
+
+    def list(self):
+        """[(snapshot id, index)] oldest first"""
+        try:
+            ids = sorted(n[:-5] for n in os.listdir(self.index) if n.endswith(".json"))
+        except FileNotFoundError:
+            return []
+        snapshots = []
+        for snapshot_id in ids:
+            try:
+                snapshots.append((snapshot_id, self.load(snapshot_id)))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def load(self, snapshot_id):
+        with open(self._index_path(snapshot_id), "r") as f:
+            return json.load(f)
+
+    def restore(self, snapshot_id, names=None):
+        """Put the files of a snapshot back into the PC folder, returns the names restored"""
+        files = self.load(snapshot_id)["files"]
+        restored = []
+        for name, entry in sorted(files.items()):
+            if names is not None and name not in names:
+                continue
+            target = os.path.join(self.pc_path, name)
+            temp_path = target + ".gdsync-tmp"
+            try:
+                shutil.copyfile(self.object_path(entry["md5"]), temp_path)
+                os.replace(temp_path, target)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            os.utime(target, (entry["mtime"], entry["mtime"]))
+            restored.append(name)
+        return restored
+
+    def prune(self, keep=DEFAULT_KEEP):
+        """Drop all but the newest keep snapshots and the blobs only they used, returns bytes freed"""
+        snapshots = self.list()
+        for snapshot_id, _ in snapshots[:-keep] if keep else snapshots:
+            os.remove(self._index_path(snapshot_id))
+        referenced = {entry["md5"] for _, index in self.list() for entry in index["files"].values()}
+
+        freed = 0
+        if not os.path.isdir(self.objects):
+            return freed
+        for prefix in os.listdir(self.objects):
+            directory = os.path.join(self.objects, prefix)
+            for name in os.listdir(directory):
+                if name not in referenced:
+                    path = os.path.join(directory, name)
+                    freed += os.path.getsize(path)
+                    # Blobs are read-only, which Windows refuses to delete
+                    os.chmod(path, stat.S_IRUSR | stat.S_IWUSR)
+                    os.remove(path)
+        return freed
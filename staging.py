@@ -0,0 +1,73 @@
+"""
+Staged pushes for gdsync
+
+Pushes do not write over the live saves: every file goes to a staging folder
+inside the device save folder first. Once all of them arrived, one shell call
+checks the size and md5 of every staged file and only if all match renames
+them over the live files. Renames within one folder are atomic, so GD sees
+either all old or all new saves and the window in between is the few
+milliseconds the renames take. If anything fails, the live saves are left
+alone and the staged files stay for the next (resumed) sync.
+"""
+
+from adbclient import AdbError, quote
+
+STAGING_DIRNAME = ".gdsync-staging"
+SCRIPT_NAME = "commit.sh"
+MISMATCH_PREFIX = "Staged file does not match: "
+
+
+def staged_path(remote_path):
+    """Staging location of a live device path"""
+    directory, name = remote_path.rsplit("/", 1)
+    return f"{directory}/{STAGING_DIRNAME}/{name}"
+
+
+def live_path(remote_path):
+    """Live location of a staged device path (other paths are returned unchanged)"""
+    directory, name = remote_path.rsplit("/", 1)
+    parent, folder = directory.rsplit("/", 1)
+    return f"{parent}/{name}" if folder == STAGING_DIRNAME else remote_path
+
+
+def prepare(client, android_path):
+    """Create the staging folder on the device"""
+    client.shell(f"mkdir -p {quote(f'{android_path}/{STAGING_DIRNAME}')}")
+
+
+def commit_script(files):
+    """Shell script that verifies the staged files and moves them into place
+
+    files maps file names to (size, md5). The script runs in the save folder.
+    """
+    lines = ["ok=0"]
+    for name, (size, md5) in sorted(files.items()):
+        staged = quote(f"{STAGING_DIRNAME}/{name}")
+        lines.append(
+            f"{{ [ \"$(wc -c < {staged})\" -eq {int(size)} ] && "
+            f"[ \"$(md5sum < {staged} | cut -c1-32)\" = {md5} ]; }} 2>/dev/null "
+            f"|| {{ echo {quote(MISMATCH_PREFIX + name)}; ok=1; }}"
+        )
+    lines.append("[ $ok -eq 0 ] || exit 1")
+    # Nothing but renames from here on
+    for name in sorted(files):
+        lines.append(f"mv -f {quote(f'{STAGING_DIRNAME}/{name}')} {quote(name)} || exit 1")
+    lines.append(f"rm -rf {quote(STAGING_DIRNAME)}")
+    return "\n".join(lines) + "\n"
+
+
+def mismatched_files(message):
+    """Names of the staged files a failed commit reported as not matching"""
+    return [line.split(MISMATCH_PREFIX, 1)[1].strip() for line in message.splitlines() if MISMATCH_PREFIX in line]
+
+
+def commit(client, android_path, files):
+    """Verify the staged files and rename them over the live ones in one shell call"""
+    if not files:
+        return
+    script = f"{STAGING_DIRNAME}/{SCRIPT_NAME}"
+    try:
+        client.push_bytes(commit_script(files).encode("utf-8"), f"{android_path}/{script}")
+        client.shell(f"cd {quote(android_path)} && sh {quote(script)}")
+    except AdbError as e:
+        raise AdbError(f"Staged files not committed, the live saves are unchanged: {str(e)}")
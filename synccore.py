@@ -0,0 +1,962 @@
+"""
+GUI-free sync engine for gdsync
+
+Everything a sync does (planning, transfers, merging, state) lives in
+SyncEngine, which reports through plain log and progress callbacks. The Qt
+and GTK front ends and the gdsynccli command line all drive the same engine.
+"""
+
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from adbclient import AdbClient, AdbError, AdbConnectionError, quote
+import bulktransfer
+import manifest
+import delta
+import compression
+import merge
+import levelindex
+import savefile
+import planner
+import snapshots
+import resume
+import staging
+from progress import ProgressTracker
+from scheduler import TransferScheduler, TransferJob, DEFAULT_WORKERS
+
+# Save folder of Geode's launcher on the phone
+ANDROID_SAVE_PATH = "/storage/emulated/0/Android/media/com.geode.launcher/save"
+
+# GD user data files synced by the "Only userdata" option
+USERDATA_FILES = [
+    "CCLocalLevels.dat",
+    "CCLocalLevels2.dat",
+    "CCGameManager.dat",
+    "CCGameManager2.dat",
+    "sfxlibrary.dat",
+    "musiclibrary.dat"
+]
+
+# User data files that hold levels, indexed per level after every sync
+INDEXED_FILES = [name for name in USERDATA_FILES if name.startswith("CCLocalLevels")]
+
+
+def find_adb(resource_path=None):
+    """Path of the bundled adb or of the one on PATH, or "" if there is none"""
+    if resource_path:
+        bundled = os.path.join(resource_path, "adb", "adb.exe" if platform.system() == "Windows" else "adb")
+        if os.path.exists(bundled):
+            return bundled
+    return shutil.which("adb") or ""
+
+
+class SyncEngine:
+    """Runs syncs between the PC save folder and the phone, without any UI"""
+
+    def __init__(self, adb_path="", log=None, progress=None, serial=None):
+        self.adb_path = adb_path
+        self.serial = serial
+        self.adb_client = None
+        self.local_cache = None
+        self.log_callback = log
+        self.progress_callback = progress
+        self.use_bulk_transfer = True
+        self.use_incremental = True
+        # Off by default: an edit near the start of a save shifts all of its compressed bytes
+        self.use_delta = False
+        self.use_compression = True
+        self.compression_rules = compression.CompressionRules()
+        self.use_merge = False
+        self.use_level_index = True
+        self.use_snapshots = True
+        self.use_resume = True
+        self.use_staging = True
+        self.dry_run = False
+        self.transfer_workers = DEFAULT_WORKERS
+        self.transfer_measure = [0, 0.0]
+        self.tracker = None
+        self.sync_stats = None
+        self.sync_manifests = None
+        self.plan = None
+        self.transferred = []
+        self.local_writes = set()
+        self.merge_base_pending = False
+
+    def log(self, message):
+        if self.log_callback:
+            self.log_callback(message)
+
+    def report_progress(self, done, total, rate=0.0, eta=0.0):
+        """Pass byte progress, bytes per second and seconds left to the front end"""
+        if self.progress_callback:
+            self.progress_callback(done, total, rate, eta)
+
+    def start_progress(self, total):
+        """Start counting the bytes of a transfer of total bytes"""
+        self.tracker = ProgressTracker(total, self.report_progress)
+        self.tracker.report(force=True)
+        return self.tracker
+
+    def finish_progress(self):
+        """Report the end of the sync's transfers"""
+        tracker = self.tracker
+        self.tracker = None
+        if tracker is None:
+            self.report_progress(0, 0)
+            return
+        total = max(tracker.total, tracker.done)
+        self.report_progress(total, total, tracker.average_rate(), 0.0)
+
+    def sync(self, pc_path, android_path=ANDROID_SAVE_PATH, to_phone=False, userdata_only=False, names=None):
+        """Run one sync in the given direction, returns True on success
+
+        names limits the sync to these files in the root of the save folder.
+        """
+        self.plan = None
+        self.transferred = []
+        self.local_writes = set()
+        self.merge_base_pending = False
+        self.sync_stats = None
+        if not os.path.exists(pc_path):
+            os.makedirs(pc_path, exist_ok=True)
+            self.log(f"Created PC directory: {pc_path}")
+
+        if names is not None:
+            sync_func = self.sync_pc_to_phone_files if to_phone else self.sync_phone_to_pc_files
+            return sync_func(pc_path, android_path, names)
+        if to_phone:
+            sync_func = self.sync_pc_to_phone_userdata if userdata_only else self.sync_pc_to_phone_all
+        else:
+            sync_func = self.sync_phone_to_pc_userdata if userdata_only else self.sync_phone_to_pc_all
+        return sync_func(pc_path, android_path)
+
+    def for_device(self, serial, log=None, progress=None):
+        """New engine with the same options that syncs the device with this serial"""
+        engine = SyncEngine(self.adb_path, log, progress, serial)
+        for option in ("use_bulk_transfer", "use_incremental", "use_delta", "use_compression",
+                       "compression_rules", "use_merge", "use_level_index", "use_snapshots", "use_resume", "use_staging", "dry_run", "transfer_workers", "local_cache"):
+            setattr(engine, option, getattr(self, option))
+        return engine
+
+    def list_devices(self):
+        """Serials of the attached devices that are ready, in adb's order"""
+        return [serial for serial, state in self.get_adb_client().devices() if state == "device"]
+
+    def close(self):
+        """Close the connection to the adb server"""
+        if self.adb_client is not None:
+            self.adb_client.close()
+            self.adb_client = None
+
+    def should_exclude_path(self, file_path):
+        """Check if a file/folder should be excluded from sync"""
+        excluded_patterns = [
+            "geode/mods/tobyadd.gdh/Macros",
+            "/geode/mods/tobyadd.gdh/Macros/",
+            "\\geode\\mods\\tobyadd.gdh\\Macros\\",
+            "geode\\mods\\tobyadd.gdh\\Macros",
+            # gdsync's own state and temporary files
+            manifest.STATE_FILENAME,
+            ".gdsync-tmp",
+            resume.JOURNAL_FILENAME,
+            resume.PART_SUFFIX,
+            staging.STAGING_DIRNAME,
+            merge.BASE_DIRNAME,
+            levelindex.INDEX_DIRNAME,
+            snapshots.STORE_DIRNAME
+        ]
+
+        for pattern in excluded_patterns:
+            if pattern in file_path:
+                return True
+        return False
+
+    def get_files_to_sync(self, directory):
+        """Get list of files to sync, excluding directories and unwanted paths"""
+        files_to_sync = []
+
+        if not os.path.exists(directory):
+            return files_to_sync
+
+        # Only get files from the root directory, exclude subfolders
+        try:
+            for item in os.listdir(directory):
+                item_path = os.path.join(directory, item)
+                if os.path.isfile(item_path) and not self.should_exclude_path(item_path):
+                    files_to_sync.append((item_path, item))
+        except Exception as e:
+            self.log(f"Error reading directory {directory}: {str(e)}")
+
+        return files_to_sync
+
+    def run_adb_command(self, command):
+        """Run an ADB command and log the output"""
+        if not self.adb_path:
+            self.log("Error: ADB path not set. Please configure in Settings.")
+            return False
+
+        try:
+            full_command = [self.adb_path] + command
+            if self.serial and command[:1] != ["devices"]:
+                full_command = [self.adb_path, "-s", self.serial] + command
+            self.log(f"Running: {' '.join(full_command)}")
+
+            process = subprocess.run(
+                full_command,
+                capture_output=True,
+                text=True
+            )
+
+            if process.stdout.strip():
+                self.log(process.stdout.strip())
+
+            if process.returncode != 0:
+                if process.stderr:
+                    self.log(f"Error: {process.stderr.strip()}")
+                return False
+
+            return True
+        except Exception as e:
+            self.log(f"Error executing command: {str(e)}")
+            return False
+
+    def get_adb_client(self):
+        """Get the persistent ADB server connection, creating it on first use"""
+        if self.adb_client is None or self.adb_client.adb_path != self.adb_path:
+            if self.adb_client is not None:
+                self.adb_client.close()
+            self.adb_client = AdbClient(self.adb_path, self.serial)
+        return self.adb_client
+
+    def adb_push(self, local_path, remote_path, client=None, progress=None):
+        """Push a file over the persistent ADB connection"""
+        try:
+            size = (client or self.get_adb_client()).push(local_path, remote_path, progress)
+            self.log(f"Pushed {os.path.basename(local_path)} ({size} bytes)")
+            return True
+        except (AdbConnectionError, OSError) as e:
+            self.log(f"ADB server connection failed ({str(e)}), falling back to adb push")
+            return self.run_adb_command(["push", local_path, remote_path])
+        except AdbError as e:
+            self.log(f"Error pushing {local_path}: {str(e)}")
+            return False
+
+    def adb_pull(self, remote_path, local_path, client=None, progress=None):
+        """Pull a file over the persistent ADB connection"""
+        try:
+            size = (client or self.get_adb_client()).pull(remote_path, local_path, progress)
+            self.log(f"Pulled {os.path.basename(remote_path)} ({size} bytes)")
+            return True
+        except (AdbConnectionError, OSError) as e:
+            self.log(f"ADB server connection failed ({str(e)}), falling back to adb pull")
+            return self.run_adb_command(["pull", remote_path, local_path])
+        except AdbError as e:
+            self.log(f"Error pulling {remote_path}: {str(e)}")
+            return False
+
+    def delta_transfer(self, job, client, to_phone):
+        """Send only the changed blocks of a large save file, returns False to fall back to a full copy"""
+        if not self.use_delta or job.name not in delta.DELTA_FILES:
+            return False
+
+        try:
+            if to_phone:
+                # A staged push patches a copy of the live file into the staging folder
+                local_size = os.path.getsize(job.source)
+                live = staging.live_path(job.destination)
+                mode, remote_size, _ = client.stat(live)
+                if not mode or local_size < delta.DELTA_MIN_SIZE:
+                    return False
+                target = job.destination if job.destination != live else None
+                moved = delta.push_delta(client, job.source, live, remote_size, target)
+                size = local_size
+            else:
+                if not os.path.exists(job.destination):
+                    return False
+                mode, remote_size, _ = client.stat(job.source)
+                if not mode or remote_size < delta.DELTA_MIN_SIZE:
+                    return False
+                moved = delta.pull_delta(client, job.source, job.destination, remote_size)
+                size = remote_size
+        except (delta.DeltaError, AdbError, OSError) as e:
+            self.log(f"Delta transfer of {job.name} not used ({str(e)}), copying the whole file")
+            return False
+
+        self.log(f"Delta transfer of {job.name}: {moved} of {size} bytes sent")
+        return True
+
+    def compressed_transfer(self, job, client, to_phone):
+        """Gzip a compressible file on the wire, returns False to fall back to a plain copy"""
+        if not self.use_compression or not self.compression_rules.should_compress(job.name, job.size):
+            return False
+
+        try:
+            if to_phone:
+                moved = compression.push_compressed(client, job.source, job.destination)
+            else:
+                moved = compression.pull_compressed(client, job.source, job.destination)
+        except (AdbError, OSError) as e:
+            self.log(f"Compressed transfer of {job.name} failed ({str(e)}), copying uncompressed")
+            return False
+
+        self.log(f"Compressed transfer of {job.name}: {moved} of {job.size} bytes on the wire")
+        return True
+
+    def transfer_journal(self, pc_path, android_path, to_phone):
+        """Journal of finished transfers for this direction and device, or None without resuming"""
+        if not self.use_resume:
+            return None
+        key = f"{'push' if to_phone else 'pull'} {self.serial or ''} {android_path}"
+        try:
+            return resume.TransferJournal(pc_path, key)
+        except (OSError, KeyError, TypeError) as e:
+            self.log(f"Could not read the transfer journal ({str(e)}), starting from scratch")
+            return None
+
+    def source_signature(self, job, client, to_phone):
+        """(size, mtime) of the file a job copies, or None if it cannot be read"""
+        try:
+            if to_phone:
+                st = os.stat(job.source)
+                return st.st_size, int(st.st_mtime)
+            mode, size, mtime = client.stat(job.source)
+        except (AdbError, OSError):
+            return None
+        return (size, mtime) if mode else None
+
+    def finished_earlier(self, job, client, to_phone, journal, signature):
+        """True if an interrupted sync already copied this file and the copy is still there"""
+        if not journal.is_done(job.name, signature):
+            return False
+        try:
+            size = client.stat(job.destination)[1] if to_phone else os.path.getsize(job.destination)
+        except (AdbError, OSError):
+            return False
+        return size == signature[0]
+
+    def resumable_transfer(self, job, client, to_phone, journal, signature, progress=None):
+        """Copy a large file through a part file a later sync can continue
+
+        Returns None for files that are not copied this way, or whose resumable
+        copy failed, so the caller falls back to a plain copy; the part file
+        stays for a later sync to continue.
+        """
+        if journal is None or signature is None or signature[0] < resume.RESUME_MIN_SIZE:
+            return None
+
+        resumable = journal.start_partial(job.name, signature)
+        try:
+            if to_phone:
+                moved, offset = resume.push_resumable(client, job.source, job.destination, signature[1], resumable, progress)
+            else:
+                moved, offset = resume.pull_resumable(client, job.source, job.destination, signature[0], resumable, progress)
+        except (AdbError, OSError) as e:
+            client.reset()
+            self.log(f"Resumable transfer of {job.name} failed ({str(e)}), copying the whole file instead")
+            return None
+
+        action = "Pushed" if to_phone else "Pulled"
+        resumed = f", resumed at {offset} bytes" if offset else ""
+        self.log(f"{action} {job.name} ({moved} bytes{resumed})")
+        return True
+
+    def run_transfers(self, jobs, to_phone, journal=None):
+        """Run transfer jobs on the worker pool, returns (success, transferred names)
+
+        With a journal, files an interrupted sync already finished are skipped,
+        every finished file is recorded and large files can be continued. The
+        caller clears the journal with finish_journal once the whole sync,
+        staged commit included, has succeeded.
+        """
+        if not jobs:
+            return True, []
+        transfer = self.adb_push if to_phone else self.adb_pull
+        tracker = self.start_progress(sum(job.size for job in jobs))
+
+        def run_job(job, client):
+            signature = None
+            if journal is not None:
+                signature = self.source_signature(job, client, to_phone)
+                if self.finished_earlier(job, client, to_phone, journal, signature):
+                    self.log(f"{job.name} was finished by the interrupted sync, skipping")
+                    tracker.finish(job.name, job.size)
+                    return True
+
+            # Delta and compressed transfers only count once they are done
+            def progress(done):
+                tracker.update(job.name, done)
+
+            ok = self.delta_transfer(job, client, to_phone) or self.compressed_transfer(job, client, to_phone)
+            if not ok:
+                ok = self.resumable_transfer(job, client, to_phone, journal, signature, progress)
+            if ok is None:
+                ok = transfer(job.source, job.destination, client, progress)
+            if ok:
+                tracker.finish(job.name, job.size)
+                if journal is not None:
+                    journal.mark_done(job.name, signature)
+            return ok
+
+        start = time.perf_counter()
+        scheduler = TransferScheduler(self.get_adb_client().clone, self.transfer_workers, self.log)
+        self.log(f"Transferring {len(jobs)} files with {min(scheduler.workers, len(jobs))} parallel workers")
+        if journal is not None and journal.resuming():
+            self.log(
+                f"Resuming an interrupted sync: {len(journal.done)} files finished, "
+                f"{len(journal.partial)} partly copied"
+            )
+        results = scheduler.run(jobs, run_job)
+        transferred = [name for name, ok in results.items() if ok]
+        self.measure_transfer(sum(job.size for job in jobs if results[job.name]), time.perf_counter() - start)
+        return len(transferred) == len(results), transferred
+
+    def finish_journal(self, journal, success):
+        """Forget the finished transfers once the sync they belong to succeeded"""
+        if success and journal is not None:
+            journal.finish()
+
+    def push_destination(self, android_path, name=None):
+        """Device path a push writes to: the staging folder or straight into the save folder"""
+        directory = f"{android_path}/{staging.STAGING_DIRNAME}" if self.use_staging else android_path
+        return directory if name is None else f"{directory}/{name}"
+
+    def prepare_staging(self, android_path):
+        """Create the staging folder for a push, returns False on error"""
+        if not self.use_staging:
+            return True
+        try:
+            staging.prepare(self.get_adb_client(), android_path)
+        except (AdbError, OSError) as e:
+            self.log(f"Could not create the staging folder on the device: {str(e)}")
+            return False
+        return True
+
+    def commit_staged(self, names, success, pc_path, android_path, journal=None):
+        """Move staged pushes into place once all arrived, returns (success, names now live)
+
+        Staged files that fail the check are dropped from the journal, so the
+        next sync pushes them again instead of trusting the staged copy.
+        """
+        if not self.use_staging or not names:
+            return success, names
+        if not success:
+            self.log("Not every file arrived, the saves on the phone were left unchanged")
+            return False, []
+
+        local = self.sync_manifests[0] if self.sync_manifests else {}
+        try:
+            files = {}
+            for name in names:
+                path = os.path.join(pc_path, name)
+                st = os.stat(path)
+                entry = local.get(name)
+                if entry and entry.get("md5") and (entry["size"], entry["mtime"]) == (st.st_size, int(st.st_mtime)):
+                    files[name] = (st.st_size, entry["md5"])
+                else:
+                    files[name] = (st.st_size, manifest.file_md5(path))
+            start = time.perf_counter()
+            staging.commit(self.get_adb_client(), android_path, files)
+        except (AdbError, OSError) as e:
+            self.log(f"Could not commit the pushed files: {str(e)}")
+            if journal is not None:
+                for name in staging.mismatched_files(str(e)):
+                    journal.forget(name)
+            return False, []
+        self.log(f"Verified {len(files)} staged files and moved them into place in {time.perf_counter() - start:.2f}s")
+        return True, names
+
+    def list_remote_files(self, android_path):
+        """List files in the root of the Android save folder, or None on error"""
+        command = f"find {quote(android_path)} -maxdepth 1 -type f"
+        try:
+            output = self.get_adb_client().shell(command)
+        except (AdbConnectionError, OSError):
+            result = subprocess.run([self.adb_path, "shell", command], capture_output=True, text=True)
+            if result.returncode != 0:
+                self.log(f"Error getting file list: {result.stderr}")
+                return None
+            output = result.stdout
+        except AdbError as e:
+            self.log(f"Error getting file list: {str(e)}")
+            return None
+        return [f.strip() for f in output.strip().split('\n') if f.strip()]
+
+    def bulk_push(self, files_to_sync, android_path):
+        """Push all files in one tar stream, returns False if the per-file path should be used"""
+        try:
+            start = time.perf_counter()
+            tracker = self.start_progress(sum(os.path.getsize(path) for path, _ in files_to_sync))
+            total = bulktransfer.push_files(self.get_adb_client(), files_to_sync, android_path, tracker.update)
+            self.measure_transfer(total, time.perf_counter() - start)
+            self.log(f"Bulk pushed {len(files_to_sync)} files ({total} bytes) in a single transfer")
+            return True
+        except (AdbError, OSError) as e:
+            self.log(f"Bulk transfer failed ({str(e)}), falling back to file by file")
+            self.get_adb_client().reset()
+            return False
+
+    def bulk_pull(self, remote_files, pc_path, android_path, size=0):
+        """Pull all files (size bytes in total) in one tar stream, returns False if the per-file path should be used"""
+        names = [os.path.basename(f) for f in remote_files]
+        try:
+            start = time.perf_counter()
+            tracker = self.start_progress(size)
+            received, total = bulktransfer.pull_files(self.get_adb_client(), android_path, names, pc_path, tracker.update)
+        except (AdbError, OSError) as e:
+            self.log(f"Bulk transfer failed ({str(e)}), falling back to file by file")
+            self.get_adb_client().reset()
+            return False
+
+        if len(received) != len(names):
+            self.log(f"Bulk transfer received {len(received)}/{len(names)} files, falling back to file by file")
+            return False
+        self.measure_transfer(total, time.perf_counter() - start)
+        self.log(f"Bulk pulled {len(received)} files ({total} bytes) in a single transfer")
+        return True
+
+    def get_remote_snapshot(self, android_path, names=None, pc_path=None):
+        """Inventory the device save folder, or None on error
+
+        With pc_path, the device hashes recorded by the last sync are reused
+        for files whose size and mtime did not change.
+        """
+        previous = None
+        if pc_path and self.use_incremental:
+            previous = manifest.remote_state(manifest.load_state(pc_path), self.serial)
+        try:
+            inventory = manifest.remote_inventory(
+                self.get_adb_client(), android_path,
+                hashes=self.use_incremental, max_depth=1, names=names, previous=previous
+            )
+        except (AdbError, OSError) as e:
+            self.log(f"Could not take device snapshot: {str(e)}")
+            return None
+        return manifest.root_files(inventory)
+
+    def plan_sync(self, names, pc_path, remote, to_phone):
+        """Build and log the plan of a sync, returns the names of the files to transfer"""
+        self.sync_manifests = None
+        self.transfer_measure = [0, 0.0]
+        if remote is None or not names:
+            if self.dry_run:
+                self.log("Could not build a sync plan without a device snapshot")
+            return names
+
+        wanted = set(names)
+        try:
+            state = manifest.load_state(pc_path)
+            scan = self.local_cache.scan if self.local_cache is not None else manifest.scan_local
+            local = scan(pc_path, wanted, state["local"], hashes=self.use_incremental)
+        except OSError as e:
+            self.log(f"Could not build local file manifest ({str(e)}), syncing all files")
+            return names
+
+        remote = {name: entry for name, entry in remote.items() if name in wanted}
+        plan = planner.build_plan(
+            names, local, remote, to_phone,
+            incremental=self.use_incremental, throughput=planner.measured_throughput(state)
+        )
+        if self.use_incremental:
+            self.sync_manifests = (local, remote)
+
+        self.plan = plan
+        self.log("Dry run, sync plan:" if self.dry_run else "Sync plan:")
+        for line in plan.summary():
+            self.log(f"  {line}")
+        if self.dry_run:
+            for action in plan.actions:
+                if action.kind != planner.SKIP:
+                    self.log(f"  {action.kind} {action.name} ({planner.format_size(action.size)})")
+        elif plan.names(planner.MISSING):
+            self.log(f"  Not on the {'PC' if to_phone else 'phone'}, not copied: {', '.join(plan.names(planner.MISSING))}")
+        return plan.transfers()
+
+    def measure_transfer(self, size, seconds):
+        """Add a finished transfer to the link throughput measurement of this sync"""
+        self.transfer_measure[0] += size
+        self.transfer_measure[1] += seconds
+
+    def save_sync_state(self, transferred, pc_path, to_phone):
+        """Remember the manifests and link speed of this sync for the next one"""
+        self.transferred = list(transferred)
+        if not to_phone:
+            self.local_writes.update(transferred)
+        size, seconds = self.transfer_measure
+        self.transfer_measure = [0, 0.0]
+        manifests = self.sync_manifests
+        self.sync_manifests = None
+        if size:
+            self.sync_stats = planner.sync_stats(size, seconds, to_phone, self.serial)
+
+        def update(state):
+            # Applied to the state file as it is now, other devices may have synced meanwhile
+            if manifests is not None:
+                local, remote = manifests
+                manifest.record_sync(state, local, remote, transferred, to_phone, pc_path, self.serial)
+            if size:
+                planner.record_history(state, self.sync_stats)
+            planner.record_throughput(state, size, seconds)
+
+        try:
+            if manifests is not None or size:
+                manifest.update_state(pc_path, update)
+        except OSError as e:
+            self.log(f"Could not save sync state: {str(e)}")
+        finally:
+            if self.merge_base_pending and merge.LEVELS_FILE in transferred:
+                self.save_merge_base(pc_path)
+            self.merge_base_pending = False
+            self.update_level_indexes(pc_path)
+
+    def update_level_indexes(self, pc_path):
+        """Bring the per-level indexes of the PC level saves up to date"""
+        if not self.use_level_index:
+            return
+        for name in INDEXED_FILES:
+            path = os.path.join(pc_path, name)
+            if not os.path.isfile(path):
+                continue
+            try:
+                levelindex.get_index(path)
+            except (savefile.SaveFileError, OSError) as e:
+                self.log(f"Could not index {name}: {str(e)}")
+
+    def snapshot_before_pull(self, names, pc_path):
+        """Keep the PC versions of the files a pull is about to overwrite"""
+        if not self.use_snapshots:
+            return
+        local = self.sync_manifests[0] if self.sync_manifests else {}
+        entries = {name: local.get(name) for name in names if os.path.isfile(os.path.join(pc_path, name))}
+        if not entries:
+            return
+        try:
+            store = snapshots.SnapshotStore(pc_path)
+            snapshot_id, stored = store.take(entries, reason="before pull")
+            freed = store.prune()
+        except OSError as e:
+            self.log(f"Could not snapshot the PC saves: {str(e)}")
+            return
+        self.log(
+            f"Snapshot {snapshot_id}: {len(entries)} files, "
+            f"{planner.format_size(stored)} new in the store, {planner.format_size(freed)} pruned"
+        )
+
+    def save_merge_base(self, pc_path, merged_index=None):
+        """Keep the merged CCLocalLevels.dat of the PC, now on both sides, as the base of the next merge"""
+        try:
+            merge.save_base(os.path.join(pc_path, merge.LEVELS_FILE), pc_path)
+            if merged_index is not None:
+                levelindex.get_index(merge.base_path(pc_path), same_as=merged_index)
+        except OSError as e:
+            self.log(f"Could not save the merge base: {str(e)}")
+
+    def push_merged_levels(self, pc_path, android_path):
+        """Push the merged CCLocalLevels.dat alone through staging, returns True once it is live"""
+        if not self.prepare_staging(android_path):
+            return False
+        pc_file = os.path.join(pc_path, merge.LEVELS_FILE)
+        if not self.adb_push(pc_file, self.push_destination(android_path, merge.LEVELS_FILE)):
+            return False
+        success, _ = self.commit_staged([merge.LEVELS_FILE], True, pc_path, android_path)
+        return success
+
+    def merge_local_levels(self, names, pc_path, android_path, to_phone):
+        """Three-way merge CCLocalLevels.dat instead of copying it, returns the names still to transfer
+
+        The merged save is written to the PC first. When the phone needs it
+        too, a push keeps CCLocalLevels.dat in its list, so it is staged and
+        committed together with the other files; a pull pushes it alone
+        through staging. The merge base only moves forward once the phone
+        has the merged save, so a failed push is merged again next time.
+        """
+        if not self.use_merge or merge.LEVELS_FILE not in names:
+            return names
+
+        pc_file = os.path.join(pc_path, merge.LEVELS_FILE)
+        remote_file = f"{android_path}/{merge.LEVELS_FILE}"
+        if not os.path.exists(pc_file):
+            return names
+
+        temp_dir = tempfile.mkdtemp(prefix="gdsync-merge-")
+        phone_file = os.path.join(temp_dir, merge.LEVELS_FILE)
+        merged_file = os.path.join(temp_dir, "merged.dat")
+        try:
+            if not self.adb_pull(remote_file, phone_file):
+                self.log(f"Level merge skipped, copying {merge.LEVELS_FILE} instead")
+                return names
+            # When only one side changed since the last merge, the indexes tell without parsing the saves
+            quick = None
+            if self.use_level_index:
+                quick = levelindex.quick_merge(merge.base_path(pc_path), pc_file, phone_file)
+            if quick is not None:
+                result, merged_index, changes = quick
+                if result.pc_changed or result.phone_changed:
+                    self.log(f"Levels changed on {'the phone' if result.pc_changed else 'the PC'} only since the last merge ({changes})")
+                else:
+                    self.log("Levels are the same on the PC and the phone")
+            else:
+                # On a conflict the copy from the side we sync from keeps the level name
+                result = merge.merge_files(merge.base_path(pc_path), pc_file, phone_file, prefer_phone=not to_phone)
+                merged_index = None
+            if not result.pc_changed:
+                merged_file = pc_file
+            elif not result.phone_changed:
+                merged_file = phone_file
+            else:
+                merge.write_save(result.data, merged_file)
+
+            if result.pc_changed:
+                self.local_writes.add(merge.LEVELS_FILE)
+                shutil.copyfile(merged_file, pc_file + ".gdsync-tmp")
+                os.replace(pc_file + ".gdsync-tmp", pc_file)
+                if self.sync_manifests is not None:
+                    # The staged commit checks, and the state records, the merged file
+                    local, remote = self.sync_manifests
+                    st = os.stat(pc_file)
+                    entry = {"size": st.st_size, "mtime": int(st.st_mtime), "md5": manifest.file_md5(pc_file)}
+                    self.sync_manifests = (dict(local, **{merge.LEVELS_FILE: entry}), remote)
+            if merged_index is not None:
+                levelindex.get_index(pc_file, same_as=merged_index)
+        except (savefile.SaveFileError, AdbError, OSError) as e:
+            self.log(f"Level merge failed ({str(e)}), copying {merge.LEVELS_FILE} instead")
+            return names
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        updated = [side for side, changed in (("PC", result.pc_changed), ("phone", result.phone_changed)) if changed]
+        self.log(
+            f"Merged {result.level_count} levels ({result.conflicts} conflicts), "
+            f"updated: {', '.join(updated) or 'nothing'}"
+        )
+        if result.phone_changed and to_phone:
+            # Pushed with the other files, the base is saved once the commit succeeded
+            self.merge_base_pending = True
+            return names
+        if result.phone_changed and not self.push_merged_levels(pc_path, android_path):
+            self.log(f"The phone keeps its {merge.LEVELS_FILE} until the next sync, the merged levels are on the PC")
+        else:
+            self.save_merge_base(pc_path, merged_index)
+        return [name for name in names if name != merge.LEVELS_FILE]
+
+    def sync_phone_to_pc_userdata(self, pc_path, android_path):
+        """Sync only user data from phone to PC"""
+        self.log("Syncing user data from phone to PC...")
+        return self.sync_phone_to_pc_files(pc_path, android_path, USERDATA_FILES)
+
+    def sync_phone_to_pc_files(self, pc_path, android_path, names):
+        """Pull the named root files from phone to PC"""
+        remote = self.get_remote_snapshot(android_path, names, pc_path)
+        files = self.plan_sync(names, pc_path, remote, to_phone=False)
+        if self.dry_run:
+            return True
+        self.snapshot_before_pull(files, pc_path)
+        files = self.merge_local_levels(files, pc_path, android_path, to_phone=False)
+
+        jobs = [
+            TransferJob(file, (remote or {}).get(file, {}).get("size", 0), f"{android_path}/{file}", os.path.join(pc_path, file))
+            for file in files
+        ]
+        journal = self.transfer_journal(pc_path, android_path, False)
+        success, transferred = self.run_transfers(jobs, to_phone=False, journal=journal)
+        self.finish_journal(journal, success)
+
+        self.save_sync_state(transferred, pc_path, to_phone=False)
+        self.finish_progress()
+        return success
+
+    def sync_pc_to_phone_userdata(self, pc_path, android_path):
+        """Sync only user data from PC to phone"""
+        self.log("Syncing user data from PC to phone...")
+        return self.sync_pc_to_phone_files(pc_path, android_path, USERDATA_FILES)
+
+    def sync_pc_to_phone_files(self, pc_path, android_path, names):
+        """Push the named root files from PC to phone"""
+        remote = self.get_remote_snapshot(android_path, names, pc_path)
+        files = self.plan_sync(names, pc_path, remote, to_phone=True)
+        if self.dry_run:
+            return True
+        files = self.merge_local_levels(files, pc_path, android_path, to_phone=True)
+
+        success = True
+        jobs = []
+        for file in files:
+            file_path = os.path.join(pc_path, file)
+            if os.path.exists(file_path):
+                jobs.append(TransferJob(file, os.path.getsize(file_path), file_path, self.push_destination(android_path, file)))
+            else:
+                self.log(f"Warning: File not found: {file_path}")
+                success = False
+
+        if jobs and not self.prepare_staging(android_path):
+            return False
+        journal = self.transfer_journal(pc_path, android_path, True)
+        jobs_ok, transferred = self.run_transfers(jobs, to_phone=True, journal=journal)
+        jobs_ok, transferred = self.commit_staged(transferred, jobs_ok, pc_path, android_path, journal)
+        self.finish_journal(journal, jobs_ok)
+        success = success and jobs_ok
+
+        self.save_sync_state(transferred, pc_path, to_phone=True)
+        self.finish_progress()
+        return success
+
+    def sync_phone_to_pc_all(self, pc_path, android_path):
+        """Sync all data from phone to PC, file by file"""
+        self.log("Syncing all data from phone to PC...")
+
+        # One snapshot of the root directory (no subdirectories) gives both the file list and the manifest
+        remote = self.get_remote_snapshot(android_path, pc_path=pc_path)
+        if remote is not None:
+            all_files = [f"{android_path}/{name}" for name in sorted(remote)]
+        else:
+            all_files = self.list_remote_files(android_path)
+            if all_files is None:
+                return False
+
+        # Filter out excluded paths
+        files = [f for f in all_files if not self.should_exclude_path(f)]
+
+        self.log(f"Found {len(files)} files to sync from root directory")
+        names = self.plan_sync([os.path.basename(f) for f in files], pc_path, remote, to_phone=False)
+        if self.dry_run:
+            return True
+        self.snapshot_before_pull(names, pc_path)
+        names = self.merge_local_levels(names, pc_path, android_path, to_phone=False)
+        files = [f"{android_path}/{name}" for name in names]
+
+        # A bulk transfer is all or nothing, so an interrupted sync is continued file by file
+        journal = self.transfer_journal(pc_path, android_path, to_phone=False)
+        resuming = journal is not None and journal.resuming()
+        if self.use_bulk_transfer and files and not resuming and self.bulk_pull(
+                files, pc_path, android_path, sum((remote or {}).get(name, {}).get("size", 0) for name in names)):
+            self.finish_journal(journal, True)
+            self.save_sync_state(names, pc_path, to_phone=False)
+            self.finish_progress()
+            return True
+
+        # Local files are stored under just the filename
+        jobs = [
+            TransferJob(name, (remote or {}).get(name, {}).get("size", 0), f"{android_path}/{name}", os.path.join(pc_path, name))
+            for name in names
+        ]
+        success, transferred = self.run_transfers(jobs, to_phone=False, journal=journal)
+        self.finish_journal(journal, success)
+
+        self.save_sync_state(transferred, pc_path, to_phone=False)
+        self.finish_progress()
+        return success
+
+    def sync_pc_to_phone_all(self, pc_path, android_path):
+        """Sync all data from PC to phone, file by file"""
+        self.log("Syncing all data from PC to phone...")
+
+        if not os.path.exists(pc_path):
+            self.log(f"Error: PC path does not exist: {pc_path}")
+            return False
+
+        # Get files to sync (only from root directory, excluding subfolders)
+        files_to_sync = self.get_files_to_sync(pc_path)
+
+        if not files_to_sync:
+            self.log("No files found to sync")
+            return False
+
+        self.log(f"Found {len(files_to_sync)} files to sync from root directory")
+        remote = self.get_remote_snapshot(android_path, pc_path=pc_path)
+        names = self.plan_sync([name for _, name in files_to_sync], pc_path, remote, to_phone=True)
+        if self.dry_run:
+            return True
+        names = set(self.merge_local_levels(names, pc_path, android_path, to_phone=True))
+        files_to_sync = [(path, name) for path, name in files_to_sync if name in names]
+
+        if files_to_sync and not self.prepare_staging(android_path):
+            return False
+        journal = self.transfer_journal(pc_path, android_path, to_phone=True)
+        resuming = journal is not None and journal.resuming()
+        if (self.use_bulk_transfer and files_to_sync and not resuming
+                and self.bulk_push(files_to_sync, self.push_destination(android_path))):
+            if journal is not None and self.use_staging:
+                # If the commit fails, the next sync continues file by file from the staged copies
+                for file_path, filename in files_to_sync:
+                    st = os.stat(file_path)
+                    journal.mark_done(filename, (st.st_size, int(st.st_mtime)))
+            success, transferred = self.commit_staged([name for _, name in files_to_sync], True, pc_path, android_path, journal)
+            self.finish_journal(journal, success)
+            self.save_sync_state(transferred, pc_path, to_phone=True)
+            self.finish_progress()
+            return success
+
+        # Push each file to the staging folder (or directly to the android path)
+        jobs = [
+            TransferJob(filename, os.path.getsize(file_path), file_path, self.push_destination(android_path, filename))
+            for file_path, filename in files_to_sync
+        ]
+        success, transferred = self.run_transfers(jobs, to_phone=True, journal=journal)
+        success, transferred = self.commit_staged(transferred, success, pc_path, android_path, journal)
+        self.finish_journal(journal, success)
+
+        self.save_sync_state(transferred, pc_path, to_phone=True)
+        self.finish_progress()
+        return success
+
+
+def sync_devices(engine, serials, pc_path, android_path=ANDROID_SAVE_PATH, to_phone=True,
+                 userdata_only=False, progress=None):
+    """Sync several devices at once, each on its own worker and engine
+
+    The engines share one local manifest cache, so the PC folder is scanned
+    and hashed only once. Log lines are prefixed with the device serial and
+    progress(serial, done, total, rate, eta) is called per device. Returns
+    {serial: (success, engine)}.
+    """
+    engine.local_cache = manifest.LocalManifestCache()
+
+    def run(serial):
+        device_engine = engine.for_device(
+            serial,
+            log=lambda message: engine.log(f"[{serial}] {message}"),
+            progress=(lambda *args: progress(serial, *args)) if progress else None,
+        )
+        try:
+            success = device_engine.sync(pc_path, android_path, to_phone, userdata_only)
+        except Exception as e:
+            device_engine.log(f"Error in sync operation: {str(e)}")
+            success = False
+        finally:
+            device_engine.close()
+        return success, device_engine
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, len(serials))) as pool:
+            return dict(zip(serials, pool.map(run, serials)))
+    finally:
+        engine.local_cache = None
+
+
+def sync_all_devices(engine, serials, pc_path, android_path=ANDROID_SAVE_PATH, to_phone=True, userdata_only=False):
+    """sync_devices for a front end with one log and one progress bar, returns True if every device synced
+
+    The byte progress of the devices is summed into engine's progress callback.
+    """
+    lock = threading.Lock()
+    progress = {}
+
+    def device_progress(serial, done, total, rate, eta):
+        with lock:
+            progress[serial] = (done, total, rate, eta)
+            values = list(progress.values())
+        engine.report_progress(
+            sum(value[0] for value in values), sum(value[1] for value in values),
+            sum(value[2] for value in values), max(value[3] for value in values),
+        )
+
+    engine.log(f"Syncing {len(serials)} devices at once: {', '.join(serials)}")
+    results = sync_devices(engine, serials, pc_path, android_path, to_phone, userdata_only, device_progress)
+    for serial, (success, _) in results.items():
+        engine.log(f"[{serial}] {'OK' if success else 'FAILED'}")
+    return all(success for success, _ in results.values())
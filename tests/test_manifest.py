@@ -0,0 +1,73 @@
+"""
+Sync state file shared by the syncs of several devices
+
+    python -m pytest tests
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import manifest
+import planner
+
+
+def entry(md5, size=100, mtime=1700000000):
+    return {"size": size, "mtime": mtime, "md5": md5}
+
+
+class StateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.pc_path = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_remote_manifest_per_device(self):
+        local = {"CCGameManager.dat": entry("aaa")}
+
+        def push(serial, remote):
+            manifest.update_state(self.pc_path, lambda state: manifest.record_sync(
+                state, local, remote, ["CCGameManager.dat"], True, self.pc_path, serial))
+
+        push("phone-a", {"CCGameManager.dat": entry("old")})
+        push("phone-b", {"CCGameManager.dat": entry("other", size=7)})
+        state = manifest.load_state(self.pc_path)
+        self.assertEqual(manifest.remote_state(state, "phone-a"), {"CCGameManager.dat": entry("aaa")})
+        self.assertEqual(manifest.remote_state(state, "phone-b"), {"CCGameManager.dat": entry("aaa")})
+        self.assertEqual(manifest.remote_state(state, "phone-c"), {})
+        self.assertEqual(manifest.remote_state(state), {})
+
+    def test_parallel_updates_keep_every_change(self):
+        def sync(serial):
+            stats = planner.sync_stats(1024, 1.0, True, serial)
+            manifest.update_state(self.pc_path, lambda state: planner.record_history(manifest.record_sync(
+                state, {}, {f"{serial}.dat": entry(serial)}, [], True, self.pc_path, serial), stats))
+
+        threads = [threading.Thread(target=sync, args=(f"phone-{i}",)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        state = manifest.load_state(self.pc_path)
+        self.assertEqual(sorted(stats["device"] for stats in state["history"]), [f"phone-{i}" for i in range(8)])
+        self.assertEqual(sorted(state["remotes"]), [f"phone-{i}" for i in range(8)])
+
+    def test_version_1_state(self):
+        with open(os.path.join(self.pc_path, manifest.STATE_FILENAME), "w") as f:
+            json.dump({"version": 1, "local": {"a.dat": entry("l")}, "remote": {"a.dat": entry("r")}}, f)
+        state = manifest.load_state(self.pc_path)
+        self.assertEqual(state["local"], {"a.dat": entry("l")})
+        self.assertEqual(manifest.remote_state(state), {"a.dat": entry("r")})
+        self.assertEqual(manifest.remote_state(state, "phone-a"), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+"""
+Round-trip tests of the save-file engine
+
+The streaming decoder and encoder are checked against a whole-buffer
+reference built from the standard library (XOR, base64, gzip in one go, as
+the save format was handled before savefile existed), with chunk sizes that
+split the base64 text at every kind of boundary.
+
+    python -m pytest tests
+"""
+
+import base64
+import gzip
+import io
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import savefile
+
+
+def reference_decode(data):
+    """Whole-buffer decode: XOR, strip the trailing NULs, base64, gunzip"""
+    text = bytes(b ^ savefile.XOR_KEY for b in data).rstrip(b"\0")
+    return gzip.decompress(base64.urlsafe_b64decode(text + b"=" * (-len(text) % 4)))
+
+
+def reference_encode(xml):
+    """Whole-buffer encode: gzip, base64, XOR"""
+    return bytes(b ^ savefile.XOR_KEY for b in base64.urlsafe_b64encode(gzip.compress(xml)))
+
+
+def make_save_xml(levels, seed=1):
+    rng = random.Random(seed)
+    data = {"LLM_01": {"_isArr": True}, "LLM_02": 38}
+    for i in range(levels):
+        raw = "".join(f"1,{rng.randint(1, 1900)},2,{rng.randint(0, 90000)};" for _ in range(rng.randint(1, 200)))
+        data["LLM_01"][f"k_{i}"] = {
+            "kCEK": 4,
+            "k1": 100000 + i,
+            "k2": f"Level {i} <&>",
+            "k4": savefile.encode_level_data(raw.encode()),
+            "k13": True,
+            "k16": rng.randint(1, 40),
+        }
+    return savefile.build_plist(data)
+
+
+class RoundTripTest(unittest.TestCase):
+
+    def setUp(self):
+        self.xml = make_save_xml(40)
+        self.encoded = savefile.encode_bytes(self.xml)
+
+    def test_decode_encode_gives_the_same_bytes(self):
+        xml = savefile.decode_bytes(self.encoded)
+        self.assertEqual(xml, self.xml)
+        self.assertEqual(savefile.encode_bytes(xml), self.encoded)
+
+    def test_chunk_sizes(self):
+        for chunk_size in (1, 3, 4, 7, 4099):
+            out = io.BytesIO()
+            savefile.decode_stream(io.BytesIO(self.encoded), out, chunk_size)
+            self.assertEqual(out.getvalue(), self.xml, f"decode with chunk size {chunk_size}")
+            out = io.BytesIO()
+            savefile.encode_stream(io.BytesIO(self.xml), out, chunk_size=chunk_size)
+            self.assertEqual(out.getvalue(), self.encoded, f"encode with chunk size {chunk_size}")
+
+    def test_matches_reference_implementation(self):
+        self.assertEqual(reference_decode(self.encoded), self.xml)
+        self.assertEqual(savefile.decode_bytes(reference_encode(self.xml)), self.xml)
+
+    def test_trailing_nuls_and_padding(self):
+        # Some GD versions pad the text and end it with NULs
+        padded = reference_encode(self.xml) + bytes([b"="[0] ^ savefile.XOR_KEY, savefile.XOR_KEY, savefile.XOR_KEY])
+        self.assertEqual(savefile.decode_bytes(padded), self.xml)
+
+    def test_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            xml_path = os.path.join(directory, "save.xml")
+            save_path = os.path.join(directory, "CCLocalLevels.dat")
+            with open(xml_path, "wb") as f:
+                f.write(self.xml)
+            savefile.encode_file(xml_path, save_path)
+            self.assertEqual(savefile.decode_file(save_path, xml_path), len(self.xml))
+            with open(xml_path, "rb") as f:
+                self.assertEqual(f.read(), self.xml)
+            self.assertEqual(sorted(os.listdir(directory)), ["CCLocalLevels.dat", "save.xml"])
+
+    def test_level_data(self):
+        raw = b"kS38,1_40_2_125|;1,1,2,15;" * 50
+        self.assertEqual(savefile.decode_level_data(savefile.encode_level_data(raw)), raw)
+        plain = base64.urlsafe_b64encode(gzip.compress(raw)).decode("ascii")
+        self.assertEqual(savefile.decode_level_data(plain), raw)
+
+    def test_parse_and_build(self):
+        data = savefile.parse_plist(self.xml)
+        self.assertEqual(savefile.build_plist(data), self.xml)
+        self.assertEqual(savefile.join_entries(savefile.iter_save(io.BytesIO(self.encoded), chunk_size=5)), data)
+
+
+class BadInputTest(unittest.TestCase):
+
+    def test_truncated(self):
+        encoded = savefile.encode_bytes(make_save_xml(5))
+        for length in (0, 5, len(encoded) // 2, len(encoded) - 8):
+            with self.assertRaises(savefile.SaveFileError, msg=f"cut at {length} bytes"):
+                savefile.decode_bytes(encoded[:length])
+
+    def test_garbage(self):
+        for data in (b"garbage!!", bytes(range(256)) * 3, reference_encode(b"not gzip")[:1] * 40):
+            with self.assertRaises(savefile.SaveFileError):
+                savefile.decode_bytes(data)
+
+    def test_not_gzip(self):
+        data = bytes(b ^ savefile.XOR_KEY for b in base64.urlsafe_b64encode(b"plain text, not compressed"))
+        with self.assertRaises(savefile.SaveFileError):
+            savefile.decode_bytes(data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+Watch mode and phone polling against a stub engine
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import watcher
+
+
+class StubEngine:
+    """Records sync calls, the first failures of them return False"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = []
+        self.succeeded = False
+        self.local_writes = set()
+        self.lines = []
+
+    def log(self, message):
+        self.lines.append(message)
+
+    def sync(self, pc_path, android_path, to_phone=False, userdata_only=False, names=None):
+        self.calls.append((time.monotonic(), to_phone, names))
+        if self.failures:
+            self.failures -= 1
+            return False
+        self.succeeded = True
+        return True
+
+
+class WatchTest(unittest.TestCase):
+
+    def run_watch(self, engine, timeout=5.0):
+        with tempfile.TemporaryDirectory() as directory:
+            save = os.path.join(directory, "CCGameManager.dat")
+            with open(save, "wb") as f:
+                f.write(b"old")
+            start = time.monotonic()
+            written = []
+
+            def stop():
+                if not written and time.monotonic() - start > 0.2:
+                    with open(save, "wb") as f:
+                        f.write(b"new save")
+                    written.append(True)
+                return engine.succeeded or time.monotonic() - start > timeout
+
+            return watcher.watch(engine, directory, "/sdcard/save", debounce=0.1, names=["CCGameManager.dat"], stop=stop)
+
+    def test_push_after_change(self):
+        engine = StubEngine(failures=0)
+        self.assertEqual(self.run_watch(engine), 1)
+        self.assertEqual(len(engine.calls), 1)
+
+    def test_failed_push_is_retried_with_backoff(self):
+        engine = StubEngine(failures=2)
+        self.assertEqual(self.run_watch(engine), 1)
+        self.assertEqual(len(engine.calls), 3)
+        first, second, third = (call[0] for call in engine.calls)
+        self.assertGreaterEqual(third - second, second - first)
+        self.assertEqual(sum("retrying" in line for line in engine.lines), 2)
+
+
+class PollDeviceTest(unittest.TestCase):
+
+    def run_poll(self, engine):
+        fingerprints = {"CCGameManager.dat": (1200, 1700000000), "CCLocalLevels.dat": (800, 1700000000)}
+        start = time.monotonic()
+
+        def stop():
+            return engine.succeeded or time.monotonic() - start > 5.0
+
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.object(watcher, "device_fingerprints", return_value=fingerprints):
+            engine.get_adb_client = lambda: None
+            return watcher.poll_device(engine, directory, "/sdcard/save", interval=0.05, max_interval=0.2, stop=stop)
+
+    def test_pull_goes_through_sync(self):
+        engine = StubEngine(failures=0)
+        self.assertEqual(self.run_poll(engine), 1)
+        self.assertEqual([call[1:] for call in engine.calls], [(False, ["CCGameManager.dat", "CCLocalLevels.dat"])])
+
+    def test_failed_pull_is_retried(self):
+        engine = StubEngine(failures=2)
+        self.assertEqual(self.run_poll(engine), 1)
+        self.assertEqual(len(engine.calls), 3)
+        self.assertEqual(sum("retrying" in line for line in engine.lines), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,245 @@
+"""
+Watch mode: keep the saves in sync as GD writes them
+
+PC to phone: the PC save folder is watched with inotify (through ctypes,
+Linux only) or, where that is not available, by polling os.scandir. Events
+for the watched save files only arm a debounce timer; the sync starts once the
+files have been quiet for the whole window, so a burst of writes from GD ends
+up as one incremental push. Files the sync itself wrote are not treated as
+changes, and a failed push (phone unplugged, adb down) stays pending and is
+tried again with a growing delay.
+
+Phone to PC: the phone's save folder is polled with one stat call over the
+root files and only files whose size or mtime changed are pulled, through a
+regular engine.sync() limited to those files. A failed pull is tried again.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+from adbclient import AdbError
+import manifest
+from synccore import USERDATA_FILES
+
+DEFAULT_DEBOUNCE = 3.0
+MAX_RETRY_DELAY = 60.0
+POLL_INTERVAL = 1.0
+DEFAULT_DEVICE_INTERVAL = 5.0
+MAX_DEVICE_INTERVAL = 60.0
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def snapshot(directory, names):
+    """(size, mtime_ns) of each watched file that exists"""
+    signatures = {}
+    for name in names:
+        try:
+            st = os.stat(os.path.join(directory, name))
+        except OSError:
+            continue
+        signatures[name] = (st.st_size, st.st_mtime_ns)
+    return signatures
+
+
+class InotifyWatcher:
+    """Reports names of changed files in one directory using inotify"""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"Cannot watch {directory}")
+
+    def wait(self, timeout):
+        """Names changed within timeout seconds; None means "anything may have changed" """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        names = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if name:
+                    names.add(os.fsdecode(name))
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Fallback that compares file signatures every POLL_INTERVAL seconds"""
+
+    def __init__(self, directory, names, interval=POLL_INTERVAL):
+        self.directory = directory
+        self.names = names
+        self.interval = interval
+        self.signatures = snapshot(directory, names)
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        current = snapshot(self.directory, self.names)
+        changed = {name for name in set(current) | set(self.signatures) if current.get(name) != self.signatures.get(name)}
+        self.signatures = current
+        return changed
+
+    def close(self):
+        pass
+
+
+def create_watcher(directory, names):
+    """inotify watcher if the platform has it, polling otherwise"""
+    try:
+        return InotifyWatcher(directory)
+    except (OSError, AttributeError, TypeError):
+        return PollingWatcher(directory, names)
+
+
+def watch(engine, pc_path, android_path, userdata_only=True, debounce=DEFAULT_DEBOUNCE, names=USERDATA_FILES, stop=None):
+    """Push to the phone every time the watched saves settle after a change
+
+    A failed push is retried after twice the previous wait, up to
+    MAX_RETRY_DELAY, until it succeeds. Runs until stop() returns True (or
+    forever), returns the number of successful syncs.
+    """
+    names = set(names)
+    watcher = create_watcher(pc_path, names)
+    engine.log(f"Watching {pc_path} ({type(watcher).__name__}), debounce {debounce:.1f}s")
+    synced = snapshot(pc_path, names)
+    last_event = None
+    delay = debounce
+    syncs = 0
+    try:
+        while not (stop and stop()):
+            timeout = POLL_INTERVAL if last_event is None else max(0.05, last_event + delay - time.monotonic())
+            changed = watcher.wait(timeout)
+            if changed is None or changed & names:
+                last_event = time.monotonic()
+                continue
+            if last_event is None or time.monotonic() - last_event < delay:
+                continue
+
+            last_event = None
+            before = snapshot(pc_path, names)
+            if before == synced:
+                delay = debounce
+                continue
+            engine.log(f"Saves changed: {', '.join(sorted(n for n in names if before.get(n) != synced.get(n)))}")
+            if not engine.sync(pc_path, android_path, to_phone=True, userdata_only=userdata_only):
+                # Keep the change pending, synced still holds the last pushed state
+                delay = min(max(delay * 2, POLL_INTERVAL), MAX_RETRY_DELAY)
+                engine.log(f"Sync failed, retrying in {delay:g}s")
+                last_event = time.monotonic()
+                continue
+            delay = debounce
+            syncs += 1
+
+            # Writes by the sync itself are expected, anything else came from GD meanwhile
+            watcher.wait(0)
+            synced = snapshot(pc_path, names)
+            foreign = {n for n in names if synced.get(n) != before.get(n)} - engine.local_writes
+            if foreign:
+                engine.log(f"Saves changed during the sync: {', '.join(sorted(foreign))}")
+                for name in foreign:
+                    synced[name] = before.get(name)
+                last_event = time.monotonic()
+    finally:
+        watcher.close()
+    return syncs
+
+
+def device_fingerprints(client, android_path, names):
+    """{name: (size, mtime)} of the watched files on the phone, from one stat call"""
+    inventory = manifest.remote_inventory(client, android_path, hashes=False, max_depth=1, names=sorted(names))
+    return {name: (entry["size"], entry["mtime"]) for name, entry in manifest.root_files(inventory).items()}
+
+
+def poll_device(engine, pc_path, android_path, interval=DEFAULT_DEVICE_INTERVAL,
+                max_interval=MAX_DEVICE_INTERVAL, names=USERDATA_FILES, stop=None):
+    """Pull files whose fingerprint changed on the phone, until stop() returns True
+
+    A change is only pulled once the next poll sees the same fingerprint, so
+    files GD is still writing are left alone. The interval doubles up to
+    max_interval while nothing changes or the device is unreachable, and goes
+    back to interval as soon as something changes. A failed pull is tried again
+    on the next poll, with the interval doubling the same way. Returns the
+    number of successful pulls.
+    """
+    names = set(names)
+    engine.log(f"Polling {android_path} every {interval:g}-{max_interval:g}s")
+    synced = None
+    pending = None
+    delay = interval
+    pulls = 0
+    while not (stop and stop()):
+        try:
+            current = device_fingerprints(engine.get_adb_client(), android_path, names)
+        except (AdbError, OSError) as e:
+            engine.get_adb_client().reset()
+            if delay < max_interval:
+                engine.log(f"Device not reachable ({str(e)}), retrying in {min(delay * 2, max_interval):g}s")
+            delay = min(delay * 2, max_interval)
+            _sleep(delay, stop)
+            continue
+
+        if synced is None:
+            # First look: bring the PC up to date (unchanged files are skipped)
+            changed = set(current)
+        else:
+            changed = {name for name in set(current) | set(synced) if current.get(name) != synced.get(name)}
+
+        if not changed:
+            pending = None
+            delay = min(delay * 2, max_interval)
+        elif pending != current:
+            # Wait one more poll so a save that is still being written can settle
+            pending = current
+            delay = interval
+        else:
+            to_pull = sorted(name for name in changed if name in current)
+            if to_pull:
+                engine.log(f"Phone saves changed: {', '.join(to_pull)}")
+                if not engine.sync(pc_path, android_path, to_phone=False, names=to_pull):
+                    # pending stays set, so the next poll that sees the same files pulls again
+                    delay = min(delay * 2, max_interval)
+                    engine.log(f"Pull failed, retrying in {delay:g}s")
+                    _sleep(delay, stop)
+                    continue
+                pulls += 1
+            synced = current
+            pending = None
+            delay = interval
+        _sleep(delay, stop)
+    return pulls
+
+
+def _sleep(seconds, stop):
+    """Sleep in short steps so stop() is noticed quickly"""
+    end = time.monotonic() + seconds
+    while time.monotonic() < end and not (stop and stop()):
+        time.sleep(min(0.2, end - time.monotonic()))